@@ -1,19 +1,154 @@
+import time
+_STARTUP_T0 = time.perf_counter()  # For --startup-time
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 from datetime import datetime, timedelta
 import csv
 import json
 import os
+import pathlib
 import webbrowser
-import hashlib
-import pickle
-from tkcalendar import Calendar, DateEntry
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import requests
-from PIL import Image, ImageTk
 import sys
-import time
+from dtr_storage import announce_changes, load_install_config, open_store, window_start_date
+from dtr_summary import DailyTotals, SummaryRollups, day_index, period_bounds, period_key, read_rollups, write_rollups
+from dtr_columns import SessionColumns
+from dtr_html import SummaryRenderer, day_rows, summary_path
+from dtr_reports import ReportEngine
+from dtr_overtime import day_table, overtime_periods, overtime_rules, pay_period
+from dtr_backup import BackupRepository, restore_user, user_backup
+from dtr_sync import sync_client
+from dtr_io import IOWorker
+from dtr_users import UserStore
+from dtr_passwords import hash_params, hash_password, needs_rehash, verify_password
+from dtr_export import csv_rows, export_sessions, import_sessions, read_ndjson, write_csv, write_ndjson
+
+# tkcalendar and matplotlib are imported where they are first used so the
+# login screen comes up without loading them.
+_IMPORTS_DONE = time.perf_counter()
+
+class VirtualRecordsView:
+    """Drives a Treeview so only the rows in the viewport exist as items.
+
+    Every row is tracked as a key (e.g. "work:12") mapped to its session;
+    formatting happens only when a row scrolls into view, and single-row
+    changes are applied as diffs instead of rebuilding the whole tree.
+    """
+
+    def __init__(self, tree, scrollbar, format_row):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.keys = []
+        self.rows = {}
+        self.kind_counts = {'work': 0, 'break': 0}
+        self.offset = 0
+        self.page_size = int(tree.cget("height"))
+        style_height = ttk.Style().lookup("Treeview", "rowheight")
+        self.row_height = int(style_height) if style_height else 20
+
+        scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", self._on_resize)
+        tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        tree.bind("<Button-4>", lambda e: self.scroll(-1, "units"))
+        tree.bind("<Button-5>", lambda e: self.scroll(1, "units"))
+
+    @staticmethod
+    def key(kind, session):
+        return f"{kind}:{session['id']}"
+
+    def set_rows(self, rows):
+        """Replace all rows with (kind, session) pairs, in display order"""
+        self.rows = {self.key(kind, session): (kind, session) for kind, session in rows}
+        self.keys = list(self.rows)
+        self.kind_counts = {'work': 0, 'break': 0}
+        for kind, _ in rows:
+            self.kind_counts[kind] += 1
+        self.offset = 0
+        self.render()
+
+    def insert(self, kind, session, index=None):
+        """Add one row, rendering it only if it lands in the viewport"""
+        key = self.key(kind, session)
+        self.rows[key] = (kind, session)
+        self.kind_counts[kind] += 1
+        if index is None:
+            index = len(self.keys)
+        self.keys.insert(index, key)
+        if index < self.offset + self.page_size:
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    def update(self, kind, session):
+        """Reformat one row if it is currently visible"""
+        key = self.key(kind, session)
+        if self.tree.exists(key):
+            self.tree.item(key, values=self.format_row(kind, session))
+
+    def delete(self, kind, session):
+        """Remove one row"""
+        key = self.key(kind, session)
+        if key not in self.rows:
+            return
+        del self.rows[key]
+        self.kind_counts[kind] -= 1
+        index = self.keys.index(key)
+        del self.keys[index]
+        if index < self.offset + self.page_size:
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    def has(self, kind, session):
+        return self.key(kind, session) in self.rows
+
+    def selected(self):
+        """(kind, session) for the selected row, or None"""
+        selection = self.tree.selection()
+        return self.rows.get(selection[0]) if selection else None
+
+    def render(self):
+        """Materialize only the rows between offset and offset + page_size"""
+        self.offset = max(0, min(self.offset, len(self.keys) - self.page_size))
+        selection = self.tree.selection()
+        self.tree.delete(*self.tree.get_children())
+        for key in self.keys[self.offset:self.offset + self.page_size]:
+            kind, session = self.rows[key]
+            self.tree.insert("", "end", iid=key, values=self.format_row(kind, session))
+        visible = [key for key in selection if self.tree.exists(key)]
+        if visible:
+            self.tree.selection_set(visible)
+        self._update_scrollbar()
+
+    def scroll(self, amount, what):
+        """Move the viewport by units (rows) or pages"""
+        step = self.page_size if what == "pages" else 1
+        self.offset += int(amount) * step
+        self.render()
+
+    def yview(self, *args):
+        """Scrollbar command: translate moveto/scroll into a row offset"""
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.keys))
+            self.render()
+        elif args[0] == "scroll":
+            self.scroll(args[1], args[2])
+
+    def _update_scrollbar(self):
+        total = len(self.keys)
+        if total <= self.page_size:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.page_size) / total)
+
+    def _on_resize(self, event):
+        """Recompute how many rows fit after the tree is resized"""
+        page_size = max(1, (event.height - self.row_height) // self.row_height)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.render()
+
 
 class AdvancedTimeRecordApp:
     def __init__(self, root):
@@ -22,14 +157,21 @@ class AdvancedTimeRecordApp:
         self.root.geometry("1400x900")
         self.root.state('zoomed')  # Start maximized
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.io = IOWorker()  # Disk reads/writes run off the Tk thread
+        self.io.start_polling(self.root)
         self._setup_cli_messages()
         self.start_time = datetime.now()
         self._setup_signal_handlers()
 
         # Security and authentication
         self.current_user = None
-        self.users_file = "users.dat"
-        self.backup_url = "https://your-backup-service.com/api"  # Replace with actual service
+        self.is_admin = False
+        self.team_rollups = None  # Created the first time an admin opens Team Summary
+        self.report_engine = None  # Created with the first report
+        self.users_file = "users.dat"  # Legacy pickle, migrated into the account database
+        self.accounts = None  # UserStore, opened on the I/O worker
+        self.install_config = load_install_config()
+        self.sync_client = None  # Started at the first login when sync_url is configured
 
         # Settings
         self.settings = {
@@ -38,7 +180,8 @@ class AdvancedTimeRecordApp:
             'break_deduction': True,
             'auto_backup': False,
             'dark_mode': False,
-            'notifications': True
+            'notifications': True,
+            'load_window': 'month'  # History loaded at login: today/week/month/all
         }
 
         # Initialize data structures
@@ -74,10 +217,14 @@ class AdvancedTimeRecordApp:
             if hasattr(self, 'clock_update_id'):
                 self.root.after_cancel(self.clock_update_id)
             
-            # Save data if logged in
+            # Save data if logged in, then wait for queued writes to land
             if self.current_user:
                 self.save_records()
+                self.close_store()
+            self.io.flush()
+            if self.current_user:
                 self._print_cli_message("Data saved successfully", "green")
+            self._print_cli_message("SYSTEM OFFLINE", "red")
             
             # Safe destruction sequence
             try:
@@ -107,37 +254,50 @@ class AdvancedTimeRecordApp:
         color_code = colors.get(color, "")
         print(f"{color_code}[DTR] {message}{colors['end']}")
 
+    def report_startup_time(self):
+        """Print import, build and first-paint times (python DTR.py --startup-time)"""
+        built = time.perf_counter()
+        
+        def first_paint():
+            self.root.update_idletasks()
+            painted = time.perf_counter()
+            self._print_cli_message(
+                f"Startup: imports {(_IMPORTS_DONE - _STARTUP_T0) * 1000:.0f} ms, "
+                f"window built {(built - _STARTUP_T0) * 1000:.0f} ms, "
+                f"first paint {(painted - _STARTUP_T0) * 1000:.0f} ms", "blue")
+        
+        self.root.after_idle(first_paint)
+
     def _print_running_status(self):
         """Show runtime status in CLI."""
         self._print_cli_message(f"Ready for user: {self.current_user or 'Not logged in'}", "green")
         # Update every 5 minutes
         self.root.after(300000, self._print_running_status) 
 
-    def on_close(self):
-        """Handle graceful shutdown with CLI feedback."""
-        self._print_cli_message("SHUTDOWN INITIATED", "yellow")
-        
-        # Animated progress bar
-        print("\n[", end="", flush=True)
-        for i in range(20):
-            print("#", end="", flush=True)
-            time.sleep(0.1)  # Visual feedback
-        
-        self._print_cli_message("All data saved successfully", "green")
-        self._print_cli_message("SYSTEM OFFLINE", "red")
-        self.root.destroy()
-    
     def initialize_data(self):
         """Initialize all data structures"""
         self.clock_in_time = None
         self.clock_out_time = None
         self.break_start_time = None
         self.break_end_time = None
-        self.work_sessions = []
-        self.break_sessions = []
+        self.shift_break = timedelta()  # Break time taken since clock-in; None = recount
+        self.label_texts = {}  # Last text set on each live-updated label
+        self.work_sessions = SessionColumns('work')
+        self.break_sessions = SessionColumns('break')
+        self.store = None
+        self.records_loaded = False
+        self.data_version = 0  # Bumped on every session change; charts redraw when it moves
+        self.totals = DailyTotals(self.settings['overtime_threshold'])
+        self.window_start = None
+        self.history_loaded = False
+        self.history_loading = False
+        self.history_waiters = []  # (callback, since) waiting for ensure_history_loaded
+        self.rollups_partial = False  # Rollups cover only the login window until the history loads
         self.current_date = datetime.now().date()
-        self.weekly_data = []
-        self.monthly_data = []
+        self.rollups = None
+        self.weekly_data = {}
+        self.monthly_data = {}
+        self.summary_renderer = SummaryRenderer()  # Used on the I/O worker only
         
     def setup_theme(self):
         """Configure UI theme colors"""
@@ -209,19 +369,39 @@ class AdvancedTimeRecordApp:
             messagebox.showerror("Error", "Please enter both username and password")
             return
         
-        hashed_pw = hashlib.sha256(password.encode()).hexdigest()
-        
-        try:
-            with open(self.users_file, "rb") as f:
-                users = pickle.load(f)
-                
-                if username in users and users[username]['password'] == hashed_pw:
-                    self.current_user = username
-                    self.load_user_data()
-                else:
-                    messagebox.showerror("Error", "Invalid username or password")
-        except FileNotFoundError:
-            messagebox.showerror("Error", "No users registered yet")
+        self.io.submit(self.check_login, username, password,
+                       on_done=lambda account: self.finish_login(username, account),
+                       on_error=self.show_io_error)
+    
+    def check_login(self, username, password):
+        """Verify a password, upgrading an outdated hash in place (runs on the I/O worker)"""
+        accounts = self.account_store()
+        account = accounts.get(username)
+        if account is None or not verify_password(password, account['password']):
+            return None
+        params = hash_params(self.install_config)
+        if needs_rehash(account['password'], params):
+            accounts.update(username, password=hash_password(password, params))
+        return account
+    
+    def finish_login(self, username, account):
+        """Complete login once the password has been checked"""
+        if account is not None:
+            self.current_user = username
+            self.is_admin = account['admin']
+            self.load_user_data()
+        else:
+            messagebox.showerror("Error", "Invalid username or password")
+    
+    def account_store(self):
+        """The account database, migrating users.dat on first use (runs on the I/O worker)"""
+        if self.accounts is None:
+            self.accounts = UserStore(self.install_config['users_db'], self.users_file)
+        return self.accounts
+    
+    def show_io_error(self, error):
+        """Report a failed background read or write"""
+        messagebox.showerror("Disk Error", f"Could not access data files:\n{error}")
     
     def register_user(self):
         """Register a new user"""
@@ -233,28 +413,22 @@ class AdvancedTimeRecordApp:
         if not password:
             return
         
-        hashed_pw = hashlib.sha256(password.encode()).hexdigest()
-        
-        try:
-            with open(self.users_file, "rb") as f:
-                users = pickle.load(f)
-        except FileNotFoundError:
-            users = {}
-        
-        if username in users:
-            messagebox.showerror("Error", "Username already exists")
-            return
-        
-        users[username] = {
-            'password': hashed_pw,
-            'created': datetime.now().strftime("%Y-%m-%d"),
-            'admin': False
-        }
+        def add_account():
+            account = {
+                'password': hash_password(password, hash_params(self.install_config)),
+                'created': datetime.now().strftime("%Y-%m-%d"),
+                'admin': False
+            }
+            return self.account_store().add(username, account)
         
-        with open(self.users_file, "wb") as f:
-            pickle.dump(users, f)
+        def finish_register(added):
+            if added:
+                messagebox.showinfo("Success", "User registered successfully")
+            else:
+                messagebox.showerror("Error", "Username already exists")
         
-        messagebox.showinfo("Success", "User registered successfully")
+        # The insert itself is the existence check, so two kiosks can't both claim a name
+        self.io.submit(add_account, on_done=finish_register, on_error=self.show_io_error)
     
     def recover_password(self):
         """Password recovery workflow"""
@@ -263,9 +437,10 @@ class AdvancedTimeRecordApp:
     
     def load_user_data(self):
         """Load user-specific data"""
-        user_dir = f"users/{self.current_user}"
+        user_dir = self.user_dir()
         if not os.path.exists(user_dir):
             os.makedirs(user_dir)
+        self.store = open_store(self.current_user, self.install_config)
         
         # Load settings
         settings_file = f"{user_dir}/settings.json"
@@ -275,12 +450,29 @@ class AdvancedTimeRecordApp:
         
         # Create main interface before loading records
         self.create_main_interface()
+        self.schedule_backup()
+        if self.install_config['sync_url']:
+            self.io.submit(self.connect_sync, self.sync_client, self.store, self.current_user,
+                           on_done=self.start_sync, on_error=self.show_io_error)
         
-        # Now load records (UI elements exist)
+        # Now load records and summaries (UI elements exist)
         self.load_records()
-        
-        # Load weekly/monthly summaries
-        self.load_summaries()
+    
+    def connect_sync(self, client, store, user):
+        """Open the sync outbox if needed and queue the store's writes in it (runs on the I/O worker)"""
+        client = client or sync_client(self.install_config)
+        client.attach(store, user)
+        return client
+    
+    def start_sync(self, client):
+        """Keep the first login's sync client and start its sender"""
+        if self.sync_client is None:
+            self.sync_client = client
+            client.start()
+    
+    def user_dir(self):
+        """Directory holding the current user's files"""
+        return os.path.join(self.install_config['users_dir'], self.current_user)
     
     def create_main_interface(self):
         """Create the main application interface"""
@@ -335,6 +527,8 @@ class AdvancedTimeRecordApp:
         file_menu.add_command(label="Add Past Records", command=self.add_past_records)
         file_menu.add_command(label="Export to CSV", command=self.export_to_csv)
         file_menu.add_command(label="Export to JSON", command=self.export_to_json)
+        file_menu.add_command(label="Export to NDJSON", command=self.export_to_ndjson)
+        file_menu.add_command(label="Import NDJSON", command=self.import_from_ndjson)
         file_menu.add_separator()
         file_menu.add_command(label="Print Summary", command=self.print_summary)
         file_menu.add_separator()
@@ -360,6 +554,9 @@ class AdvancedTimeRecordApp:
         tools_menu.add_command(label="Calculate Overtime", command=self.calculate_overtime)
         tools_menu.add_command(label="Time Analysis", command=self.show_time_analysis)
         tools_menu.add_command(label="Productivity Stats", command=self.show_productivity_stats)
+        if self.is_admin:
+            tools_menu.add_separator()
+            tools_menu.add_command(label="Team Summary", command=self.show_team_summary)
         menubar.add_cascade(label="Tools", menu=tools_menu)
         
         # Help menu
@@ -377,6 +574,7 @@ class AdvancedTimeRecordApp:
         dialog.geometry("600x500")
         dialog.resizable(False, False)
         dialog.grab_set()  # Make the dialog modal
+        from tkcalendar import DateEntry
 
         # Date selection
         tk.Label(dialog, text="Date:", font=("Arial", 11)).pack(pady=(10, 0))
@@ -426,45 +624,61 @@ class AdvancedTimeRecordApp:
                     messagebox.showerror("Error", "End time must be after start time")
                     return
                 
-                # Add work session
-                self.work_sessions.append({
-                    'date': work_date,
-                    'start': start_datetime,
-                    'end': end_datetime,
-                    'task': task_var.get()
-                })
-                
-                # Add break session if specified
-                break_minutes = break_entry.get()
-                if break_minutes and break_minutes.isdigit():
-                    break_minutes = int(break_minutes)
-                    break_start = start_datetime + (end_datetime - start_datetime) / 2  # Middle of work session
-                    break_end = break_start + timedelta(minutes=break_minutes)
-                    
-                    self.break_sessions.append({
-                        'date': work_date,
-                        'start': break_start,
-                        'end': break_end,
-                        'type': "Manual Break"
-                    })
-                
-                # Save notes if any
-                notes = notes_text.get("1.0", "end-1c")
-                if notes.strip():
-                    # Store notes in a way that makes sense for your app
-                    pass
-                
-                # Update UI and save data
-                self.update_records()
-                self.update_summary()
-                self.save_records()
-                
-                messagebox.showinfo("Success", "Record added successfully")
-                dialog.destroy()
+                # Older days need their sessions in memory to be indexed and totalled
+                task, break_minutes, notes = task_var.get(), break_entry.get(), notes_text.get("1.0", "end-1c")
+                self.ensure_history_loaded(
+                    lambda: add_record(work_date, start_datetime, end_datetime, task, break_minutes, notes), work_date)
                 
             except ValueError as e:
                 messagebox.showerror("Input Error", f"Invalid time format. Please use HH:MM.\nError: {e}")
 
+        def add_record(work_date, start_datetime, end_datetime, task, break_minutes, notes):
+            if not self.confirm_no_overlap(start_datetime, end_datetime):
+                return
+            
+            # Add work session
+            work_session = {
+                'id': self.store.next_id('work'),
+                'date': work_date,
+                'start': start_datetime,
+                'end': end_datetime,
+                'task': task
+            }
+            work_session = self.work_sessions.add(work_session)
+            self.count_session('work', work_session)
+            self.refresh_record('add', 'work', work_session)
+            self.persist_session('add', 'work', work_session)
+            
+            # Add break session if specified
+            if break_minutes and break_minutes.isdigit():
+                break_minutes = int(break_minutes)
+                break_start = start_datetime + (end_datetime - start_datetime) / 2  # Middle of work session
+                break_end = break_start + timedelta(minutes=break_minutes)
+                
+                break_session = {
+                    'id': self.store.next_id('break'),
+                    'date': work_date,
+                    'start': break_start,
+                    'end': break_end,
+                    'type': "Manual Break"
+                }
+                break_session = self.break_sessions.add(break_session)
+                self.count_session('break', break_session)
+                self.refresh_record('add', 'break', break_session)
+                self.persist_session('add', 'break', break_session)
+            
+            # Save notes if any
+            if notes.strip():
+                # Store notes in a way that makes sense for your app
+                pass
+            
+            # Update UI
+            self.update_summary()
+            
+            messagebox.showinfo("Success", "Record added successfully")
+            if dialog.winfo_exists():
+                dialog.destroy()
+
         # Save button
         save_btn = tk.Button(dialog, text="Save Record", command=save_record,
                             bg=self.current_theme['button'], fg="white", font=("Arial", 10))
@@ -663,10 +877,10 @@ class AdvancedTimeRecordApp:
         
         self.records_tree.pack(side="left", fill="both", expand=True)
         
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.records_tree.yview)
+        # Scrollbar, driven by the virtual view so only visible rows are built
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
-        self.records_tree.configure(yscrollcommand=scrollbar.set)
+        self.records_view = VirtualRecordsView(self.records_tree, scrollbar, self.format_record_row)
         
         # Context menu
         self.record_context_menu = tk.Menu(self.root, tearoff=0)
@@ -706,46 +920,148 @@ class AdvancedTimeRecordApp:
         project_tab = ttk.Frame(self.analytics_notebook)
         self.analytics_notebook.add(project_tab, text="By Project")
         
-        # Create charts (will be populated with data)
-        self.create_daily_analytics(daily_tab)
-        self.create_weekly_analytics(weekly_tab)
-        self.create_monthly_analytics(monthly_tab)
-        self.create_project_analytics(project_tab)
+        # Charts are built the first time their tab is shown
+        self.analytics_tabs = {
+            "Today": (daily_tab, self.create_daily_analytics),
+            "This Week": (weekly_tab, self.create_weekly_analytics),
+            "This Month": (monthly_tab, self.create_monthly_analytics),
+            "By Project": (project_tab, self.create_project_analytics)
+        }
+        self.analytics_charts = {}
+        self.analytics_notebook.bind("<<NotebookTabChanged>>", lambda e: self.refresh_analytics())
+    
+    def refresh_analytics(self):
+        """Draw the visible analytics tab if its data is out of date"""
+        if not self.analytics_charts and not self.records_loaded:
+            return  # Nothing worth drawing before the records arrive
+        tab = self.analytics_notebook.select()
+        if not tab:
+            return
+        name = self.analytics_notebook.tab(tab, "text")
+        chart = self.analytics_charts.get(name)
+        if chart is None:
+            parent, create = self.analytics_tabs[name]
+            chart = self.analytics_charts[name] = {'figures': create(parent), 'version': None}
+        
+        if chart['version'] != self.data_version:
+            for figure, canvas, draw in chart['figures']:
+                figure.clear()
+                draw(figure.add_subplot(111))
+                canvas.draw_idle()
+            chart['version'] = self.data_version
+    
+    def schedule_analytics_refresh(self):
+        """Coalesce chart refreshes after data changes into one idle callback"""
+        if not hasattr(self, 'analytics_notebook') or getattr(self, '_analytics_refresh_id', None):
+            return
+        
+        def run():
+            self._analytics_refresh_id = None
+            self.refresh_analytics()
+        self._analytics_refresh_id = self.root.after_idle(run)
+    
+    def close_analytics(self):
+        """Release every cached figure (on logout and window rebuilds)"""
+        for chart in getattr(self, 'analytics_charts', {}).values():
+            for figure, canvas, draw in chart['figures']:
+                figure.clear()
+                canvas.get_tk_widget().destroy()
+        self.analytics_charts = {}
+        if getattr(self, '_analytics_refresh_id', None):
+            self.root.after_cancel(self._analytics_refresh_id)
+        self._analytics_refresh_id = None
+    
+    def make_chart(self, parent, draw, **pack_options):
+        """Create a figure and Tk canvas; pyplot is avoided so figures are not kept globally"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        
+        figure = Figure(figsize=(5, 3), dpi=100)
+        canvas = FigureCanvasTkAgg(figure, master=parent)
+        canvas.get_tk_widget().pack(fill="both", expand=True, **pack_options)
+        return figure, canvas, draw
     
     def create_daily_analytics(self, parent):
         """Create daily analytics charts"""
         # Time distribution pie chart
-        fig, ax = plt.subplots(figsize=(5, 3), dpi=100)
-        ax.set_title("Today's Time Distribution")
-        self.daily_pie_canvas = FigureCanvasTkAgg(fig, master=parent)
-        self.daily_pie_canvas.get_tk_widget().pack(side="left", fill="both", expand=True)
+        pie = self.make_chart(parent, self.draw_daily_pie, side="left")
+        self.daily_pie_canvas = pie[1]
         
         # Productivity timeline
-        fig2, ax2 = plt.subplots(figsize=(5, 3), dpi=100)
-        ax2.set_title("Productivity Timeline")
-        self.daily_timeline_canvas = FigureCanvasTkAgg(fig2, master=parent)
-        self.daily_timeline_canvas.get_tk_widget().pack(side="right", fill="both", expand=True)
+        timeline = self.make_chart(parent, self.draw_daily_timeline, side="right")
+        self.daily_timeline_canvas = timeline[1]
+        return [pie, timeline]
     
     def create_weekly_analytics(self, parent):
         """Create weekly analytics charts"""
-        fig, ax = plt.subplots(figsize=(5, 3), dpi=100)
-        ax.set_title("Weekly Work Hours")
-        self.weekly_bar_canvas = FigureCanvasTkAgg(fig, master=parent)
-        self.weekly_bar_canvas.get_tk_widget().pack(fill="both", expand=True)
+        bar = self.make_chart(parent, self.draw_weekly_bar)
+        self.weekly_bar_canvas = bar[1]
+        return [bar]
     
     def create_monthly_analytics(self, parent):
         """Create monthly analytics charts"""
-        fig, ax = plt.subplots(figsize=(5, 3), dpi=100)
-        ax.set_title("Monthly Overview")
-        self.monthly_line_canvas = FigureCanvasTkAgg(fig, master=parent)
-        self.monthly_line_canvas.get_tk_widget().pack(fill="both", expand=True)
+        line = self.make_chart(parent, self.draw_monthly_line)
+        self.monthly_line_canvas = line[1]
+        return [line]
     
     def create_project_analytics(self, parent):
         """Create project-based analytics charts"""
-        fig, ax = plt.subplots(figsize=(5, 3), dpi=100)
-        ax.set_title("Time by Project")
-        self.project_pie_canvas = FigureCanvasTkAgg(fig, master=parent)
-        self.project_pie_canvas.get_tk_widget().pack(fill="both", expand=True)
+        pie = self.make_chart(parent, self.draw_project_pie)
+        self.project_pie_canvas = pie[1]
+        return [pie]
+    
+    def draw_daily_pie(self, ax):
+        ax.set_title("Today's Time Distribution")
+        day = self.totals.day(self.current_date)
+        hours = [day['net'].total_seconds() / 3600, day['break'].total_seconds() / 3600]
+        if sum(hours) <= 0:
+            ax.text(0.5, 0.5, "No completed sessions today", ha="center", va="center")
+            ax.axis("off")
+            return
+        ax.pie(hours, labels=["Work", "Break"], autopct="%1.1f%%", colors=["#4da6ff", "#ffcc66"])
+    
+    def draw_daily_timeline(self, ax):
+        ax.set_title("Productivity Timeline")
+        now = datetime.now()
+        day_start = datetime.combine(self.current_date, datetime.min.time())
+        for row, (sessions, color) in enumerate(((self.work_sessions, "#4da6ff"),
+                                                 (self.break_sessions, "#ffcc66"))):
+            spans = [(s['start'].hour + s['start'].minute / 60,
+                      ((s['end'] or now) - s['start']).total_seconds() / 3600)
+                     for s in sessions.rows_between(day_start, day_start + timedelta(days=1))]
+            ax.broken_barh(spans, (row * 10, 8), facecolors=color)
+        ax.set_yticks([4, 14])
+        ax.set_yticklabels(["Work", "Break"])
+        ax.set_xlim(0, 24)
+        ax.set_xlabel("Hour of day")
+    
+    def draw_weekly_bar(self, ax):
+        ax.set_title("Weekly Work Hours")
+        monday = self.current_date - timedelta(days=self.current_date.weekday())
+        days = [monday + timedelta(days=i) for i in range(7)]
+        ax.bar([d.strftime("%a") for d in days],
+               [self.rollups.day(d)['worked'].total_seconds() / 3600 for d in days], color="#4da6ff")
+        ax.axhline(self.settings['work_hours_per_day'], color="#ff6666", linestyle="--")
+        ax.set_ylabel("Hours")
+    
+    def draw_monthly_line(self, ax):
+        ax.set_title("Monthly Overview")
+        first = self.current_date.replace(day=1)
+        days = [first + timedelta(days=i) for i in range(self.current_date.day)]
+        ax.plot([d.day for d in days],
+                [self.rollups.day(d)['worked'].total_seconds() / 3600 for d in days], marker="o", color="#0078d7")
+        ax.set_xlabel("Day of month")
+        ax.set_ylabel("Hours")
+    
+    def draw_project_pie(self, ax):
+        ax.set_title("Time by Project (this month)")
+        month = self.monthly_data.get(period_key(self.current_date, 'monthly'))
+        by_task = {task: td.total_seconds() / 3600 for task, td in month['tasks'].items()} if month else {}
+        if not by_task:
+            ax.text(0.5, 0.5, "No completed sessions", ha="center", va="center")
+            ax.axis("off")
+            return
+        ax.pie(list(by_task.values()), labels=list(by_task), autopct="%1.1f%%")
     
     def create_status_bar(self):
         """Create application status bar"""
@@ -760,137 +1076,230 @@ class AdvancedTimeRecordApp:
     
     def clear_window(self):
         """Safely clear all widgets and cancel pending callbacks"""
+        # Release cached chart figures before their widgets go away
+        self.close_analytics()
+        
         # Cancel clock updates
         if hasattr(self, 'clock_update_id'):
             self.root.after_cancel(self.clock_update_id)
             del self.clock_update_id
+        self.label_texts = {}
         
         # Destroy all widgets
         for widget in self.root.winfo_children():
             widget.destroy()
     
     def load_records(self):
-        """Load records for the current user."""
-        user_dir = f"users/{self.current_user}"
-        records_file = f"{user_dir}/records.json"
+        """Load the current user's records inside the login window on the I/O worker."""
+        self.window_start = window_start_date(self.settings['load_window'], self.current_date)
+        self.history_loaded = self.window_start is None
+        self.records_loaded = False
         
-        if os.path.exists(records_file):
-            with open(records_file, "r") as f:
-                data = json.load(f)
-                
-                # Load work sessions
-                self.work_sessions = []
-                for session in data.get("work_sessions", []):
-                    start = datetime.fromisoformat(session['start']) if session['start'] else None
-                    end = datetime.fromisoformat(session['end']) if session['end'] else None
-                    self.work_sessions.append({
-                        'date': self.current_date,
-                        'start': start,
-                        'end': end,
-                        'task': session.get('task', 'General Work')
-                    })
-                
-                # Load break sessions
-                self.break_sessions = []
-                for session in data.get("break_sessions", []):
-                    start = datetime.fromisoformat(session['start']) if session['start'] else None
-                    end = datetime.fromisoformat(session['end']) if session['end'] else None
-                    self.break_sessions.append({
-                        'date': self.current_date,
-                        'start': start,
-                        'end': end,
-                        'type': session.get('type', 'Lunch')
-                    })
+        # No punches until the existing records are in memory
+        self.clock_in_btn.config(state="disabled")
+        self.update_status("Loading records...")
+        self.io.submit(self.read_records, self.store, self.user_dir(), self.window_start,
+                       on_done=self.finish_loading_records, on_error=self.show_io_error)
+    
+    def read_records(self, store, user_dir, since):
+        """Read and parse records and summaries (runs on the I/O worker)"""
+        rollups = read_rollups(user_dir, store.fingerprint(), self.settings['overtime_threshold'])
+        state = store.load_sessions(since=since)
+        work_sessions, break_sessions = state['work'], state['break']
+        for session in work_sessions + break_sessions:
+            if session['date'] is None:
+                session['date'] = self.current_date  # Never started; file it under today
+        partial = rollups is None and since is not None
+        if rollups is None:
+            # Missing or stale: count the login window now, older days once the history loads
+            rollups = SummaryRollups(self.settings['overtime_threshold'])
+            rollups.rebuild(work_sessions, break_sessions)
+        else:
+            rollups.warm(work_sessions, break_sessions)
+        return store, SessionColumns('work', work_sessions), SessionColumns('break', break_sessions), rollups, partial
+    
+    def finish_loading_records(self, result):
+        """Install loaded records and refresh the UI."""
+        store, work_sessions, break_sessions, rollups, partial = result
+        if store is not self.store:
+            return  # User logged out while loading
+        
+        self.work_sessions = work_sessions
+        self.break_sessions = break_sessions
+        self.rollups = rollups
+        self.rollups_partial = partial
+        self.weekly_data = rollups.weeks
+        self.monthly_data = rollups.months
+        self.records_loaded = True
+        self.data_version += 1
+        
+        self.totals = DailyTotals(self.settings['overtime_threshold'])
+        self.totals.rebuild(self.window_rows(self.work_sessions), self.window_rows(self.break_sessions))
         
         # Update UI if widgets exist
         if hasattr(self, 'records_tree'):
             self.update_records()
             self.update_summary()
+            if not (self.clock_in_time and not self.clock_out_time):
+                self.clock_in_btn.config(state="normal")
+            self.update_status("Ready")
+            self.refresh_analytics()
+        
+        waiters, self.history_waiters = self.history_waiters, []
+        for then, since in waiters:
+            self.ensure_history_loaded(then, since)
+        if partial:
+            # Complete the rollups in the background, then save them so the next login reuses them
+            self.ensure_history_loaded(self.save_summaries)
+    
+    def ensure_history_loaded(self, then, since=None):
+        """Call then() once every session from `since` on (default: all of them) is in memory.
+        
+        Sessions older than the login window are read on the I/O worker the
+        first time they are needed; until then callers simply wait.
+        """
+        if self.records_loaded and (self.history_loaded or (since is not None and since >= self.window_start)):
+            then()
+            return
+        self.history_waiters.append((then, since))
+        if not self.records_loaded or self.history_loading:
+            return  # finish_loading_records / finish_loading_history will get to it
+        
+        self.history_loading = True
+        self.update_status("Loading full history...")
+        # Queued behind every pending journal write; later changes are already in memory
+        window_ids = {'work': set(self.work_sessions.ids), 'break': set(self.break_sessions.ids)}
+        hours = self.settings['overtime_threshold'] if self.rollups_partial else None
+        self.io.submit(self.read_history, self.store, window_ids, hours,
+                       on_done=self.finish_loading_history, on_error=self.history_failed)
+    
+    def read_history(self, store, window_ids, rollup_hours=None):
+        """Sessions outside the login window as columns, plus their interval index (runs on the I/O worker)
+        
+        With rollup_hours, the older sessions' own SummaryRollups instead, to
+        complete rollups that so far only count the login window.
+        """
+        state = store.load_sessions()
+        older = {kind: [s for s in state[kind] if s['id'] not in window_ids[kind]] for kind in ('work', 'break')}
+        if rollup_hours is None:
+            history = day_index(older['work'], older['break'])
+        else:
+            history = SummaryRollups(rollup_hours)
+            history.rebuild(older['work'], older['break'])
+        return store, SessionColumns('work', older['work']), SessionColumns('break', older['break']), history
+    
+    def finish_loading_history(self, result):
+        """Put the older sessions in front of the login window's and run whatever waited for them."""
+        store, work_history, break_history, history = result
+        if store is not self.store:
+            return  # User logged out while loading
+        
+        # In place; the records view holds row views into the columns
+        self.work_sessions.prepend(work_history)
+        self.break_sessions.prepend(break_history)
+        self.history_loaded = True
+        self.history_loading = False
+        if self.rollups and self.rollups_partial:
+            self.rollups.merge(history)
+            self.rollups_partial = False
+            self.weekly_data, self.monthly_data = self.rollups.weeks, self.rollups.months
+        elif self.rollups:
+            self.rollups.warm_from(*history)
+        self.update_status("Ready")
+        
+        waiters, self.history_waiters = self.history_waiters, []
+        for then, _ in waiters:
+            then()
+    
+    def history_failed(self, error):
+        self.history_loading = False
+        self.history_waiters = []
+        self.show_io_error(error)
+    
+    def in_login_window(self, session):
+        """True if a session belongs to the window shown in the main view."""
+        if self.window_start is None or not session['start'] or not session['end']:
+            return True
+        return session['start'].date() >= self.window_start
+    
+    def window_rows(self, sessions):
+        """Row views of the sessions in the login window, selected on the columns"""
+        if self.window_start is None:
+            return list(sessions)
+        return sessions.rows_between(datetime.combine(self.window_start, datetime.min.time()), include_open=True)
     
     def update_records(self):
-        """Update the records displayed in the Treeview."""
-        # Clear existing records
-        for item in self.records_tree.get_children():
-            self.records_tree.delete(item)
-        
-        # Add work sessions
-        for idx, session in enumerate(self.work_sessions):
-            start_time = session['start'].strftime('%I:%M:%S %p') if session['start'] else "--:-- --"
-            end_time = session['end'].strftime('%I:%M:%S %p') if session['end'] else "--:-- --"
-            duration = str(session['end'] - session['start']).split('.')[0] if session['start'] and session['end'] else "In progress"
-            self.records_tree.insert("", "end", values=(
-                idx + 1, 
-                "Work", 
-                start_time, 
-                end_time, 
-                duration, 
-                session.get('task', 'General Work'),
-                ""
-            ))
-        
-        # Add break sessions
-        for idx, session in enumerate(self.break_sessions):
-            start_time = session['start'].strftime('%I:%M:%S %p') if session['start'] else "--:-- --"
-            end_time = session['end'].strftime('%I:%M:%S %p') if session['end'] else "--:-- --"
-            duration = str(session['end'] - session['start']).split('.')[0] if session['start'] and session['end'] else "In progress"
-            self.records_tree.insert("", "end", values=(
-                idx + 1, 
-                "Break", 
-                start_time, 
-                end_time, 
-                duration, 
-                session.get('type', 'Lunch'),
-                ""
-            ))
+        """Reset the records view to every session in the login window."""
+        rows = [('work', s) for s in self.window_rows(self.work_sessions)]
+        rows += [('break', s) for s in self.window_rows(self.break_sessions)]
+        self.records_view.set_rows(rows)
+    
+    def refresh_record(self, op, kind, session):
+        """Apply a single add/update/delete to the records view."""
+        if op == 'delete' or not self.in_login_window(session):
+            self.records_view.delete(kind, session)
+        elif self.records_view.has(kind, session):
+            self.records_view.update(kind, session)
+        else:
+            # Work rows are listed before break rows
+            index = self.records_view.kind_counts['work'] if kind == 'work' else None
+            self.records_view.insert(kind, session, index)
+    
+    def format_record_row(self, kind, session):
+        """Build the Treeview values for one session (only called for visible rows)."""
+        start_time = session['start'].strftime('%I:%M:%S %p') if session['start'] else "--:-- --"
+        end_time = session['end'].strftime('%I:%M:%S %p') if session['end'] else "--:-- --"
+        duration = str(session['end'] - session['start']).split('.')[0] if session['start'] and session['end'] else "In progress"
+        if kind == 'work':
+            return (session['id'] + 1, "Work", start_time, end_time, duration,
+                    session.get('task', 'General Work'), "")
+        return (session['id'] + 1, "Break", start_time, end_time, duration,
+                session.get('type', 'Lunch'), "")
     
     def update_summary(self):
         """Update the daily summary section with hours-only display."""
         if not hasattr(self, 'total_work_summary'):
             return
 
-        # Calculate totals (same as before)
-        total_worked = timedelta()
-        for session in self.work_sessions:
-            if session['start'] and session['end']:
-                total_worked += (session['end'] - session['start'])
-
-        total_break = timedelta()
-        for session in self.break_sessions:
-            if session['start'] and session['end']:
-                total_break += (session['end'] - session['start'])
-
-        net_work = total_worked - total_break
-
-        # New: Convert timedelta to total hours (e.g., "346:45:00")
-        def format_as_hours(td):
-            total_seconds = int(td.total_seconds())
-            hours = total_seconds // 3600
-            remainder = total_seconds % 3600
-            minutes = remainder // 60
-            seconds = remainder % 60
-            return f"{hours}:{minutes:02d}:{seconds:02d}"
-
-        # Update UI labels with hours-only format
-        self.total_work_summary.config(text=format_as_hours(total_worked))
-        self.total_break_summary.config(text=format_as_hours(total_break))
-        self.net_work_summary.config(text=format_as_hours(net_work))
-
-        # Overtime calculation (per-day basis)
-        daily_threshold = timedelta(hours=self.settings['work_hours_per_day'])
-        daily_totals = {}
-        for session in self.work_sessions:
-            if session['start'] and session['end']:
-                date = session['start'].date()
-                duration = session['end'] - session['start']
-                daily_totals[date] = daily_totals.get(date, timedelta()) + duration
-
-        overtime = timedelta()
-        for day_total in daily_totals.values():
-            if day_total > daily_threshold:
-                overtime += (day_total - daily_threshold)
-
-        self.overtime_label.config(text=format_as_hours(overtime))
+        # Running totals over the login window, kept current by count_session
+        self.total_work_summary.config(text=self.format_timedelta(self.totals.total_worked))
+        self.total_break_summary.config(text=self.format_timedelta(self.totals.total_break))
+        self.net_work_summary.config(text=self.format_timedelta(self.totals.net_work))
+        self.overtime_label.config(text=self.format_timedelta(self.totals.overtime))
+    
+    def confirm_no_overlap(self, start, end, exclude_id=None):
+        """Ask before saving a work session that overlaps or duplicates another one"""
+        clashes = self.rollups.index.overlapping('work', start, end, exclude_id) if self.rollups else []
+        if not clashes:
+            return True
+        existing = ", ".join(f"{s.strftime('%Y-%m-%d %I:%M %p')} - {e.strftime('%I:%M %p')}"
+                             for s, e, _ in clashes[:3])
+        return messagebox.askyesno("Overlapping Record",
+                                   f"This overlaps existing work: {existing}.\nSave anyway?")
+    
+    def count_session(self, kind, session, remove=False):
+        """Add a closed session to (or remove it from) the running totals"""
+        # Rollups cover the whole history, the summary panel only the login window
+        if self.rollups:
+            if remove:
+                self.rollups.remove(kind, session)
+            else:
+                self.rollups.add(kind, session)
+        if not self.in_login_window(session):
+            return
+        if kind == 'break' and self.in_current_shift(session) and session['start'] != self.break_start_time:
+            # An edited or back-filled break; end_break() keeps the live one counted itself
+            self.shift_break = None
+        if remove:
+            self.totals.remove(kind, session)
+        else:
+            self.totals.add(kind, session)
         
+    def in_current_shift(self, session):
+        """Whether a closed session ends after the current clock-in"""
+        return bool(self.clock_in_time and not self.clock_out_time and session['end']
+                    and session['end'] > self.clock_in_time)
+    
     def format_timedelta(self, td):
         """Convert timedelta to HH:MM:SS format without days"""
         total_seconds = int(td.total_seconds())
@@ -901,6 +1310,8 @@ class AdvancedTimeRecordApp:
     def clock_in(self):
         """Record clock-in time"""
         self.clock_in_time = datetime.now()
+        self.clock_out_time = None
+        self.shift_break = timedelta()
         self.clock_in_display.config(text=f"Clock In: {self.clock_in_time.strftime('%I:%M %p')}")
         self.status_label.config(text="Status: Clocked in")
         self.clock_in_btn.config(state="disabled")
@@ -908,15 +1319,17 @@ class AdvancedTimeRecordApp:
         self.start_break_btn.config(state="normal")
         
         # Add to work sessions
-        self.work_sessions.append({
+        session = {
+            'id': self.store.next_id('work'),
             'date': self.current_date,
             'start': self.clock_in_time,
             'end': None,
             'task': self.task_var.get()
-        })
+        }
+        session = self.work_sessions.add(session)
         
-        self.update_records()
-        self.save_records()
+        self.refresh_record('add', 'work', session)
+        self.persist_session('add', 'work', session)
     
     def clock_out(self):
         """Record clock-out time"""
@@ -929,34 +1342,42 @@ class AdvancedTimeRecordApp:
         
         # Update last work session
         if self.work_sessions:
-            self.work_sessions[-1]['end'] = self.clock_out_time
+            session = self.work_sessions[-1]
+            self.count_session('work', session, remove=True)
+            session['end'] = self.clock_out_time
+            self.count_session('work', session)
+            self.refresh_record('update', 'work', session)
+            self.persist_session('update', 'work', session)
         
-        self.update_records()
         self.update_summary()
-        self.save_records()
     
     def start_break(self):
         """Record break start time"""
         self.break_start_time = datetime.now()
+        self.break_end_time = None
         self.break_start_display.config(text=f"Break Start: {self.break_start_time.strftime('%I:%M %p')}")
         self.break_status_label.config(text="Break: On break")
         self.start_break_btn.config(state="disabled")
         self.end_break_btn.config(state="normal")
         
         # Add to break sessions
-        self.break_sessions.append({
+        session = {
+            'id': self.store.next_id('break'),
             'date': self.current_date,
             'start': self.break_start_time,
             'end': None,
             'type': self.break_type_var.get()
-        })
+        }
+        session = self.break_sessions.add(session)
         
-        self.update_records()
-        self.save_records()
+        self.refresh_record('add', 'break', session)
+        self.persist_session('add', 'break', session)
     
     def end_break(self):
         """Record break end time"""
         self.break_end_time = datetime.now()
+        if self.shift_break is not None and self.clock_in_time:
+            self.shift_break += self.break_end_time - max(self.break_start_time, self.clock_in_time)
         self.break_end_display.config(text=f"Break End: {self.break_end_time.strftime('%I:%M %p')}")
         self.break_status_label.config(text="Break: Not on break")
         self.end_break_btn.config(state="disabled")
@@ -964,69 +1385,190 @@ class AdvancedTimeRecordApp:
         
         # Update last break session
         if self.break_sessions:
-            self.break_sessions[-1]['end'] = self.break_end_time
+            session = self.break_sessions[-1]
+            self.count_session('break', session, remove=True)
+            session['end'] = self.break_end_time
+            self.count_session('break', session)
+            self.refresh_record('update', 'break', session)
+            self.persist_session('update', 'break', session)
         
-        self.update_records()
         self.update_summary()
-        self.save_records()
     
     def save_notes(self):
         """Save user notes"""
         notes = self.notes_text.get("1.0", "end-1c")
+        event = self.store.stage('notes', text=notes)
+        self.io.append('journal', self.store.write_events, event, on_error=self.show_io_error)
+        self.schedule_sync()
         messagebox.showinfo("Notes Saved", "Your notes have been saved for this session.")
     
-    def save_records(self):
-        """Save records to file"""
-        user_dir = f"users/{self.current_user}"
-        if not os.path.exists(user_dir):
-            os.makedirs(user_dir)
-        
-        data = {
-            "work_sessions": [],
-            "break_sessions": [],
-            "notes": self.notes_text.get("1.0", "end-1c")
-        }
-        
-        for session in self.work_sessions:
-            data["work_sessions"].append({
-                "start": session['start'].isoformat() if session['start'] else None,
-                "end": session['end'].isoformat() if session['end'] else None,
-                "task": session.get('task', 'General Work')
-            })
+    def persist_session(self, op, kind, session):
+        """Queue one session change for the journal, compacting when it grows long"""
+        self.data_version += 1
+        self.schedule_analytics_refresh()
+        
+        # Bursts of changes are written by the worker as a single append (and,
+        # with sync on, queued for the server by that same write)
+        event = self.store.stage(op, kind, session)
+        self.io.append('journal', self.store.write_events, event, on_error=self.show_io_error)
+        self.schedule_sync()
+        if self.store.needs_compaction():
+            self.save_records()
+    
+    def schedule_sync(self):
+        """With the 'interval' durability policy, fsync the journal a few seconds after a write"""
+        if self.install_config['durability'] != 'interval' or hasattr(self, 'sync_id'):
+            return
+        store = self.store
         
-        for session in self.break_sessions:
-            data["break_sessions"].append({
-                "start": session['start'].isoformat() if session['start'] else None,
-                "end": session['end'].isoformat() if session['end'] else None,
-                "type": session.get('type', 'Lunch')
-            })
+        def sync():
+            del self.sync_id
+            self.io.submit(store.sync, key='sync', on_error=self.show_io_error)
+        self.sync_id = self.root.after(int(self.install_config['fsync_interval'] * 1000), sync)
+    
+    def close_store(self):
+        """Queue the final fsync/close of the current store behind any pending writes"""
+        if hasattr(self, 'sync_id'):
+            self.root.after_cancel(self.sync_id)
+            del self.sync_id
+        if hasattr(self, 'backup_id'):
+            self.root.after_cancel(self.backup_id)
+            del self.backup_id
+        if self.store:
+            if self.settings['auto_backup']:
+                self.start_backup()
+            self.io.submit(self.store.close, on_error=self.show_io_error)
+    
+    def save_records(self):
+        """Queue a snapshot rewrite and truncation of the journal on the I/O worker
         
-        with open(f"{user_dir}/records.json", "w") as f:
-            json.dump(data, f, indent=4)
+        The worker folds the journal into the snapshot from disk, behind every
+        queued write, so nothing is loaded or serialized on the Tk thread.
+        """
+        self.store.stage_rewrite()
+        self.io.submit(self.store.rewrite_snapshot, self.notes_text.get("1.0", "end-1c"),
+                       key='snapshot', on_error=self.show_io_error)
+        self.save_summaries()
+    
+    def save_summaries(self):
+        """Queue a write of the daily/weekly/monthly rollup files"""
+        if not self.rollups or self.rollups_partial:
+            return  # Rollups of the login window alone would pass for the whole history
+        store, user_dir = self.store, self.user_dir()
+        data, hours = self.rollups.to_json(), self.rollups.work_hours_per_day
+        
+        # The fingerprint is taken after every earlier queued write has landed
+        def write():
+            write_rollups(user_dir, data, store.fingerprint(), hours)
+        self.io.submit(write, key='summaries', on_error=self.show_io_error)
     
     def export_to_csv(self):
-        """Export records to CSV file"""
+        """Export records to a CSV file, streamed from storage"""
         file_path = filedialog.asksaveasfilename(defaultextension=".csv",
                                                 filetypes=[("CSV files", "*.csv")],
                                                 title="Save as CSV")
         if file_path:
-            with open(file_path, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(["Type", "Date", "Start Time", "End Time", "Duration", "Task/Type", "Details"])
-                
-                for session in self.work_sessions:
-                    start_time = session['start'].strftime('%I:%M:%S %p') if session['start'] else ""
-                    end_time = session['end'].strftime('%I:%M:%S %p') if session['end'] else ""
-                    duration = str(session['end'] - session['start']).split('.')[0] if session['end'] else ""
-                    writer.writerow(["Work", session['date'], start_time, end_time, duration, session.get('task', 'General Work'), ""])
-                
-                for session in self.break_sessions:
-                    start_time = session['start'].strftime('%I:%M:%S %p') if session['start'] else ""
-                    end_time = session['end'].strftime('%I:%M:%S %p') if session['end'] else ""
-                    duration = str(session['end'] - session['start']).split('.')[0] if session['end'] else ""
-                    writer.writerow(["Break", session['date'], start_time, end_time, duration, session.get('type', 'Lunch'), ""])
-            
-            messagebox.showinfo("Export Successful", f"Data exported to {file_path}")
+            self.ask_export_filters("Export to CSV", lambda filters: self.start_csv_export(file_path, filters))
+    
+    def start_csv_export(self, file_path, filters):
+        """Stream the filtered sessions to CSV on the I/O worker, reporting progress"""
+        self.start_streaming_export(
+            "CSV", file_path, lambda store, progress:
+            write_csv(file_path, csv_rows(export_sessions(store, **filters)), progress))
+    
+    def export_to_ndjson(self):
+        """Export sessions as newline-delimited JSON, one session per line"""
+        file_path = filedialog.asksaveasfilename(defaultextension=".ndjson",
+                                                filetypes=[("NDJSON files", "*.ndjson"), ("All files", "*.*")],
+                                                title="Save as NDJSON")
+        if file_path:
+            self.ask_export_filters("Export to NDJSON", lambda filters: self.start_streaming_export(
+                "NDJSON", file_path, lambda store, progress:
+                write_ndjson(file_path, export_sessions(store, **filters), progress)))
+    
+    def start_streaming_export(self, format_name, file_path, write):
+        """Run write(store, progress) on the I/O worker with its own store handle"""
+        username, config = self.current_user, self.install_config
+        
+        def progress(count):
+            self.io.report(lambda n: self.update_status(f"Exporting to {format_name}... {n} rows"), count)
+        
+        # Runs after any queued writes, so the export sees every punch made so far
+        def export():
+            store = open_store(username, config)
+            try:
+                return write(store, progress)
+            finally:
+                store.close()
+        
+        self.update_status(f"Exporting to {format_name}...")
+        self.io.submit(export, on_done=lambda _: self.finish_export(file_path), on_error=self.show_io_error)
+    
+    def import_from_ndjson(self):
+        """Merge sessions from an NDJSON export into this user's records"""
+        if self.clock_in_time and not self.clock_out_time:
+            messagebox.showwarning("Import", "Please clock out before importing records.")
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("NDJSON files", "*.ndjson"), ("All files", "*.*")],
+                                              title="Import NDJSON")
+        if not file_path:
+            return
+        store = self.store
+        
+        def progress(count):
+            self.io.report(lambda n: self.update_status(f"Importing... {n} sessions read"), count)
+        
+        def finish_import(counts):
+            if store is not self.store:
+                return  # User logged out while importing
+            added, updated, skipped = counts
+            self.load_records()
+            messagebox.showinfo("Import Complete",
+                                f"Added {added} sessions, closed {updated} open sessions, "
+                                f"skipped {skipped} already present.")
+        
+        self.update_status("Importing...")
+        self.io.submit(lambda: import_sessions(store, read_ndjson(file_path), progress),
+                       on_done=finish_import, on_error=self.show_io_error)
+    
+    def ask_export_filters(self, title, on_ok):
+        """Ask for a date range, session type, task and break type; calls on_ok(filters)"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+        dialog.resizable(False, False)
+        dialog.grab_set()
+        
+        fields = {}
+        for key, label in (('start_date', "From (YYYY-MM-DD, blank for all):"),
+                           ('end_date', "To (YYYY-MM-DD, blank for all):")):
+            tk.Label(dialog, text=label, font=("Arial", 11)).pack(pady=(10, 0), padx=20)
+            fields[key] = tk.Entry(dialog, font=("Arial", 11))
+            fields[key].pack(pady=5)
+        
+        choices = (('kinds', "Sessions:", ["All", "Work", "Break"]),
+                   ('task', "Task/Project:", ["All", "General Work", "Project A", "Project B", "Meeting", "Training"]),
+                   ('break_type', "Break Type:", ["All", "Lunch", "Short Break", "Meeting", "Personal", "Manual Break"]))
+        for key, label, values in choices:
+            tk.Label(dialog, text=label, font=("Arial", 11)).pack(pady=(10, 0))
+            fields[key] = tk.StringVar(value="All")
+            ttk.Combobox(dialog, textvariable=fields[key], values=values).pack(pady=5)
+        
+        def submit():
+            try:
+                dates = {key: datetime.strptime(fields[key].get().strip(), "%Y-%m-%d").date()
+                         if fields[key].get().strip() else None
+                         for key in ('start_date', 'end_date')}
+            except ValueError:
+                messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format", parent=dialog)
+                return
+            kinds = {"Work": ('work',), "Break": ('break',)}.get(fields['kinds'].get(), ('work', 'break'))
+            labels = {key: None if fields[key].get() in ("", "All") else fields[key].get()
+                      for key in ('task', 'break_type')}
+            dialog.destroy()
+            on_ok(dict(dates, kinds=kinds, **labels))
+        
+        tk.Button(dialog, text="Export", command=submit,
+                  bg=self.current_theme['button'], fg="white").pack(pady=15)
     
     def export_to_json(self):
         """Export records to JSON file"""
@@ -1034,123 +1576,193 @@ class AdvancedTimeRecordApp:
                                                 filetypes=[("JSON files", "*.json")],
                                                 title="Save as JSON")
         if file_path:
-            data = {
-                "date": str(self.current_date),
-                "work_sessions": [],
-                "break_sessions": [],
-                "notes": self.notes_text.get("1.0", "end-1c")
-            }
-            
-            for session in self.work_sessions:
-                data["work_sessions"].append({
-                    "start": session['start'].isoformat() if session['start'] else None,
-                    "end": session['end'].isoformat() if session['end'] else None,
-                    "task": session.get('task', 'General Work'),
-                    "duration": str(session['end'] - session['start']) if session['end'] else None
-                })
-            
-            for session in self.break_sessions:
-                data["break_sessions"].append({
-                    "start": session['start'].isoformat() if session['start'] else None,
-                    "end": session['end'].isoformat() if session['end'] else None,
-                    "type": session.get('type', 'Lunch'),
-                    "duration": str(session['end'] - session['start']) if session['end'] else None
-                })
-            
-            with open(file_path, 'w') as file:
-                json.dump(data, file, indent=4)
+            # Runs on the I/O worker against copies of the sessions
+            def write_json(work_sessions, break_sessions, notes):
+                data = {
+                    "date": str(self.current_date),
+                    "work_sessions": [],
+                    "break_sessions": [],
+                    "notes": notes
+                }
+                
+                for session in work_sessions:
+                    data["work_sessions"].append({
+                        "start": session['start'].isoformat() if session['start'] else None,
+                        "end": session['end'].isoformat() if session['end'] else None,
+                        "task": session.get('task', 'General Work'),
+                        "duration": str(session['end'] - session['start']) if session['end'] else None
+                    })
+                
+                for session in break_sessions:
+                    data["break_sessions"].append({
+                        "start": session['start'].isoformat() if session['start'] else None,
+                        "end": session['end'].isoformat() if session['end'] else None,
+                        "type": session.get('type', 'Lunch'),
+                        "duration": str(session['end'] - session['start']) if session['end'] else None
+                    })
+                
+                with open(file_path, 'w') as file:
+                    json.dump(data, file, indent=4)
             
-            messagebox.showinfo("Export Successful", f"Data exported to {file_path}")
+            def export():
+                self.update_status("Exporting to JSON...")
+                self.io.submit(write_json, [dict(s) for s in self.work_sessions],
+                               [dict(s) for s in self.break_sessions], self.notes_text.get("1.0", "end-1c"),
+                               on_done=lambda _: self.finish_export(file_path), on_error=self.show_io_error)
+            self.ensure_history_loaded(export)
     
-    def print_summary(self):
-        """Generate printable summary"""
-        html = f"""
-        <html>
-        <head>
-            <title>Daily Time Record - {self.current_date}</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                h1 {{ color: #0078d7; }}
-                table {{ border-collapse: collapse; width: 100%; margin-bottom: 20px; }}
-                th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                th {{ background-color: #e6f2ff; }}
-                .summary {{ background-color: #f5f5f5; padding: 15px; margin-bottom: 20px; }}
-            </style>
-        </head>
-        <body>
-            <h1>Daily Time Record - {self.current_date}</h1>
-            
-            <div class="summary">
-                <h2>Summary</h2>
-                <p><strong>Total Work Time:</strong> {self.total_work_summary.cget("text")}</p>
-                <p><strong>Total Break Time:</strong> {self.total_break_summary.cget("text")}</p>
-                <p><strong>Net Work Time:</strong> {self.net_work_summary.cget("text")}</p>
-                <p><strong>Overtime:</strong> {self.overtime_label.cget("text")}</p>
-            </div>
-            
-            <h2>Time Records</h2>
-            <table>
-                <tr>
-                    <th>Type</th>
-                    <th>Start Time</th>
-                    <th>End Time</th>
-                    <th>Duration</th>
-                    <th>Task/Type</th>
-                </tr>
-        """
+    def finish_export(self, file_path):
+        """Report a completed background export"""
+        self.update_status("Ready")
+        messagebox.showinfo("Export Successful", f"Data exported to {file_path}")
+    
+    def ask_date_range(self, title, on_ok, start_date=None, end_date=None):
+        """Ask for a from/to date range (defaults to today); calls on_ok(start_date, end_date)"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+        dialog.resizable(False, False)
+        dialog.grab_set()
         
-        for session in self.work_sessions:
-            start_time = session['start'].strftime('%I:%M:%S %p') if session['start'] else "--:-- --"
-            end_time = session['end'].strftime('%I:%M:%S %p') if session['end'] else "--:-- --"
-            duration = str(session['end'] - session['start']).split('.')[0] if session['end'] else "In progress"
-            html += f"""
-                <tr>
-                    <td>Work</td>
-                    <td>{start_time}</td>
-                    <td>{end_time}</td>
-                    <td>{duration}</td>
-                    <td>{session.get('task', 'General Work')}</td>
-                </tr>
-            """
-        
-        for session in self.break_sessions:
-            start_time = session['start'].strftime('%I:%M:%S %p') if session['start'] else "--:-- --"
-            end_time = session['end'].strftime('%I:%M:%S %p') if session['end'] else "--:-- --"
-            duration = str(session['end'] - session['start']).split('.')[0] if session['end'] else "In progress"
-            html += f"""
-                <tr>
-                    <td>Break</td>
-                    <td>{start_time}</td>
-                    <td>{end_time}</td>
-                    <td>{duration}</td>
-                    <td>{session.get('type', 'Lunch')}</td>
-                </tr>
-            """
-        
-        html += f"""
-            </table>
-            
-            <h2>Notes</h2>
-            <p>{self.notes_text.get("1.0", "end-1c") or "No notes recorded."}</p>
-            
-            <p style="margin-top: 30px;">Generated on {datetime.now().strftime('%Y-%m-%d %I:%M %p')}</p>
-        </body>
-        </html>
-        """
+        fields = {}
+        for key, label, default in (('start_date', "From (YYYY-MM-DD):", start_date or self.current_date),
+                                    ('end_date', "To (YYYY-MM-DD):", end_date or self.current_date)):
+            tk.Label(dialog, text=label, font=("Arial", 11)).pack(pady=(10, 0), padx=20)
+            fields[key] = tk.Entry(dialog, font=("Arial", 11))
+            fields[key].insert(0, default.isoformat())
+            fields[key].pack(pady=5)
         
-        temp_file = "temp_summary.html"
-        with open(temp_file, "w") as f:
-            f.write(html)
+        def submit():
+            try:
+                start, end = (datetime.strptime(fields[key].get().strip(), "%Y-%m-%d").date()
+                              for key in ('start_date', 'end_date'))
+            except ValueError:
+                messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format", parent=dialog)
+                return
+            if start > end:
+                messagebox.showerror("Error", "The start date must not be after the end date", parent=dialog)
+                return
+            dialog.destroy()
+            on_ok(start, end)
         
-        webbrowser.open(temp_file)
+        tk.Button(dialog, text="OK", command=submit,
+                  bg=self.current_theme['button'], fg="white").pack(pady=15)
+    
+    def print_summary(self):
+        """Ask for a date range and open a printable summary of it"""
+        self.ask_date_range("Print Summary", self.write_summary)
+    
+    def write_summary(self, start_date, end_date):
+        """Render a summary of a date range on the I/O worker and open it in the browser"""
+        self.ensure_history_loaded(lambda: self.render_summary(start_date, end_date), start_date)
+    
+    def render_summary(self, start_date, end_date):
+        """Queue the HTML for a date range whose sessions are all in memory"""
+        rows = day_rows(self.work_sessions, self.break_sessions, start_date, end_date)
+        totals = self.rollups or self.totals
+        days = [(day, rows[day], totals.day(day)) for day in sorted(rows)]
+        range_totals = {field: sum((day_totals[field] for _, _, day_totals in days), timedelta())
+                        for field in ('worked', 'break', 'net', 'overtime')}
+        if start_date == end_date:
+            title = f"Daily Time Record - {start_date}"
+        else:
+            title = f"Time Record - {start_date} to {end_date}"
+        
+        self.update_status("Preparing summary...")
+        self.io.submit(self.summary_renderer.write, summary_path(self.current_user), title, days, range_totals,
+                       self.notes_text.get("1.0", "end-1c"),
+                       on_done=self.open_summary, on_error=self.show_io_error)
+    
+    def open_summary(self, path):
+        self.update_status("Ready")
+        webbrowser.open(pathlib.Path(path).as_uri())
     
     def backup_data(self):
-        """Backup user data to cloud"""
-        messagebox.showinfo("Backup", "This feature would backup your data to the cloud in a real implementation")
+        """Snapshot this user's directory into the backup directory"""
+        self.update_status("Backing up...")
+        self.start_backup(on_done=self.finish_backup)
+    
+    def start_backup(self, on_done=None):
+        """Queue an incremental backup behind any pending writes"""
+        config, name, base_dir, paths = self.install_config, *user_backup(self.install_config, self.current_user)
+        self.io.submit(lambda: BackupRepository(config['backup_dir']).backup(name, base_dir, paths),
+                       key='backup', on_done=on_done, on_error=self.show_io_error)
+    
+    def finish_backup(self, result):
+        snapshot_id, stats = result
+        self.update_status("Ready")
+        messagebox.showinfo("Backup", f"Backed up {stats['files']} files to {self.install_config['backup_dir']} "
+                                      f"({stats['new_chunks']} new chunks, {stats['written_bytes']} bytes written).")
+    
+    def schedule_backup(self):
+        """With the auto_backup setting on, back up every backup_interval_minutes"""
+        if not self.settings['auto_backup'] or hasattr(self, 'backup_id'):
+            return
+        
+        def backup():
+            del self.backup_id
+            self.start_backup()
+            self.schedule_backup()
+        self.backup_id = self.root.after(int(self.install_config['backup_interval_minutes'] * 60000), backup)
     
     def restore_data(self):
-        """Restore user data from cloud"""
-        messagebox.showinfo("Restore", "This feature would restore your data from the cloud in a real implementation")
+        """Pick one of this user's backup snapshots and restore it"""
+        if self.clock_in_time and not self.clock_out_time:
+            messagebox.showwarning("Restore", "Please clock out before restoring records.")
+            return
+        repository = BackupRepository(self.install_config['backup_dir'])
+        name = user_backup(self.install_config, self.current_user)[0]
+        
+        def list_snapshots():
+            return [(snapshot_id, repository.manifest(name, snapshot_id)) for snapshot_id in repository.snapshots(name)]
+        
+        self.io.submit(list_snapshots, on_done=lambda snapshots: self.ask_restore(repository, snapshots),
+                       on_error=self.show_io_error)
+    
+    def ask_restore(self, repository, snapshots):
+        """Dialog listing snapshots, newest first"""
+        if not snapshots:
+            messagebox.showinfo("Restore", f"No backups found in {self.install_config['backup_dir']}")
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Restore Backup")
+        dialog.grab_set()
+        tk.Label(dialog, text="Restore your records as they were at:", font=("Arial", 11)).pack(padx=20, pady=(10, 5))
+        listbox = tk.Listbox(dialog, width=50, height=12, font=("Arial", 11))
+        snapshots = snapshots[::-1]
+        for _, manifest in snapshots:
+            created = datetime.fromisoformat(manifest['created'])
+            listbox.insert("end", f"{created.strftime('%Y-%m-%d %I:%M:%S %p')}  ({len(manifest['files'])} files)")
+        listbox.selection_set(0)
+        listbox.pack(padx=20, pady=5)
+        
+        def submit():
+            if not listbox.curselection():
+                return
+            snapshot_id = snapshots[listbox.curselection()[0]][0]
+            if not messagebox.askyesno("Restore", "Replace your current records with this backup?", parent=dialog):
+                return
+            dialog.destroy()
+            store = self.store
+            
+            def finish_restore(count):
+                if store is not self.store:
+                    return  # User logged out while restoring
+                self.load_records()
+                messagebox.showinfo("Restore", f"Restored {count} files.")
+            
+            config, user = self.install_config, self.current_user
+            
+            def restore():
+                before = store.load()
+                count = restore_user(repository, config, user, snapshot_id)
+                announce_changes(store, before)  # Restored records reach the sync server too
+                return count
+            
+            self.update_status("Restoring...")
+            self.io.submit(restore, on_done=finish_restore, on_error=self.show_io_error)
+        
+        tk.Button(dialog, text="Restore", command=submit,
+                  bg=self.current_theme['button'], fg="white").pack(pady=10)
     
     def open_settings(self):
         """Open settings dialog"""
@@ -1158,21 +1770,179 @@ class AdvancedTimeRecordApp:
     
     def logout(self):
         """Log out current user"""
+        if self.current_user:
+            self.save_summaries()
+            self.close_store()
+        self.io.flush()
+        if self.report_engine:
+            self.report_engine.clear()  # Keys use data_version, which restarts at the next login
         self.current_user = None
+        self.is_admin = False
         self.initialize_data()
         self.create_login_screen()
     
     def generate_report(self, report_type):
-        """Generate different types of reports"""
-        messagebox.showinfo("Report", f"This would generate a {report_type} report in a real implementation")
+        """Report on today, this week, this month or a chosen range"""
+        if report_type == 'custom':
+            self.ask_date_range("Custom Report", lambda start, end: self.run_report('custom', start, end))
+        elif report_type == 'daily':
+            self.run_report(report_type, self.current_date, self.current_date)
+        else:
+            self.run_report(report_type, *period_bounds(self.current_date, report_type))
+    
+    def run_report(self, report_type, start_date, end_date):
+        """Show a cached report, or compute it on the report pool"""
+        if self.report_engine is None:
+            self.report_engine = ReportEngine(self.settings['overtime_threshold'],
+                                              processes=self.install_config['report_processes'])
+        self.ensure_history_loaded(lambda: self.start_report(report_type, start_date, end_date), start_date)
+    
+    def start_report(self, report_type, start_date, end_date):
+        """Show a report from the cache or start computing it, once its sessions are in memory"""
+        key = (self.current_user, start_date, end_date, self.data_version)
+        report = self.report_engine.cached(key)
+        if report is not None:
+            self.show_report(report_type, report)
+            return
+        
+        self.update_status("Computing report...")
+        future = self.report_engine.submit(self.work_sessions, self.break_sessions, start_date, end_date)
+        future.add_done_callback(lambda done: self.io.report(self.finish_report, (report_type, key, done)))
+    
+    def finish_report(self, result):
+        """Cache and show a report computed on the pool (runs on the UI thread)"""
+        report_type, key, future = result
+        self.update_status("Ready")
+        if future.exception() is not None:
+            self.show_io_error(future.exception())
+            return
+        self.report_engine.remember(key, future.result())
+        if key[0] == self.current_user:
+            self.show_report(report_type, future.result())
+    
+    def show_report(self, report_type, report):
+        """Window with a report's totals, tasks and per-day or per-week rows"""
+        start, end = report['start'], report['end']
+        window = tk.Toplevel(self.root)
+        window.title(f"{report_type.title()} Report")
+        window.geometry("600x500")
+        
+        period = f"{start}" if start == end else f"{start} to {end}"
+        totals = report['totals']
+        lines = [f"{report_type.title()} Report - {period}", "",
+                 f"Worked: {self.format_timedelta(totals['worked'])}",
+                 f"Break: {self.format_timedelta(totals['break'])}",
+                 f"Net: {self.format_timedelta(totals['net'])}",
+                 f"Overtime: {self.format_timedelta(totals['overtime'])}"]
+        if report['tasks']:
+            lines += [""] + [f"{task}: {self.format_timedelta(td)}" for task, td in report['tasks'].items()]
+        tk.Label(window, text="\n".join(lines), justify="left", font=("Arial", 11)).pack(padx=10, pady=10, anchor="w")
+        
+        # Up to a month is listed by day, longer ranges by ISO week
+        rows = report['days'] if (end - start).days < 31 else report['weekly']
+        columns = ("Period", "Worked", "Break", "Net", "Overtime")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=100)
+        for key, bucket in rows.items():
+            tree.insert("", "end", values=(str(key),) + tuple(self.format_timedelta(bucket[field])
+                                                             for field in ('worked', 'break', 'net', 'overtime')))
+        tree.pack(fill="both", expand=True, padx=10, pady=5)
     
     def calculate_overtime(self):
-        """Calculate overtime hours"""
-        messagebox.showinfo("Overtime", "This would calculate overtime hours in a real implementation")
+        """Show pay-rule (daily and weekly) overtime for each pay period of the last year"""
+        rules = overtime_rules(self.settings, self.install_config)
+        start_date = pay_period(self.current_date - timedelta(days=365), rules)[0]
+        self.ensure_history_loaded(lambda: self.show_overtime(rules, start_date), start_date)
+    
+    def show_overtime(self, rules, start_date):
+        """Overtime window for the pay periods from start_date on"""
+        table = day_table(self.work_sessions, self.break_sessions, start_date, self.current_date)
+        periods = overtime_periods({self.current_user: table}, rules)[self.current_user]
+        
+        window = tk.Toplevel(self.root)
+        window.title("Pay-Rule Overtime")
+        window.geometry("700x450")
+        
+        def duration(micros):
+            return self.format_timedelta(timedelta(microseconds=micros))
+        
+        current = periods.get(pay_period(self.current_date, rules)[0])
+        lines = [f"Daily threshold: {rules['daily_hours']}h, weekly threshold: {rules['weekly_hours']}h, "
+                 f"breaks {'deducted' if rules['break_deduction'] else 'paid'}",
+                 f"This pay period: {duration(current['overtime']) if current else '00:00:00'} overtime",
+                 f"Last year: {duration(sum(sums['overtime'] for sums in periods.values()))} overtime"]
+        tk.Label(window, text="\n".join(lines), justify="left", font=("Arial", 11)).pack(padx=10, pady=10, anchor="w")
+        
+        columns = ("Pay Period", "Paid", "Regular", "Daily OT", "Weekly OT", "Overtime")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=100)
+        for first, sums in sorted(periods.items(), reverse=True):
+            tree.insert("", "end", values=(f"{first} - {pay_period(first, rules)[1]}",) + tuple(
+                duration(sums[field]) for field in ('paid', 'regular', 'daily', 'weekly', 'overtime')))
+        tree.pack(fill="both", expand=True, padx=10, pady=5)
     
     def show_time_analysis(self):
-        """Show time analysis"""
-        messagebox.showinfo("Time Analysis", "This would show time analysis in a real implementation")
+        """Show overlapping or duplicated sessions and breaks outside work"""
+        self.ensure_history_loaded(self.show_conflicts)
+    
+    def show_conflicts(self):
+        """Message box listing what IntervalIndex.conflicts() found"""
+        problems = self.rollups.index.conflicts() if self.rollups else []
+        if not problems:
+            messagebox.showinfo("Time Analysis", "No overlapping sessions or stray breaks found.")
+            return
+        
+        lines = []
+        for problem, day, first, second in problems[:20]:
+            if problem == 'overlap':
+                lines.append(f"{day}: work {first[0].strftime('%I:%M %p')}-{first[1].strftime('%I:%M %p')} "
+                             f"overlaps {second[0].strftime('%I:%M %p')}-{second[1].strftime('%I:%M %p')}")
+            else:
+                lines.append(f"{day}: break {first[0].strftime('%I:%M %p')}-{first[1].strftime('%I:%M %p')} "
+                             f"is outside work time")
+        if len(problems) > 20:
+            lines.append(f"... and {len(problems) - 20} more")
+        messagebox.showinfo("Time Analysis", "\n".join(lines))
+    
+    def show_team_summary(self):
+        """Refresh team rollups on the I/O worker, then show this week's and month's totals"""
+        if self.team_rollups is None:
+            from dtr_team import TeamRollups  # Pulls in the process pool machinery
+            self.team_rollups = TeamRollups(self.install_config, self.settings['overtime_threshold'])
+        self.update_status("Reading team records...")
+        self.io.submit(self.team_rollups.refresh, on_done=self.open_team_summary, on_error=self.show_io_error)
+    
+    def open_team_summary(self, reread):
+        """Window listing team totals followed by each member's hours"""
+        self.update_status("Ready")
+        window = tk.Toplevel(self.root)
+        window.title("Team Summary")
+        window.geometry("700x400")
+        
+        period_var = tk.StringVar(value="weekly")
+        ttk.Combobox(window, textvariable=period_var, values=["weekly", "monthly"], state="readonly").pack(pady=5)
+        
+        columns = ("Team", "User", "Period", "Worked", "Break", "Net", "Overtime")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=90)
+        tree.pack(fill="both", expand=True, padx=10, pady=5)
+        tk.Label(window, text=f"{len(self.team_rollups.cache)} users, {reread} re-read").pack(pady=5)
+        
+        def show(event=None):
+            tree.delete(*tree.get_children())
+            period = period_var.get()
+            for row in self.team_rollups.rows(period, {period_key(self.current_date, period)}):
+                tree.insert("", "end", values=(row['team'], row['user'], row['period'], row['worked_hours'],
+                                               row['break_hours'], row['net_hours'], row['overtime_hours']))
+        
+        period_var.trace_add("write", lambda *args: show())
+        show()
     
     def show_productivity_stats(self):
         """Show productivity statistics"""
@@ -1188,16 +1958,14 @@ class AdvancedTimeRecordApp:
     
     def on_edit_record(self):
         """Edit selected record"""
-        selected_item = self.records_tree.selection()
-        if not selected_item:
+        selected = self.records_view.selected()
+        if not selected:
             messagebox.showwarning("No Selection", "Please select a record to edit")
             return
         
-        item = self.records_tree.item(selected_item[0])
-        record_id = int(item['values'][0]) - 1
-        record_type = item['values'][1]
-        
-        self.edit_record(record_id, record_type)
+        kind, session = selected
+        sessions = self.work_sessions if kind == 'work' else self.break_sessions
+        self.edit_record(sessions.index(session), "Work" if kind == 'work' else "Break")
     
     def on_delete_record(self):
         """Delete selected record"""
@@ -1209,20 +1977,14 @@ class AdvancedTimeRecordApp:
         if not messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this record?"):
             return
         
-        item = self.records_tree.item(selected_item[0])
-        record_id = int(item['values'][0]) - 1
-        record_type = item['values'][1]
-        
-        if record_type == "Work":
-            if record_id < len(self.work_sessions):
-                del self.work_sessions[record_id]
-        else:
-            if record_id < len(self.break_sessions):
-                del self.break_sessions[record_id]
+        kind, session = self.records_view.selected()
+        sessions = self.work_sessions if kind == 'work' else self.break_sessions
+        sessions.remove(session)
+        self.count_session(kind, session, remove=True)
+        self.refresh_record('delete', kind, session)
+        self.persist_session('delete', kind, session)
         
-        self.update_records()
         self.update_summary()
-        self.save_records()
     
     def add_note_to_record(self):
         """Add note to selected record"""
@@ -1307,21 +2069,22 @@ class AdvancedTimeRecordApp:
                 if new_start and new_end and new_start > new_end:
                     messagebox.showerror("Invalid Times", "Start time cannot be after end time")
                     return
+                if record_type == "Work" and new_start and new_end and \
+                        not self.confirm_no_overlap(new_start, new_end, session['id']):
+                    return
                 
                 # Update the record
-                if record_type == "Work":
-                    self.work_sessions[record_id]['start'] = new_start
-                    self.work_sessions[record_id]['end'] = new_end
-                    self.work_sessions[record_id]['task'] = task_type_var.get()
-                else:
-                    self.break_sessions[record_id]['start'] = new_start
-                    self.break_sessions[record_id]['end'] = new_end
-                    self.break_sessions[record_id]['type'] = task_type_var.get()
+                kind = 'work' if record_type == "Work" else 'break'
+                self.count_session(kind, session, remove=True)
+                session['start'] = new_start
+                session['end'] = new_end
+                session['task' if kind == 'work' else 'type'] = task_type_var.get()
+                self.count_session(kind, session)
+                self.refresh_record('update', kind, session)
+                self.persist_session('update', kind, session)
                 
-                # Update UI and save
-                self.update_records()
+                # Update UI
                 self.update_summary()
-                self.save_records()
                 
                 edit_dialog.destroy()
                 messagebox.showinfo("Success", "Record updated successfully")
@@ -1335,48 +2098,41 @@ class AdvancedTimeRecordApp:
         save_btn.pack(pady=20)
     
     def update_clock(self):
-        """Update the clock display"""
+        """Update the clock display once a second, touching labels only when their text changes"""
         if not self.root.winfo_exists():
-            
-            now = datetime.now()
-            current_time = now.strftime("%I:%M:%S %p")
-            self.clock_label.config(text=current_time)
-            
-            # Update worked time if clocked in
-            if self.clock_in_time and not self.clock_out_time:
-                if self.break_start_time and not self.break_end_time:
-                    # On break, don't count this time
-                    pass
-                else:
-                    worked_time = now - self.clock_in_time
-                    # Subtract break times
-                    for break_session in self.break_sessions:
-                        if break_session['end']:
-                            worked_time -= (break_session['end'] - break_session['start'])
-                    self.total_worked_label.config(text=f"Total Worked: {str(worked_time).split('.')[0]}")
-        
-            # Schedule the next clock update
-            self.clock_update_id = self.root.after(1000, self.update_clock)
-
-    def load_summaries(self):
-        """Load weekly and monthly summary data"""
-        user_dir = f"users/{self.current_user}"
-        
-        # Load weekly summary
-        weekly_file = f"{user_dir}/weekly_summary.json"
-        if os.path.exists(weekly_file):
-            with open(weekly_file, "r") as f:
-                self.weekly_data = json.load(f)
-        
-        # Load monthly summary
-        monthly_file = f"{user_dir}/monthly_summary.json"
-        if os.path.exists(monthly_file):
-            with open(monthly_file, "r") as f:
-                self.monthly_data = json.load(f)
+            return
         
+        now = datetime.now()
+        self.set_label_text(self.clock_label, now.strftime("%I:%M:%S %p"))
+        
+        # Update worked time if clocked in
+        if self.clock_in_time and not self.clock_out_time:
+            if self.shift_break is None:
+                # Break sessions changed outside start/end break; recount once
+                self.shift_break = self.totals.index.covered('break', self.clock_in_time, now)
+            # While on break the counter holds at the moment the break started
+            until = self.break_start_time if self.on_break() else now
+            worked_time = until - self.clock_in_time - self.shift_break
+            self.set_label_text(self.total_worked_label,
+                                f"Total Worked: {self.format_timedelta(max(worked_time, timedelta()))}")
+        
+        # Schedule the next update just after the next whole second
+        self.clock_update_id = self.root.after(1000 - now.microsecond // 1000, self.update_clock)
+    
+    def set_label_text(self, label, text):
+        """Reconfigure a label only if its text actually changed"""
+        if self.label_texts.get(label) != text:
+            self.label_texts[label] = text
+            label.config(text=text)
+    
+    def on_break(self):
+        return bool(self.break_start_time and not self.break_end_time)
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = AdvancedTimeRecordApp(root)
+    if "--startup-time" in sys.argv:
+        app.report_startup_time()
     
     try:
         root.mainloop()
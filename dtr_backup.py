@@ -0,0 +1,276 @@
+"""Incremental, deduplicated local backups for the Advanced Time Record System.
+
+A backup repository is a plain directory (local disk, USB drive or network
+mount)::
+
+    objects/ab/ab12...     zlib-compressed chunks named by the SHA-256 of their contents
+    snapshots/<name>/<id>.json
+                           one manifest per backup: every file's path, size,
+                           mtime, mode and list of chunk hashes
+
+Files are cut into fixed-size chunks and a chunk already in ``objects`` is
+never written again, so the journal (which only grows at the end) costs one
+new chunk per backup, and a file whose size and mtime match the previous
+snapshot is not even read. Any snapshot can be restored on its own: restoring
+puts the backed-up directories back exactly as they were, removing files
+created since.
+
+With the SQLite backend a user's records live in the shared database, so a
+user's snapshot includes that file too; restoring it (restore_user) replaces
+only that user's rows and leaves everyone else's alone.
+
+SQLite databases are copied with SQLite's online backup API first, so a
+backup taken while another kiosk is writing is still a consistent database.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import zlib
+from datetime import datetime
+
+from dtr_storage import SESSION_KINDS, SESSION_LISTS, SQLiteStore, atomic_write
+
+CHUNK_SIZE = 256 * 1024
+SKIPPED_SUFFIXES = ('.tmp', '-wal', '-shm', '-journal')
+LEGACY_ACCOUNTS = "users.dat"
+
+
+class BackupRepository:
+    """Content-addressed chunk store plus per-name snapshot manifests"""
+
+    def __init__(self, root, chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.objects_dir = os.path.join(root, "objects")
+        self.snapshots_dir = os.path.join(root, "snapshots")
+
+    # Objects
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def put_chunk(self, data):
+        """Store one chunk unless it is already present; returns (digest, bytes written)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        compressed = zlib.compress(data)
+        atomic_write(path, compressed)
+        return digest, len(compressed)
+
+    def get_chunk(self, digest):
+        with open(self.object_path(digest), "rb") as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Backup chunk {digest} is corrupt")
+        return data
+
+    # Snapshots
+
+    def snapshots(self, name):
+        """Snapshot ids for a name, oldest first (ids sort by time)"""
+        directory = os.path.join(self.snapshots_dir, name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(entry[:-5] for entry in os.listdir(directory) if entry.endswith(".json"))
+
+    def manifest(self, name, snapshot_id):
+        with open(os.path.join(self.snapshots_dir, name, snapshot_id + ".json"), "r") as f:
+            return json.load(f)
+
+    def backup(self, name, base_dir, paths):
+        """Snapshot files and directories (relative to base_dir) under a name; returns (id, stats)"""
+        previous = self.snapshots(name)
+        known = self.manifest(name, previous[-1])['files'] if previous else {}
+        stats = {'files': 0, 'read_bytes': 0, 'new_chunks': 0, 'written_bytes': 0}
+        files = {}
+        for relative in _walk(base_dir, paths):
+            full = os.path.join(base_dir, relative)
+            try:
+                info = os.stat(full)
+            except FileNotFoundError:
+                continue  # Removed while walking
+            entry = {'size': info.st_size, 'mtime_ns': info.st_mtime_ns, 'mode': info.st_mode & 0o777}
+            old = known.get(relative)
+            # A database's recent changes can sit in its -wal file, so it is always copied
+            unchanged = old and (old['size'], old['mtime_ns']) == (entry['size'], entry['mtime_ns'])
+            if unchanged and not relative.endswith(".db"):
+                entry['chunks'] = old['chunks']
+            else:
+                entry['chunks'] = self._store_file(full, stats)
+            files[relative] = entry
+            stats['files'] += 1
+
+        snapshot_id = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        manifest = {'name': name, 'created': datetime.now().isoformat(), 'paths': list(paths), 'files': files}
+        atomic_write(os.path.join(self.snapshots_dir, name, snapshot_id + ".json"), json.dumps(manifest))
+        return snapshot_id, stats
+
+    def _store_file(self, path, stats):
+        if path.endswith(".db"):
+            return self._store_database(path, stats)
+        return self._store_chunks(path, stats)
+
+    def _store_chunks(self, path, stats):
+        chunks = []
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    return chunks
+                digest, written = self.put_chunk(data)
+                chunks.append(digest)
+                stats['read_bytes'] += len(data)
+                stats['new_chunks'] += written > 0
+                stats['written_bytes'] += written
+
+    def _store_database(self, path, stats):
+        """Chunk a consistent copy of a live SQLite database"""
+        fd, copy_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        try:
+            source, target = sqlite3.connect(path), sqlite3.connect(copy_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            return self._store_chunks(copy_path, stats)
+        finally:
+            os.remove(copy_path)
+
+    def restore(self, name, snapshot_id, base_dir, paths=None):
+        """Put the snapshot's paths (or only `paths` among them) under base_dir back as they were
+
+        Returns the number of files written.
+        """
+        manifest = self.manifest(name, snapshot_id)
+        paths = manifest['paths'] if paths is None else paths
+        files = {relative: entry for relative, entry in manifest['files'].items() if _under(relative, paths)}
+        for relative in _walk(base_dir, paths):
+            if relative not in files:
+                os.remove(os.path.join(base_dir, relative))
+        for relative, entry in files.items():
+            full = os.path.join(base_dir, relative)
+            atomic_write(full, self.file_data(entry))
+            os.chmod(full, entry['mode'])
+            if full.endswith(".db"):
+                for suffix in ('-wal', '-shm'):
+                    if os.path.exists(full + suffix):
+                        os.remove(full + suffix)  # Stale log of the database just replaced
+        return len(files)
+
+    def file_data(self, entry):
+        """The contents of one manifest entry"""
+        return b"".join(self.get_chunk(digest) for digest in entry['chunks'])
+
+    def prune(self, name, keep):
+        """Keep the newest `keep` snapshots of a name and delete chunks nothing refers to"""
+        if keep < 1:
+            raise ValueError(f"Pruning must keep at least one snapshot, got {keep}")
+        for snapshot_id in self.snapshots(name)[:-keep]:
+            os.remove(os.path.join(self.snapshots_dir, name, snapshot_id + ".json"))
+        return self.collect_garbage()
+
+    def collect_garbage(self):
+        """Delete chunks no snapshot refers to; returns how many were removed"""
+        used = set()
+        if os.path.isdir(self.snapshots_dir):
+            for name in os.listdir(self.snapshots_dir):
+                for snapshot_id in self.snapshots(name):
+                    for entry in self.manifest(name, snapshot_id)['files'].values():
+                        used.update(entry['chunks'])
+        removed = 0
+        if os.path.isdir(self.objects_dir):
+            for prefix in os.listdir(self.objects_dir):
+                for digest in os.listdir(os.path.join(self.objects_dir, prefix)):
+                    if digest not in used:
+                        os.remove(os.path.join(self.objects_dir, prefix, digest))
+                        removed += 1
+        return removed
+
+
+def user_backup(config, username):
+    """(name, base_dir, paths) of one user's directory and, with the SQLite backend, the shared database"""
+    paths = [username]
+    if config['storage_backend'] == 'sqlite':
+        paths.append(_database_path(config))
+    return f"user-{username}", config['users_dir'], paths
+
+
+def restore_user(repository, config, username, snapshot_id):
+    """Restore one user's snapshot; returns files (and, for SQLite, the database's user rows) restored
+
+    The user's directory is put back as it was. A copy of the shared database
+    in the snapshot is not put back over the live one; only this user's rows
+    and notes are copied from it.
+    """
+    name, base_dir, _ = user_backup(config, username)
+    count = repository.restore(name, snapshot_id, base_dir, [username])
+    entry = repository.manifest(name, snapshot_id)['files'].get(_database_path(config))
+    if entry is None or config['storage_backend'] != 'sqlite':
+        return count
+
+    fd, copy_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with open(copy_path, "wb") as f:
+            f.write(repository.file_data(entry))
+        saved = SQLiteStore(copy_path, username)
+        try:
+            state = saved.load()
+        finally:
+            saved.close()
+    finally:
+        os.remove(copy_path)
+    live = SQLiteStore(config['sqlite_path'], username)
+    try:
+        live.write_snapshot({**{SESSION_LISTS[kind]: list(state[kind].values()) for kind in SESSION_KINDS},
+                             'notes': state['notes']})
+    finally:
+        live.close()
+    return count + 1
+
+
+def backup_base_dir(config, name):
+    """Directory a snapshot's paths are relative to"""
+    return config['users_dir'] if name.startswith("user-") else "."
+
+
+def backup_sets(config, users):
+    """(name, base_dir, paths) for each user, the account database and, if used, the shared records database"""
+    sets = [user_backup(config, user) for user in users]
+    sets.append(("accounts", ".", [config['users_db'], LEGACY_ACCOUNTS]))
+    if config['storage_backend'] == 'sqlite':
+        sets.append(("records", ".", [config['sqlite_path']]))
+    return sets
+
+
+def _database_path(config):
+    """The shared SQLite database, relative to users_dir like the rest of a user's snapshot"""
+    return os.path.relpath(config['sqlite_path'], config['users_dir']).replace(os.sep, "/")
+
+
+def _under(relative, paths):
+    """Whether a snapshot path is one of `paths` or inside one of them"""
+    return any(relative == path or relative.startswith(path.rstrip("/") + "/")
+               for path in (path.replace(os.sep, "/") for path in paths))
+
+
+def _walk(base_dir, paths):
+    """Relative paths of every file under the given files/directories, skipping temporary files"""
+    for path in paths:
+        full = os.path.join(base_dir, path)
+        if os.path.isfile(full):
+            candidates = [path]
+        elif os.path.isdir(full):
+            candidates = [os.path.relpath(os.path.join(directory, filename), base_dir)
+                          for directory, _, filenames in os.walk(full) for filename in filenames]
+        else:
+            continue
+        for relative in sorted(candidates):
+            if not relative.endswith(SKIPPED_SUFFIXES):
+                yield relative.replace(os.sep, "/")
@@ -0,0 +1,116 @@
+"""Compact binary snapshot format for the Advanced Time Record System.
+
+``records.bin`` holds the same data as ``records.json`` in a layout that
+loads without any per-field string parsing::
+
+    header   magic, version, work count, break count, label table and notes sizes
+    labels   JSON list of every task/break type, referenced by index
+    notes    UTF-8 text
+    padding  to an 8-byte boundary
+    records  fixed 24-byte records, work sessions first, then breaks:
+             id (u32), label code (u16), 2 pad bytes,
+             start and end as microseconds since 1970-01-01 (i64, NONE_TIME if unset)
+
+Times are the same naive local datetimes the application uses, counted from
+the epoch without any timezone conversion, so converting to JSON and back is
+lossless. NONE_TIME is numpy's NaT, so when numpy is installed (it comes with
+matplotlib) the memory-mapped records are decoded as one structured array
+straight into datetimes; otherwise ``struct.iter_unpack`` is used.
+"""
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+
+MAGIC = b"DTRB"
+VERSION = 1
+HEADER = struct.Struct("<4sHIIII")
+RECORD = struct.Struct("<IHxxqq")
+NONE_TIME = -2 ** 63
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+KINDS = ('work', 'break')
+
+
+def to_micros(moment):
+    return NONE_TIME if moment is None else (moment - EPOCH) // MICROSECOND
+
+
+def from_micros(value):
+    return None if value == NONE_TIME else EPOCH + timedelta(microseconds=value)
+
+
+def encode(sessions, notes=""):
+    """Pack {'work': [(id, label, start, end)], 'break': [...]} and the notes into bytes"""
+    codes = {}
+    records = []
+    for kind in KINDS:
+        for session_id, label, start, end in sessions[kind]:
+            code = codes.setdefault(label, len(codes))
+            records.append(RECORD.pack(session_id, code, to_micros(start), to_micros(end)))
+    if len(codes) > 0xFFFF:
+        raise ValueError("Too many distinct task/break types for the binary format")
+
+    labels = json.dumps(list(codes)).encode()
+    notes = (notes or "").encode()
+    header = HEADER.pack(MAGIC, VERSION, len(sessions['work']), len(sessions['break']), len(labels), len(notes))
+    body = header + labels + notes
+    return body + b"\0" * (-len(body) % 8) + b"".join(records)
+
+
+def decode(buffer):
+    """Unpack a buffer from encode() into ({'work': [(id, label, start, end)], ...}, notes)"""
+    magic, version, work_count, break_count, labels_size, notes_size = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a DTR binary snapshot (or an unsupported version)")
+    offset = HEADER.size
+    labels = json.loads(bytes(buffer[offset:offset + labels_size]))
+    offset += labels_size
+    notes = bytes(buffer[offset:offset + notes_size]).decode()
+    offset += notes_size
+    offset += -offset % 8
+
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    sessions = {}
+    for kind, count in (('work', work_count), ('break', break_count)):
+        end_offset = offset + count * RECORD.size
+        if numpy is not None:
+            sessions[kind] = _decode_numpy(numpy, buffer, offset, count, labels)
+        else:
+            sessions[kind] = _decode_struct(buffer[offset:end_offset], labels)
+        offset = end_offset
+    return sessions, notes
+
+
+def _decode_numpy(numpy, buffer, offset, count, labels):
+    """Records as one structured array; tolist() turns datetime64 into datetimes and NaT into None"""
+    records = numpy.frombuffer(buffer, dtype=numpy.dtype([
+        ('id', '<u4'), ('label', '<u2'), ('pad', 'V2'), ('start', '<M8[us]'), ('end', '<M8[us]')]),
+        count=count, offset=offset)
+    return list(zip(records['id'].tolist(), [labels[code] for code in records['label'].tolist()],
+                    records['start'].tolist(), records['end'].tolist()))
+
+
+def _decode_struct(buffer, labels):
+    epoch, delta = EPOCH, timedelta
+    return [(session_id, labels[code],
+             None if start == NONE_TIME else epoch + delta(0, 0, start),
+             None if end == NONE_TIME else epoch + delta(0, 0, end))
+            for session_id, code, start, end in RECORD.iter_unpack(buffer)]
+
+
+def read(path):
+    """Memory-map and decode a binary snapshot file"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return decode(view)
+            finally:
+                view.release()
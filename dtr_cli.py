@@ -0,0 +1,473 @@
+"""Headless batch mode for the Advanced Time Record System.
+
+Runs without a display and never imports tkinter, tkcalendar or matplotlib:
+
+    python dtr_cli.py ingest kiosk_punches.csv
+    python dtr_cli.py report --period weekly --output weekly.csv
+    python dtr_cli.py report --period monthly --user rome --from 2025-03-01 --output march.json
+    python dtr_cli.py export --user rome --from 2024-01-01 --task "Project A" --output payroll.csv
+    python dtr_cli.py export --user rome --output rome.ndjson
+    python dtr_cli.py import --user rome rome.ndjson
+    python dtr_cli.py team --period monthly --output teams.csv
+    python dtr_cli.py overtime --from 2025-01-01 --output overtime.csv
+    python dtr_cli.py bench-durability --punches 2000
+    python dtr_cli.py convert --to binary
+    python dtr_cli.py backup --keep 30
+    python dtr_cli.py restore user-rome --snapshot 20250303T171500000000
+
+Punch files are CSV with a header of ``user,event,timestamp,label`` where
+``event`` is one of clock_in, clock_out, start_break or end_break and
+``label`` (optional) is the task or break type.
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta
+
+from dtr_storage import (DEFAULT_LABELS, DURABILITY_POLICIES, LABEL_KEYS, announce_changes, list_users,
+                         load_install_config, JournalStore, migrate_json_to_sqlite, open_store)
+from dtr_backup import BackupRepository, backup_base_dir, backup_sets, restore_user
+from dtr_columns import SessionColumns
+from dtr_export import csv_rows, export_sessions, import_sessions, read_ndjson, write_csv, write_ndjson
+from dtr_overtime import day_table, overtime_periods, overtime_rules, pay_period
+from dtr_summary import DailyTotals, rollup
+from dtr_sync import sync_client
+from dtr_team import TeamRollups
+
+PUNCH_EVENTS = {
+    'clock_in': ('work', 'open'),
+    'clock_out': ('work', 'close'),
+    'start_break': ('break', 'open'),
+    'end_break': ('break', 'close')
+}
+
+
+def load_sessions(store):
+    """Full history for one user as (work_sessions, break_sessions)"""
+    state = store.load_sessions()
+    return state['work'], state['break']
+
+
+def read_punches(path):
+    """Group punch rows by user, in timestamp order"""
+    punches = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            event = row['event'].strip().lower()
+            if event not in PUNCH_EVENTS:
+                raise ValueError(f"Unknown punch event {row['event']!r} for user {row['user']}")
+            punches.setdefault(row['user'].strip(), []).append(
+                (datetime.fromisoformat(row['timestamp'].strip()), event, (row.get('label') or "").strip()))
+    for rows in punches.values():
+        rows.sort(key=lambda punch: punch[0])
+    return punches
+
+
+def ingest_user(store, punches):
+    """Apply one user's punches as a single batch; already-ingested punches are skipped"""
+    work_sessions, break_sessions = load_sessions(store)
+    sessions = {'work': work_sessions, 'break': break_sessions}
+    known_starts = {kind: {s['start'] for s in sessions[kind]} for kind in sessions}
+    known_ends = {kind: {s['end'] for s in sessions[kind]} for kind in sessions}
+    # Open sessions by start time, so a close punch finds its session without a rescan
+    open_sessions = {kind: {s['start']: s for s in sessions[kind] if s['start'] and not s['end']} for kind in sessions}
+    open_starts = {kind: sorted(open_sessions[kind]) for kind in sessions}
+    events = []
+
+    for timestamp, event, label in punches:
+        kind, action = PUNCH_EVENTS[event]
+        if action == 'open':
+            if timestamp in known_starts[kind]:
+                continue
+            session = {
+                'id': store.next_id(kind),
+                'start': timestamp,
+                'end': None,
+                LABEL_KEYS[kind]: label or DEFAULT_LABELS[kind]
+            }
+            known_starts[kind].add(timestamp)
+            open_sessions[kind][timestamp] = session
+            insort(open_starts[kind], timestamp)
+            events.append(store.stage('add', kind, session))
+        else:
+            if timestamp in known_ends[kind]:
+                continue
+            position = bisect_right(open_starts[kind], timestamp)
+            if not position:
+                print(f"[DTR] Skipping {event} at {timestamp}: no open {kind} session", file=sys.stderr)
+                continue
+            session = open_sessions[kind].pop(open_starts[kind].pop(position - 1))
+            session['end'] = timestamp
+            known_ends[kind].add(timestamp)
+            events.append(store.stage('update', kind, session))
+
+    if events:
+        store.write_events(events)
+        if store.needs_compaction():
+            store.rewrite_snapshot()
+    return len(events)
+
+
+def user_totals(store, work_hours_per_day, start_date=None, end_date=None):
+    """DailyTotals over one user's sessions in an optional date range"""
+    totals = DailyTotals(work_hours_per_day)
+    for kind, session in store.query_kinds(('work', 'break'), start_date, end_date):
+        totals.add(kind, session)
+    return totals
+
+
+def format_hours(td):
+    return round(td.total_seconds() / 3600, 2)
+
+
+REPORT_FIELDS = ["user", "period", "worked_hours", "break_hours", "net_hours", "overtime_hours"]
+
+
+def write_rows(rows, output, fieldnames=REPORT_FIELDS):
+    """Write report rows as CSV or JSON depending on the output extension"""
+    if output.lower().endswith(".json"):
+        with open(output, "w") as f:
+            json.dump(rows, f, indent=4)
+        return
+    with open(output, "w", newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def open_writer(user, config, client):
+    """open_store, with the store's writes queued in the sync outbox when sync is configured"""
+    store = open_store(user, config)
+    if client is not None:
+        client.attach(store, user)
+    return store
+
+
+def load_state(user, config):
+    """A user's records as load() returns them, opening and closing the store"""
+    store = open_store(user, config)
+    try:
+        return store.load()
+    finally:
+        store.close()
+
+
+def cmd_ingest(args, config):
+    client = sync_client(config)  # The outbox only; the app or `dtr_sync.py drain` sends it
+    try:
+        for path in args.files:
+            for user, punches in read_punches(path).items():
+                store = open_writer(user, config, client)
+                try:
+                    count = ingest_user(store, punches)
+                finally:
+                    store.close()  # The final fsync under the 'interval' and 'close' policies
+                print(f"[DTR] {user}: {count} changes from {path}")
+    finally:
+        if client is not None:
+            client.stop()
+
+
+def cmd_report(args, config):
+    start_date = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+    end_date = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+    rows = []
+    for user in args.user or list_users(config):
+        store = open_store(user, config)
+        try:
+            totals = user_totals(store, args.daily_hours, start_date, end_date)
+        finally:
+            store.close()
+        for period, bucket in rollup(totals, args.period).items():
+            rows.append({
+                'user': user,
+                'period': period,
+                'worked_hours': format_hours(bucket['worked']),
+                'break_hours': format_hours(bucket['break']),
+                'net_hours': format_hours(bucket['net']),
+                'overtime_hours': format_hours(bucket['overtime'])
+            })
+    write_rows(rows, args.output)
+    print(f"[DTR] Wrote {len(rows)} rows to {args.output}")
+
+
+def cmd_export(args, config):
+    start_date = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+    end_date = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+    kinds = (args.kind,) if args.kind else ('work', 'break')
+    users = args.user or list_users(config)
+    for user in users:
+        base, ext = os.path.splitext(args.output)
+        output = args.output if len(users) == 1 else f"{base}_{user}{ext}"
+        store = open_store(user, config)
+        try:
+            sessions = export_sessions(store, kinds, start_date, end_date, args.task, args.break_type)
+            if ext.lower() in (".ndjson", ".jsonl"):
+                count = write_ndjson(output, sessions)
+            else:
+                count = write_csv(output, csv_rows(sessions))
+        finally:
+            store.close()
+        print(f"[DTR] {user}: wrote {count} sessions to {output}")
+
+
+def cmd_import(args, config):
+    client = sync_client(config)
+    try:
+        for path in args.files:
+            store = open_writer(args.user, config, client)
+            try:
+                added, updated, skipped = import_sessions(store, read_ndjson(path))
+            finally:
+                store.close()
+            print(f"[DTR] {args.user}: {added} added, {updated} closed, {skipped} already present from {path}")
+    finally:
+        if client is not None:
+            client.stop()
+
+
+def cmd_team(args, config):
+    teams = TeamRollups(config, args.daily_hours, workers=args.workers, processes=args.processes)
+    reread = teams.refresh()
+    rows = teams.rows(args.period)
+    write_rows(rows, args.output, ["team"] + REPORT_FIELDS)
+    print(f"[DTR] Re-read {reread} of {len(teams.cache)} users; wrote {len(rows)} rows to {args.output}")
+
+
+OVERTIME_FIELDS = ["user", "period_start", "period_end", "paid_hours", "regular_hours",
+                   "daily_overtime_hours", "weekly_overtime_hours", "overtime_hours"]
+
+
+def cmd_overtime(args, config):
+    start_date = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+    end_date = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+    rules = overtime_rules({'overtime_threshold': args.daily_hours, 'break_deduction': not args.no_break_deduction},
+                           config)
+    tables = {}
+    for user in args.user or list_users(config):
+        store = open_store(user, config)
+        try:
+            work_sessions, break_sessions = load_sessions(store)
+        finally:
+            store.close()
+        tables[user] = day_table(SessionColumns('work', work_sessions), SessionColumns('break', break_sessions),
+                                 start_date, end_date)
+
+    started = time.perf_counter()
+    periods = overtime_periods(tables, rules)
+    elapsed = time.perf_counter() - started
+
+    def hours(micros):
+        return round(micros / 3.6e9, 2)
+
+    rows = []
+    for user, user_periods in periods.items():
+        for first, sums in user_periods.items():
+            rows.append({'user': user, 'period_start': first.isoformat(),
+                         'period_end': pay_period(first, rules)[1].isoformat(),
+                         'paid_hours': hours(sums['paid']), 'regular_hours': hours(sums['regular']),
+                         'daily_overtime_hours': hours(sums['daily']), 'weekly_overtime_hours': hours(sums['weekly']),
+                         'overtime_hours': hours(sums['overtime'])})
+    write_rows(rows, args.output, OVERTIME_FIELDS)
+    print(f"[DTR] Pay-rule overtime for {len(tables)} users in {elapsed * 1000:.1f} ms; wrote {len(rows)} rows to {args.output}")
+
+
+def bench_punches(config, punches):
+    """Punches per second for one store configuration, one journal write per punch as in the GUI"""
+    store = open_store("bench", config)
+    store.load()
+    started = time.perf_counter()
+    moment = datetime(2025, 1, 1, 8, 0)
+    for i in range(punches):
+        kind = 'work' if i % 4 < 2 else 'break'
+        if i % 2 == 0:
+            session = {'id': store.next_id(kind), 'start': moment, 'end': None, LABEL_KEYS[kind]: DEFAULT_LABELS[kind]}
+            store.write_events([store.stage('add', kind, session)])
+        else:
+            session['end'] = moment
+            store.write_events([store.stage('update', kind, session)])
+        moment += timedelta(minutes=1)
+    store.close()  # Includes the final fsync the 'interval' and 'close' policies deferred
+    return punches / (time.perf_counter() - started)
+
+
+def cmd_bench_durability(args, config):
+    backends = [args.backend] if args.backend else ['journal', 'sqlite']
+    print(f"{'backend':<8} {'durability':<10} {'punches/s':>10}")
+    for backend in backends:
+        for policy in DURABILITY_POLICIES:
+            # A scratch directory on the same filesystem as the real data
+            scratch = tempfile.mkdtemp(prefix="dtr-bench-", dir=args.dir or os.path.dirname(
+                os.path.abspath(config['users_dir'])))
+            try:
+                bench_config = dict(config, storage_backend=backend, durability=policy,
+                                    users_dir=scratch, sqlite_path=os.path.join(scratch, "records.db"))
+                rate = bench_punches(bench_config, args.punches)
+            finally:
+                shutil.rmtree(scratch)
+            print(f"{backend:<8} {policy:<10} {rate:>10.0f}")
+
+
+def cmd_convert(args, config):
+    if config['storage_backend'] != 'journal':
+        sys.exit("[DTR] convert only applies to the journal storage backend")
+    for user in args.user or list_users(config):
+        store = JournalStore(os.path.join(config['users_dir'], user), snapshot_format=args.to)
+        state = store.load_sessions()
+        # Folding the journal into a fresh snapshot writes the new format and drops the old file
+        store.compact(state['work'], state['break'], state['notes'])
+        store.close()
+        print(f"[DTR] {user}: {len(state['work']) + len(state['break'])} sessions written to {store.snapshot_path}")
+    if args.to != config['snapshot_format']:
+        print(f'[DTR] Set "snapshot_format": "{args.to}" in {args.config} to keep using this format')
+
+
+def cmd_backup(args, config):
+    if args.keep is not None and args.keep < 1:
+        sys.exit("[DTR] --keep must be at least 1")
+    repository = BackupRepository(args.dir or config['backup_dir'])
+    for name, base_dir, paths in backup_sets(config, args.user or list_users(config)):
+        snapshot_id, stats = repository.backup(name, base_dir, paths)
+        print(f"[DTR] {name}: snapshot {snapshot_id}, {stats['files']} files, "
+              f"{stats['read_bytes']} bytes read, {stats['new_chunks']} new chunks ({stats['written_bytes']} bytes)")
+        if args.keep:
+            repository.prune(name, args.keep)
+
+
+def cmd_restore(args, config):
+    repository = BackupRepository(args.dir or config['backup_dir'])
+    snapshots = repository.snapshots(args.name)
+    if args.list or not snapshots:
+        for snapshot_id in snapshots:
+            manifest = repository.manifest(args.name, snapshot_id)
+            print(f"{snapshot_id}  {manifest['created']}  {len(manifest['files'])} files")
+        if not snapshots:
+            print(f"[DTR] No snapshots named {args.name}")
+        return
+    snapshot_id = args.snapshot or snapshots[-1]
+    # With sync on, whatever the restore changes in users' records is queued for the server too
+    client = sync_client(config)
+    per_user = args.name.startswith("user-")
+    users = [args.name[len("user-"):]] if per_user else list_users(config)
+    before = {}
+    if client is not None and (per_user or args.name == "records"):
+        before = {user: load_state(user, config) for user in users}
+    try:
+        if per_user:
+            count = restore_user(repository, config, users[0], snapshot_id)
+        else:
+            count = repository.restore(args.name, snapshot_id, backup_base_dir(config, args.name))
+        if before:
+            # A restored shared database can also hold users that were not there before
+            for user in sorted(set(before) if per_user else set(before) | set(list_users(config))):
+                store = open_writer(user, config, client)
+                try:
+                    announce_changes(store, before.get(user, {'work': {}, 'break': {}, 'notes': ""}))
+                finally:
+                    store.close()
+    finally:
+        if client is not None:
+            client.stop()
+    print(f"[DTR] Restored {count} files of {args.name} from snapshot {snapshot_id}")
+
+
+def cmd_migrate(args, config):
+    config = dict(config, storage_backend='sqlite')
+    for user, count in migrate_json_to_sqlite(config).items():
+        print(f"[DTR] Migrated {count} sessions for {user}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Advanced Time Record System - batch mode")
+    parser.add_argument("--config", default="dtr_config.json", help="installation config file")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    ingest = commands.add_parser("ingest", help="apply bulk punch files")
+    ingest.add_argument("files", nargs="+")
+    ingest.set_defaults(func=cmd_ingest)
+
+    report = commands.add_parser("report", help="write per-user period totals")
+    report.add_argument("--period", choices=["daily", "weekly", "monthly"], default="daily")
+    report.add_argument("--user", action="append", help="limit to a user (repeatable)")
+    report.add_argument("--from", dest="start", help="first date, YYYY-MM-DD")
+    report.add_argument("--to", dest="end", help="last date, YYYY-MM-DD")
+    report.add_argument("--daily-hours", "--work-hours", type=float, default=8, help="daily overtime threshold")
+    report.add_argument("--output", required=True, help="output .csv or .json file")
+    report.set_defaults(func=cmd_report)
+
+    export = commands.add_parser("export", help="stream sessions to CSV or NDJSON (.ndjson output)")
+    export.add_argument("--user", action="append", help="limit to a user (repeatable; one file per user)")
+    export.add_argument("--from", dest="start", help="first date, YYYY-MM-DD")
+    export.add_argument("--to", dest="end", help="last date, YYYY-MM-DD")
+    export.add_argument("--kind", choices=["work", "break"], help="only work or only break sessions")
+    export.add_argument("--task", help="filter work sessions by task")
+    export.add_argument("--break-type", help="filter breaks by type")
+    export.add_argument("--output", required=True, help="output .csv or .ndjson file")
+    export.set_defaults(func=cmd_export)
+
+    import_ = commands.add_parser("import", help="merge NDJSON exports into a user's records")
+    import_.add_argument("--user", required=True)
+    import_.add_argument("files", nargs="+")
+    import_.set_defaults(func=cmd_import)
+
+    team = commands.add_parser("team", help="write per-team and per-user weekly/monthly totals")
+    team.add_argument("--period", choices=["weekly", "monthly"], default="weekly")
+    team.add_argument("--daily-hours", "--work-hours", type=float, default=8, help="daily overtime threshold")
+    team.add_argument("--workers", type=int, help="pool size (default: one per CPU)")
+    team.add_argument("--processes", action="store_true", help="scan users in processes instead of threads")
+    team.add_argument("--output", required=True, help="output .csv or .json file")
+    team.set_defaults(func=cmd_team)
+
+    overtime = commands.add_parser("overtime",
+                                    help="write pay-rule overtime (breaks deducted, plus weekly) per user and pay period")
+    overtime.add_argument("--user", action="append", help="limit to a user (repeatable)")
+    overtime.add_argument("--from", dest="start", help="first date, YYYY-MM-DD")
+    overtime.add_argument("--to", dest="end", help="last date, YYYY-MM-DD")
+    overtime.add_argument("--daily-hours", type=float, default=8, help="daily overtime threshold")
+    overtime.add_argument("--no-break-deduction", action="store_true", help="count breaks as paid time")
+    overtime.add_argument("--output", required=True, help="output .csv or .json file")
+    overtime.set_defaults(func=cmd_overtime)
+
+    bench = commands.add_parser("bench-durability", help="measure punches per second under each durability policy")
+    bench.add_argument("--punches", type=int, default=2000)
+    bench.add_argument("--backend", choices=["journal", "sqlite"], help="only benchmark one backend")
+    bench.add_argument("--dir", help="scratch directory parent (default: next to the users directory)")
+    bench.set_defaults(func=cmd_bench_durability)
+
+    convert = commands.add_parser("convert", help="rewrite snapshots as records.json or records.bin")
+    convert.add_argument("--to", choices=["json", "binary"], required=True)
+    convert.add_argument("--user", action="append", help="limit to a user (repeatable)")
+    convert.set_defaults(func=cmd_convert)
+
+    backup = commands.add_parser("backup", help="take incremental snapshots of users, accounts and records")
+    backup.add_argument("--user", action="append", help="limit to a user (repeatable)")
+    backup.add_argument("--dir", help="backup directory (default: backup_dir from the config)")
+    backup.add_argument("--keep", type=int, help="keep only this many snapshots of each")
+    backup.set_defaults(func=cmd_backup)
+
+    restore = commands.add_parser("restore", help="restore a snapshot (user-<name>, accounts or records)")
+    restore.add_argument("name")
+    restore.add_argument("--snapshot", help="snapshot id (default: the latest)")
+    restore.add_argument("--dir", help="backup directory (default: backup_dir from the config)")
+    restore.add_argument("--list", action="store_true", help="list the snapshots instead")
+    restore.set_defaults(func=cmd_restore)
+
+    migrate = commands.add_parser("migrate-sqlite", help="copy JSON records into the SQLite store")
+    migrate.set_defaults(func=cmd_migrate)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args, load_install_config(args.config))
+
+
+if __name__ == "__main__":
+    main()
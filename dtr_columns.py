@@ -0,0 +1,249 @@
+"""Columnar in-memory sessions for the Advanced Time Record System.
+
+A SessionColumns keeps one kind of session (work or break) as parallel
+``array`` columns: ids, start and end as int64 microseconds since 1970-01-01
+(the dtr_binary encoding, NONE_TIME when unset), the day as a date ordinal,
+and the task/break type as a code into a shared name table, rather than a
+dict holding datetime and date objects per session. Sessions are still parsed
+into dicts while loading, and the summary's interval index keeps its own
+(start, end) tuples, so this trims the long-lived copy rather than peak use.
+
+Existing code keeps working on sessions as mappings: iterating or indexing
+yields SessionRow views whose ``session['end'] = ...`` writes straight into
+the columns. Per-day totals for overtime come from the column aggregates,
+which run on numpy when it is installed and on plain loops over the arrays
+otherwise; the summary panel and analytics use DailyTotals' running totals.
+"""
+from array import array
+from datetime import date
+
+from dtr_binary import EPOCH, NONE_TIME, from_micros as _from_micros, to_micros as _to_micros
+from dtr_storage import DEFAULT_LABELS, LABEL_KEYS
+
+DAY_US = 86400 * 10 ** 6
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class SessionRow:
+    """Dict-like view of one session in a SessionColumns"""
+
+    __slots__ = ('columns', 'session_id')
+
+    def __init__(self, columns, session_id):
+        self.columns = columns
+        self.session_id = session_id
+
+    def keys(self):
+        return ('id', 'date', 'start', 'end', self.columns.label_key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __getitem__(self, key):
+        return self.columns.get_field(self.session_id, key)
+
+    def __setitem__(self, key, value):
+        self.columns.set_field(self.session_id, key, value)
+
+    def get(self, key, default=None):
+        return self[key] if key in self.keys() else default
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def copy(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return (isinstance(other, SessionRow) and other.columns is self.columns
+                and other.session_id == self.session_id)
+
+    def __hash__(self):
+        return hash((id(self.columns), self.session_id))
+
+    def __repr__(self):
+        return f"SessionRow({self.copy()!r})"
+
+
+class SessionColumns:
+    """One kind of session stored column-wise, with list-style access by position"""
+
+    def __init__(self, kind, sessions=()):
+        self.kind = kind
+        self.label_key = LABEL_KEYS[kind]
+        self.ids = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.days = array('l')  # date ordinal, 0 if unknown
+        self.labels = array('I')
+        self.label_names = []
+        self._codes = {}
+        self._positions = {}
+        self.extend(sessions)
+
+    # List-style access
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (SessionRow(self, session_id) for session_id in self.ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [SessionRow(self, session_id) for session_id in self.ids[position]]
+        return SessionRow(self, self.ids[position])
+
+    def __bool__(self):
+        return len(self.ids) > 0
+
+    def add(self, session):
+        """Append a session mapping; returns its row view, which callers should keep using"""
+        session_id = session['id']
+        if session_id is None or session_id in self._positions:
+            raise ValueError(f"Session needs a unique id, got {session_id!r}")
+        self._positions[session_id] = len(self.ids)
+        self.ids.append(session_id)
+        self.starts.append(_to_micros(session['start']))
+        self.ends.append(_to_micros(session['end']))
+        day = session.get('date')
+        self.days.append(day.toordinal() if day else 0)
+        self.labels.append(self._code(session.get(self.label_key, DEFAULT_LABELS[self.kind])))
+        return SessionRow(self, session_id)
+
+    def extend(self, sessions):
+        for session in sessions:
+            self.add(session)
+
+    def replace(self, sessions):
+        """Reload in place from mappings or row views; existing views of kept ids stay valid"""
+        sessions = [session.copy() for session in sessions]
+        for column in (self.ids, self.starts, self.ends, self.days, self.labels):
+            del column[:]
+        self._positions.clear()
+        self.extend(sessions)
+
+    def prepend(self, other):
+        """Put another SessionColumns' sessions (e.g. older history) first; ids must not clash"""
+        codes = [self._code(name) for name in other.label_names]
+        self.ids = other.ids + self.ids
+        self.starts = other.starts + self.starts
+        self.ends = other.ends + self.ends
+        self.days = other.days + self.days
+        self.labels = array('I', [codes[code] for code in other.labels]) + self.labels
+        self._positions = {session_id: position for position, session_id in enumerate(self.ids)}
+
+    def remove(self, session):
+        """Drop a session (row view or mapping with its id)"""
+        position = self._positions.pop(session['id'])
+        for column in (self.ids, self.starts, self.ends, self.days, self.labels):
+            del column[position]
+        for later in self.ids[position:]:
+            self._positions[later] -= 1
+
+    def index(self, session):
+        return self._positions[session['id']]
+
+    def row(self, session_id):
+        """Row view for an id, or None"""
+        return SessionRow(self, session_id) if session_id in self._positions else None
+
+    def _code(self, label):
+        code = self._codes.get(label)
+        if code is None:
+            code = self._codes[label] = len(self.label_names)
+            self.label_names.append(label)
+        return code
+
+    # Field access used by SessionRow
+
+    def get_field(self, session_id, key):
+        position = self._positions[session_id]
+        if key == 'start':
+            return _from_micros(self.starts[position])
+        if key == 'end':
+            return _from_micros(self.ends[position])
+        if key == 'id':
+            return session_id
+        if key == 'date':
+            day = self.days[position]
+            return date.fromordinal(day) if day else None
+        if key == self.label_key:
+            return self.label_names[self.labels[position]]
+        raise KeyError(key)
+
+    def set_field(self, session_id, key, value):
+        position = self._positions[session_id]
+        if key == 'start':
+            self.starts[position] = _to_micros(value)
+        elif key == 'end':
+            self.ends[position] = _to_micros(value)
+        elif key == 'date':
+            self.days[position] = value.toordinal() if value else 0
+        elif key == self.label_key:
+            self.labels[position] = self._code(value)
+        else:
+            raise KeyError(f"{key} cannot be changed")
+
+    # Column aggregates
+
+    def closed_durations(self, start=None, end=None):
+        """(day ordinals, durations in µs, label codes) of closed sessions starting in [start, end)"""
+        numpy = _numpy()
+        low = NONE_TIME + 1 if start is None else _to_micros(start)
+        high = 2 ** 63 - 1 if end is None else _to_micros(end)
+        if numpy is not None:
+            starts = numpy.frombuffer(self.starts, dtype=numpy.int64)
+            ends = numpy.frombuffer(self.ends, dtype=numpy.int64)
+            mask = (starts != NONE_TIME) & (ends != NONE_TIME) & (starts >= low) & (starts < high)
+            return (starts[mask] // DAY_US + EPOCH_ORDINAL, ends[mask] - starts[mask],
+                    numpy.frombuffer(self.labels, dtype=f"u{self.labels.itemsize}")[mask])
+        days, durations, labels = array('q'), array('q'), array('q')
+        for s, e, code in zip(self.starts, self.ends, self.labels):
+            if s != NONE_TIME and e != NONE_TIME and low <= s < high:
+                days.append(s // DAY_US + EPOCH_ORDINAL)
+                durations.append(e - s)
+                labels.append(code)
+        return days, durations, labels
+
+    def day_micros(self, start=None, end=None):
+        """{date ordinal: closed session µs} per start day, for further column arithmetic"""
+        return self._grouped(0, start, end)
+
+    def _grouped(self, key_column, start, end):
+        columns = self.closed_durations(start, end)
+        keys, durations = columns[key_column], columns[1]
+        numpy = _numpy()
+        if numpy is not None and len(keys):
+            unique, inverse = numpy.unique(keys, return_inverse=True)
+            sums = numpy.bincount(inverse, weights=durations)
+            # bincount sums in float64, exact for any realistic total (< 2**53 µs, 285 years)
+            return dict(zip(unique.tolist(), sums.astype(numpy.int64).tolist()))
+        totals = {}
+        for key, duration in zip(keys, durations):
+            totals[key] = totals.get(key, 0) + duration
+        return totals
+
+    def frozen(self):
+        """(ids, starts, ends, label codes, label names) as copies, cheap to take and to pickle"""
+        return self.ids[:], self.starts[:], self.ends[:], self.labels[:], list(self.label_names)
+
+    def rows_between(self, start=None, end=None, include_open=False):
+        """Row views of sessions starting in [start, end), optionally plus every open session"""
+        low = NONE_TIME + 1 if start is None else _to_micros(start)
+        high = 2 ** 63 - 1 if end is None else _to_micros(end)
+        return [SessionRow(self, session_id)
+                for session_id, s, e in zip(self.ids, self.starts, self.ends)
+                if low <= s < high or (include_open and (s == NONE_TIME or e == NONE_TIME))]
+
@@ -0,0 +1,170 @@
+"""Streaming record export and import for the Advanced Time Record System.
+
+Sessions are pulled from the record store one kind at a time, in start
+order, through a chain of generators and written to the output file in
+fixed-size chunks, so only one chunk of formatted rows is held at a time.
+With the SQLite backend the sessions themselves stream from an indexed
+query. The journal backend has to replay its snapshot and journal first; it
+does so once, keeping only the matching sessions, so its memory grows with
+the number of sessions exported.
+
+NDJSON files hold one session per line::
+
+    {"kind":"work","start":"2025-03-03T12:56:00","end":"2025-03-03T17:15:00","task":"General Work"}
+
+and can be imported back into any store, a chunk of lines at a time.
+"""
+import csv
+import json
+from itertools import islice
+
+from dtr_storage import LABEL_KEYS, SESSION_KINDS, record_to_session, session_to_record
+
+CSV_HEADER = ["Type", "Date", "Start Time", "End Time", "Duration", "Task/Type", "Details"]
+KIND_NAMES = {'work': "Work", 'break': "Break"}
+
+
+def clock_time(moment):
+    """12-hour HH:MM:SS AM/PM, the same text strftime('%I:%M:%S %p') gives"""
+    hour = moment.hour % 12 or 12
+    return f"{hour:02d}:{moment.minute:02d}:{moment.second:02d} {'AM' if moment.hour < 12 else 'PM'}"
+
+
+def duration_text(td):
+    """H:MM:SS, or D day(s), H:MM:SS past 24 hours, without microseconds"""
+    total_seconds = int(td.total_seconds())
+    days, remainder = divmod(total_seconds, 86400)
+    hours, remainder = divmod(remainder, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    text = f"{hours}:{minutes:02d}:{seconds:02d}"
+    if days:
+        text = f"{days} day{'s' if days != 1 else ''}, {text}"
+    return text
+
+
+def export_sessions(store, kinds=('work', 'break'), start_date=None, end_date=None, task=None, break_type=None):
+    """Yield (kind, session) pairs matching the filters, straight from the store"""
+    return store.query_kinds(kinds, start_date, end_date, {'work': task, 'break': break_type})
+
+
+def csv_rows(sessions):
+    """Format (kind, session) pairs as export rows"""
+    last_date = date_text = None
+    for kind, session in sessions:
+        start, end = session['start'], session['end']
+        if session['date'] != last_date:
+            last_date, date_text = session['date'], str(session['date'])
+        yield [
+            KIND_NAMES[kind],
+            date_text,
+            clock_time(start) if start else "",
+            clock_time(end) if end else "",
+            duration_text(end - start) if start and end else "",
+            session[LABEL_KEYS[kind]],
+            ""
+        ]
+
+
+def write_csv(path, rows, progress=None, chunk_size=500):
+    """Write rows under the export header a chunk at a time; returns the row count
+
+    `progress` is called with the running row count after every chunk.
+    """
+    count = 0
+    with open(path, "w", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for chunk in chunks(rows, chunk_size):
+            writer.writerows(chunk)
+            count += len(chunk)
+            if progress:
+                progress(count)
+    return count
+
+
+def chunks(items, size):
+    """Split an iterable into lists of at most `size` items"""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ndjson_lines(sessions):
+    """One compact JSON line per (kind, session) pair; store ids are left out"""
+    for kind, session in sessions:
+        record = session_to_record(session, kind)
+        del record['id']
+        yield json.dumps(dict(kind=kind, **record), separators=(',', ':')) + "\n"
+
+
+def write_ndjson(path, sessions, progress=None, chunk_size=500):
+    """Write (kind, session) pairs as NDJSON a chunk at a time; returns the session count"""
+    count = 0
+    with open(path, "w") as f:
+        for chunk in chunks(ndjson_lines(sessions), chunk_size):
+            f.writelines(chunk)
+            count += len(chunk)
+            if progress:
+                progress(count)
+    return count
+
+
+def read_ndjson(path):
+    """Yield (kind, session) pairs from an NDJSON file, one line at a time"""
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind = record['kind']
+                if kind not in SESSION_KINDS or not record.get('start'):
+                    raise ValueError("needs a work/break kind and a start time")
+                yield kind, record_to_session(record, kind)
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"{path}, line {line_number}: not a session record ({e})")
+
+
+def import_sessions(store, sessions, progress=None, chunk_size=500):
+    """Merge (kind, session) pairs into a store; returns (added, updated, skipped)
+
+    A session whose kind and start time already exist is a duplicate. It only
+    changes the stored copy by closing it when the stored one is still open,
+    so importing the same file twice is a no-op. Changes are written one
+    chunk at a time.
+    """
+    state = store.load()
+    # (kind, start) -> (id, closed) for every stored session
+    existing = {(kind, record['start']): (record['id'], bool(record.get('end')))
+                for kind in SESSION_KINDS for record in state[kind].values() if record.get('start')}
+    del state
+
+    added = updated = skipped = 0
+    for chunk in chunks(sessions, chunk_size):
+        events = []
+        for kind, session in chunk:
+            key = (kind, session['start'].isoformat())
+            stored = existing.get(key)
+            if stored is None:
+                session['id'] = store.next_id(kind)
+                events.append(store.stage('add', kind, session))
+                added += 1
+            elif session['end'] and not stored[1]:
+                session['id'] = stored[0]
+                events.append(store.stage('update', kind, session))
+                updated += 1
+            else:
+                skipped += 1
+                continue
+            existing[key] = (session['id'], bool(session['end']))
+        if events:
+            store.write_events(events)
+        if progress:
+            progress(added + updated + skipped)
+
+    if store.needs_compaction():
+        store.rewrite_snapshot()
+    return added, updated, skipped
@@ -0,0 +1,135 @@
+"""Printable HTML summaries for the Advanced Time Record System.
+
+A summary covers an explicit date range and is written a day at a time, so
+long ranges never build the whole document in memory. Each user has one
+summary file in the temporary directory that every print replaces whole, so
+prints leave nothing behind and several instances can print at once. Days
+are grouped onto pages of at most ``rows_per_page`` rows, each starting on a
+new printed sheet.
+
+Each day's table is rendered once and kept by SummaryRenderer until that
+day's sessions or totals change, so printing the same month again (or a
+week inside it) only formats the days that were edited in between.
+"""
+import os
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from html import escape
+
+from dtr_export import clock_time, duration_text
+
+STYLE = """
+    body { font-family: Arial, sans-serif; margin: 20px; }
+    h1 { color: #0078d7; }
+    table { border-collapse: collapse; width: 100%; margin-bottom: 20px; }
+    th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+    th { background-color: #e6f2ff; }
+    .summary { background-color: #f5f5f5; padding: 15px; margin-bottom: 20px; }
+    .page { page-break-after: always; }
+    .page:last-child { page-break-after: auto; }
+    .page-number { color: #777; font-size: 0.9em; }
+"""
+TABLE_HEADER = ("<tr><th>Type</th><th>Start Time</th><th>End Time</th>"
+                "<th>Duration</th><th>Task/Type</th></tr>\n")
+KIND_NAMES = {'work': "Work", 'break': "Break"}
+TOTAL_FIELDS = (('worked', "Total Work Time"), ('break', "Total Break Time"),
+                ('net', "Net Work Time"), ('overtime', "Overtime"))
+
+
+def day_rows(work_sessions, break_sessions, start_date, end_date):
+    """{day: [(kind, id, start, end, label)]} of started sessions in [start_date, end_date], by start time"""
+    low = datetime.combine(start_date, datetime.min.time())
+    high = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    days = {}
+    for kind, sessions in (('work', work_sessions), ('break', break_sessions)):
+        for session in sessions.rows_between(low, high):
+            days.setdefault(session['start'].date(), []).append(
+                (kind, session['id'], session['start'], session['end'], session[sessions.label_key]))
+    for rows in days.values():
+        rows.sort(key=lambda row: row[2])
+    return days
+
+
+def paginate(days, rows_per_page):
+    """Split [(day, rows, totals)] into pages of whole days with at most rows_per_page rows where possible"""
+    pages, page, size = [], [], 0
+    for entry in days:
+        if page and size + len(entry[1]) > rows_per_page:
+            pages.append(page)
+            page, size = [], 0
+        page.append(entry)
+        size += len(entry[1])
+    if page:
+        pages.append(page)
+    return pages
+
+
+class SummaryRenderer:
+    """Renders summaries to files, caching each day's table by its contents"""
+
+    def __init__(self, rows_per_page=200, cached_days=400):
+        self.rows_per_page = rows_per_page
+        self.cached_days = cached_days
+        self.cache = OrderedDict()
+
+    def day_table(self, day, rows, totals):
+        """HTML for one day's heading and table, reused while the rows and totals are unchanged"""
+        key = (tuple(rows), tuple(totals[field] for field, _ in TOTAL_FIELDS))
+        cached = self.cache.get(day)
+        if cached is not None and cached[0] == key:
+            self.cache.move_to_end(day)
+            return cached[1]
+
+        parts = [f"<h2>{day.strftime('%A, %Y-%m-%d')}</h2>\n<p>",
+                 " &middot; ".join(f"<strong>{label}:</strong> {duration_text(totals[field])}"
+                                   for field, label in TOTAL_FIELDS),
+                 "</p>\n<table>\n", TABLE_HEADER]
+        for kind, _, start, end, label in rows:
+            parts.append(f"<tr><td>{KIND_NAMES[kind]}</td><td>{clock_time(start)}</td>"
+                         f"<td>{clock_time(end) if end else '--:-- --'}</td>"
+                         f"<td>{duration_text(end - start) if end else 'In progress'}</td>"
+                         f"<td>{escape(label)}</td></tr>\n")
+        parts.append("</table>\n")
+        html = "".join(parts)
+
+        self.cache[day] = (key, html)
+        self.cache.move_to_end(day)
+        while len(self.cache) > self.cached_days:
+            self.cache.popitem(last=False)
+        return html
+
+    def write(self, path, title, days, totals, notes=""):
+        """Write a summary of [(day, rows, day totals)] with the range totals over path; returns the path"""
+        pages = paginate(days, self.rows_per_page)
+        # Streamed to a sibling file and renamed over the old summary, like storage's atomic_write
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                         prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(f"<html>\n<head>\n<meta charset=\"utf-8\">\n<title>{escape(title)}</title>\n"
+                        f"<style>{STYLE}</style>\n</head>\n<body>\n<h1>{escape(title)}</h1>\n"
+                        "<div class=\"summary\">\n<h2>Summary</h2>\n")
+                f.write("".join(f"<p><strong>{label}:</strong> {duration_text(totals[field])}</p>\n"
+                                for field, label in TOTAL_FIELDS))
+                f.write("</div>\n")
+                if not pages:
+                    f.write("<p>No sessions recorded in this range.</p>\n")
+                for number, page in enumerate(pages, 1):
+                    f.write(f"<div class=\"page\">\n<p class=\"page-number\">Page {number} of {len(pages)}</p>\n")
+                    f.write("".join(self.day_table(day, rows, day_totals) for day, rows, day_totals in page))
+                    f.write("</div>\n")
+                f.write(f"<h2>Notes</h2>\n<p>{escape(notes) or 'No notes recorded.'}</p>\n"
+                        f"<p style=\"margin-top: 30px;\">Generated on {datetime.now().strftime('%Y-%m-%d %I:%M %p')}</p>\n"
+                        "</body>\n</html>\n")
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return path
+
+
+def summary_path(username):
+    """The user's summary file in the temporary directory, replaced by each print"""
+    return os.path.join(tempfile.gettempdir(), f"dtr_summary_{username}.html")
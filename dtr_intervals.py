@@ -0,0 +1,131 @@
+"""Interval index over work and break sessions.
+
+Closed sessions are kept in per-day lists sorted by start time, so finding
+the sessions around a moment is a dict lookup plus a bisect. Sessions are
+filed under the day they start on; lookups also check the previous day to
+catch sessions that run past midnight.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+
+ZERO = timedelta()
+ONE_DAY = timedelta(days=1)
+
+
+def merge_intervals(intervals):
+    """Union of (start, end) pairs as a sorted list of disjoint intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def intersection_length(a, b):
+    """Total overlap between two sorted lists of disjoint intervals"""
+    total = ZERO
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if end > start:
+            total += end - start
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+def total_length(intervals):
+    return sum((end - start for start, end in intervals), ZERO)
+
+
+class IntervalIndex:
+    """Per-day sorted (start, end, id) lists of closed work and break sessions"""
+
+    def __init__(self):
+        self.days = {}
+
+    def add(self, kind, session):
+        if not (session['start'] and session['end']):
+            return
+        day_list = self.days.setdefault((kind, session['start'].date()), [])
+        insort(day_list, self._entry(session))
+
+    def remove(self, kind, session):
+        if not (session['start'] and session['end']):
+            return
+        key = (kind, session['start'].date())
+        day_list = self.days.get(key, [])
+        entry = self._entry(session)
+        i = bisect_left(day_list, entry)
+        if i < len(day_list) and day_list[i] == entry:
+            del day_list[i]
+            if not day_list:
+                del self.days[key]
+
+    @staticmethod
+    def _entry(session):
+        session_id = session.get('id')
+        return (session['start'], session['end'], -1 if session_id is None else session_id)
+
+    def _candidates(self, kind, start, end):
+        """Entries of one kind that may overlap [start, end)"""
+        day = start.date() - ONE_DAY
+        while day <= end.date():
+            day_list = self.days.get((kind, day), [])
+            # Entries starting at or after `end` cannot overlap
+            stop = bisect_left(day_list, (end,))
+            for entry in day_list[:stop]:
+                if entry[1] > start:
+                    yield entry
+            day += ONE_DAY
+
+    def at(self, moment):
+        """(kind, start, end, id) for every session in progress at `moment`"""
+        active = []
+        for kind in ('work', 'break'):
+            for day in (moment.date() - ONE_DAY, moment.date()):
+                day_list = self.days.get((kind, day), [])
+                for entry in day_list[:bisect_right(day_list, (moment, datetime.max))]:
+                    if entry[1] > moment:
+                        active.append((kind,) + entry)
+        return active
+
+    def overlapping(self, kind, start, end, exclude_id=None):
+        """Sessions of one kind overlapping [start, end), e.g. to catch duplicates"""
+        return [entry for entry in self._candidates(kind, start, end) if entry[2] != exclude_id]
+
+    def covered(self, kind, start, end):
+        """Time within [start, end) covered by sessions of one kind"""
+        spans = [(max(s, start), min(e, end)) for s, e, _ in self._candidates(kind, start, end)]
+        return total_length(merge_intervals(spans))
+
+    def net_time(self, day):
+        """Work time on a day with breaks subtracted only where they fall inside work"""
+        work = merge_intervals((s, e) for s, e, _ in self.days.get(('work', day), []))
+        if not work:
+            return ZERO
+        breaks = merge_intervals((s, e) for s, e, _ in self._candidates('break', work[0][0], work[-1][1]))
+        return total_length(work) - intersection_length(work, breaks)
+
+    def conflicts(self):
+        """Overlapping/duplicated work sessions and breaks taken outside any work session"""
+        problems = []
+        for (kind, day), day_list in sorted(self.days.items(), key=lambda item: (item[0][1], item[0][0])):
+            if kind == 'work':
+                latest = None
+                for entry in day_list:
+                    if latest and entry[0] < latest[1]:
+                        problems.append(('overlap', day, latest, entry))
+                    if latest is None or entry[1] > latest[1]:
+                        latest = entry
+            else:
+                for entry in day_list:
+                    if self.covered('work', entry[0], entry[1]) < entry[1] - entry[0]:
+                        problems.append(('break_outside_work', day, entry, None))
+        return problems
@@ -0,0 +1,112 @@
+"""Background disk I/O for the Advanced Time Record System.
+
+All reads and writes that can stall on a slow or network home directory run
+on one worker thread, in submission order. Completions are handed back to
+the UI thread, which polls for them with ``root.after``.
+"""
+import queue
+import threading
+
+
+class _Job:
+    def __init__(self, func, args, key, on_done, on_error, batch=None):
+        self.func = func
+        self.args = args
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.batch = batch
+        self.started = False
+
+
+class IOWorker:
+    """Single writer thread with a FIFO job queue and tail coalescing.
+
+    A new job only merges with the job at the tail of the queue when it has
+    the same key and has not started yet, so ordering between different kinds
+    of work (e.g. journal appends and snapshot rewrites) is always preserved.
+    """
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.completions = queue.Queue()
+        self.lock = threading.Lock()
+        self._tail = None
+        self.thread = threading.Thread(target=self._run, name="dtr-io", daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, key=None, on_done=None, on_error=None):
+        """Queue func(*args); a waiting tail job with the same key is replaced (latest wins)"""
+        with self.lock:
+            tail = self._tail
+            if key is not None and tail and tail.key == key and tail.batch is None and not tail.started:
+                tail.func, tail.args = func, args
+                tail.on_done, tail.on_error = on_done, on_error
+                return tail
+            return self._enqueue(_Job(func, args, key, on_done, on_error))
+
+    def append(self, key, func, item, on_done=None, on_error=None):
+        """Queue func(items); items appended while the job waits at the tail share one call"""
+        with self.lock:
+            tail = self._tail
+            if tail and tail.key == key and tail.batch is not None and not tail.started:
+                tail.batch.append(item)
+                return tail
+            return self._enqueue(_Job(func, (), key, on_done, on_error, batch=[item]))
+
+    def _enqueue(self, job):
+        self._tail = job
+        self.jobs.put(job)
+        return job
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            with self.lock:
+                job.started = True
+                if self._tail is job:
+                    self._tail = None
+            args = (job.batch,) if job.batch is not None else job.args
+            try:
+                result = job.func(*args)
+            except Exception as e:
+                if job.on_error:
+                    self.completions.put((job.on_error, e))
+                else:
+                    print(f"[DTR] Background I/O failed: {e}")
+            else:
+                if job.on_done:
+                    self.completions.put((job.on_done, result))
+            self.jobs.task_done()
+
+    def report(self, callback, value):
+        """Hand callback(value) to the UI thread from inside a running job, e.g. for progress"""
+        self.completions.put((callback, value))
+
+    def run_completions(self):
+        """Run finished-job callbacks; must be called on the UI thread"""
+        while True:
+            try:
+                callback, value = self.completions.get_nowait()
+            except queue.Empty:
+                return
+            callback(value)
+
+    def start_polling(self, root, interval=50):
+        """Deliver completions on the Tk thread every `interval` ms via root.after"""
+        def poll():
+            self.run_completions()
+            self._poll_id = root.after(interval, poll)
+        self._poll_id = root.after(interval, poll)
+
+    def flush(self):
+        """Block until every queued job has run"""
+        self.jobs.join()
+
+    def stop(self):
+        """Flush outstanding work and end the worker thread"""
+        self.flush()
+        self.jobs.put(None)
+        self.thread.join()
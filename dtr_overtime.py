@@ -0,0 +1,154 @@
+"""Overtime rules for the Advanced Time Record System.
+
+Paid time per day is the worked time, less that day's breaks when break
+deduction is on. Overtime is then counted in two steps, so no hour is
+counted twice:
+
+    daily overtime   paid time above the daily threshold
+    weekly overtime  the rest of a Monday-Sunday week's paid time above the
+                     weekly threshold
+
+and both are summed per pay period, a fixed run of days counted from
+``pay_period_start`` (a Monday, so weeks fall inside one period when the
+period is a whole number of weeks; otherwise a week's overtime goes to the
+period its Monday is in).
+
+These are pay-rule figures. The summary panel, reports and team totals use
+the same daily threshold on worked time alone (DailyTotals.day_overtime), so
+their overtime equals the daily overtime here when break deduction is off.
+
+The calculation runs over day tables -- parallel columns of date ordinals,
+worked and break microseconds -- for any number of users at once, grouped
+with numpy when it is installed and with plain dictionaries otherwise.
+"""
+from array import array
+from datetime import date, datetime, timedelta
+
+HOUR_US = 3600 * 10 ** 6
+
+
+def overtime_rules(settings, config):
+    """The rules in effect, from the user's settings and the installation config"""
+    return {
+        'daily_hours': settings['overtime_threshold'],
+        'weekly_hours': config['overtime_weekly_hours'],
+        'pay_period_days': config['pay_period_days'],
+        'pay_period_start': datetime.strptime(config['pay_period_start'], "%Y-%m-%d").date(),
+        'break_deduction': settings['break_deduction']
+    }
+
+
+def day_table(work_sessions, break_sessions, start_date=None, end_date=None):
+    """(date ordinals, worked µs, break µs) per day from two SessionColumns"""
+    low = datetime.combine(start_date, datetime.min.time()) if start_date else None
+    high = datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None
+    worked = work_sessions.day_micros(low, high)
+    breaks = break_sessions.day_micros(low, high)
+    days = sorted(set(worked) | set(breaks))
+    return (array('q', days), array('q', [worked.get(day, 0) for day in days]),
+            array('q', [breaks.get(day, 0) for day in days]))
+
+
+def pay_period(day, rules):
+    """First and last date of the pay period containing `day`"""
+    length = rules['pay_period_days']
+    first = rules['pay_period_start'] + timedelta(days=(day - rules['pay_period_start']).days // length * length)
+    return first, first + timedelta(days=length - 1)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def overtime_periods(tables, rules):
+    """Pay-period overtime for {user: day table}
+
+    Returns {user: {period first date: {'paid', 'regular', 'daily', 'weekly', 'overtime'}}}
+    with every figure in microseconds.
+    """
+    numpy = _numpy()
+    if numpy is None:
+        return _compute_loops(tables, rules)
+
+    users = list(tables)
+    lengths = [len(tables[user][0]) for user in users]
+    if not sum(lengths):
+        return {user: {} for user in users}
+    user_index = numpy.repeat(numpy.arange(len(users)), lengths)
+    days = numpy.concatenate([numpy.asarray(tables[user][0], dtype=numpy.int64) for user in users])
+    paid = numpy.concatenate([numpy.asarray(tables[user][1], dtype=numpy.int64) for user in users])
+    if rules['break_deduction']:
+        paid = paid - numpy.concatenate([numpy.asarray(tables[user][2], dtype=numpy.int64) for user in users])
+        paid = numpy.maximum(paid, 0)
+
+    daily = numpy.maximum(paid - int(rules['daily_hours'] * HOUR_US), 0)
+    anchor = rules['pay_period_start'].toordinal()
+    monday = anchor - rules['pay_period_start'].weekday()
+    length = rules['pay_period_days']
+
+    # Weekly overtime from each (user, week)'s time not already counted as daily overtime
+    week = (days - monday) // 7
+    week_span = int(week.max() - week.min()) + 1
+    week_keys, week_of_day = numpy.unique(user_index * week_span + (week - week.min()), return_inverse=True)
+    week_regular = numpy.bincount(week_of_day, weights=paid - daily)
+    weekly = numpy.maximum(week_regular - int(rules['weekly_hours'] * HOUR_US), 0)
+    week_user, week_start = week_keys // week_span, (week_keys % week_span + week.min()) * 7 + monday
+
+    # Days and weeks both land in a (user, pay period) group
+    day_period, week_period = (days - anchor) // length, (week_start - anchor) // length
+    first_period = min(day_period.min(), week_period.min())
+    period_span = int(max(day_period.max(), week_period.max()) - first_period) + 1
+    period_keys, group = numpy.unique(numpy.concatenate([
+        user_index * period_span + (day_period - first_period),
+        week_user * period_span + (week_period - first_period)]), return_inverse=True)
+    day_group, week_group = group[:len(days)], group[len(days):]
+    size = len(period_keys)
+    sums = {
+        'paid': numpy.bincount(day_group, weights=paid, minlength=size),
+        'daily': numpy.bincount(day_group, weights=daily, minlength=size),
+        'weekly': numpy.bincount(week_group, weights=weekly, minlength=size)
+    }
+    sums['overtime'] = sums['daily'] + sums['weekly']
+    sums['regular'] = sums['paid'] - sums['overtime']
+    # bincount sums in float64, exact for any realistic total (< 2**53 µs, 285 years)
+    columns = {field: values.astype(numpy.int64).tolist() for field, values in sums.items()}
+
+    result = {user: {} for user in users}
+    for row, key in enumerate(period_keys.tolist()):
+        user, period = divmod(key, period_span)
+        first = date.fromordinal(anchor + (period + int(first_period)) * length)
+        result[users[user]][first] = {field: columns[field][row] for field in columns}
+    return result
+
+
+def _compute_loops(tables, rules):
+    daily_limit = int(rules['daily_hours'] * HOUR_US)
+    weekly_limit = int(rules['weekly_hours'] * HOUR_US)
+    anchor = rules['pay_period_start'].toordinal()
+    monday = anchor - rules['pay_period_start'].weekday()
+    length = rules['pay_period_days']
+
+    result = {}
+    for user, (days, worked, breaks) in tables.items():
+        periods, weeks = {}, {}
+        for day, work, brk in zip(days, worked, breaks):
+            paid = max(work - brk, 0) if rules['break_deduction'] else work
+            daily = max(paid - daily_limit, 0)
+            period = periods.setdefault((day - anchor) // length, {'paid': 0, 'daily': 0, 'weekly': 0})
+            period['paid'] += paid
+            period['daily'] += daily
+            week = (day - monday) // 7
+            weeks[week] = weeks.get(week, 0) + paid - daily
+        for week, regular in weeks.items():
+            period = periods.setdefault((week * 7 + monday - anchor) // length, {'paid': 0, 'daily': 0, 'weekly': 0})
+            period['weekly'] += max(regular - weekly_limit, 0)
+        result[user] = {}
+        for period, sums in sorted(periods.items()):
+            sums['overtime'] = sums['daily'] + sums['weekly']
+            sums['regular'] = sums['paid'] - sums['overtime']
+            result[user][date.fromordinal(anchor + period * length)] = sums
+    return result
@@ -0,0 +1,158 @@
+"""Password hashing for the Advanced Time Record System.
+
+Stored hashes carry their own algorithm and parameters::
+
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+
+(salt and hash base64-encoded), so the work factor can be raised without
+invalidating existing accounts: a hash weaker than the installation's current
+parameters, or an unsalted SHA-256 hex digest from older versions, is
+replaced the next time its owner logs in.
+
+The work factor lives under ``"password_hash"`` in ``dtr_config.json``.
+Run ``python dtr_passwords.py --target-ms 250 --write-config`` on the slowest
+login terminal to measure the host and store parameters that take about
+that long per login.
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+DEFAULT_PARAMS = {'algorithm': 'pbkdf2_sha256', 'iterations': 200000}
+SALT_BYTES = 16
+SCRYPT_R, SCRYPT_P = 8, 1
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii')
+
+
+def _derive(password, salt, params):
+    if params['algorithm'] == 'pbkdf2_sha256':
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, params['iterations'])
+    if params['algorithm'] == 'scrypt':
+        if not hasattr(hashlib, 'scrypt'):
+            raise ValueError("scrypt needs Python built against OpenSSL 1.1 or newer")
+        n, r, p = params['n'], params.get('r', SCRYPT_R), params.get('p', SCRYPT_P)
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=128 * n * r * p + 1024 * 1024)
+    raise ValueError(f"Unknown password hash algorithm: {params['algorithm']}")
+
+
+def hash_password(password, params=None):
+    """Salted hash of a password in the self-describing stored format"""
+    params = params or DEFAULT_PARAMS
+    salt = os.urandom(SALT_BYTES)
+    digest = _b64(_derive(password, salt, params))
+    if params['algorithm'] == 'pbkdf2_sha256':
+        return f"pbkdf2_sha256${params['iterations']}${_b64(salt)}${digest}"
+    return (f"scrypt${params['n']}${params.get('r', SCRYPT_R)}${params.get('p', SCRYPT_P)}"
+            f"${_b64(salt)}${digest}")
+
+
+def parse_hash(stored):
+    """(params, salt, digest) of a stored hash; params is None for a legacy SHA-256 digest"""
+    parts = stored.split("$")
+    if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+        return {'algorithm': 'pbkdf2_sha256', 'iterations': int(parts[1])}, parts[2], parts[3]
+    if parts[0] == 'scrypt' and len(parts) == 6:
+        params = {'algorithm': 'scrypt', 'n': int(parts[1]), 'r': int(parts[2]), 'p': int(parts[3])}
+        return params, parts[4], parts[5]
+    return None, None, stored
+
+
+def verify_password(password, stored):
+    """Check a password against any stored format, in constant time"""
+    params, salt, digest = parse_hash(stored)
+    if params is None:
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+    else:
+        candidate = _b64(_derive(password, base64.b64decode(salt), params))
+    return hmac.compare_digest(candidate, digest)
+
+
+def needs_rehash(stored, params=None):
+    """True for legacy digests and hashes made with a different algorithm or lower cost"""
+    params = params or DEFAULT_PARAMS
+    current, _, _ = parse_hash(stored)
+    if current is None or current['algorithm'] != params['algorithm']:
+        return True
+    if params['algorithm'] == 'pbkdf2_sha256':
+        return current['iterations'] < params['iterations']
+    return (current['n'] < params['n'] or current['r'] < params.get('r', SCRYPT_R)
+            or current['p'] < params.get('p', SCRYPT_P))
+
+
+def hash_params(config):
+    """The installation's current hashing parameters"""
+    return config.get('password_hash') or DEFAULT_PARAMS
+
+
+def time_hash(params, rounds=3):
+    """Best-of-`rounds` seconds for one hash with these parameters"""
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        _derive("calibration password", os.urandom(SALT_BYTES), params)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibrate(target_ms, algorithm='pbkdf2_sha256'):
+    """Parameters that take about `target_ms` per hash on this host, with the measured timings
+
+    PBKDF2 scales linearly, so one probe is extrapolated; scrypt's n must be
+    a power of two, so it is doubled until the next step would overshoot.
+    """
+    target = target_ms / 1000
+    timings = []
+    if algorithm == 'pbkdf2_sha256':
+        probe = {'algorithm': algorithm, 'iterations': 50000}
+        elapsed = time_hash(probe)
+        timings.append((probe, elapsed))
+        params = {'algorithm': algorithm, 'iterations': max(10000, int(probe['iterations'] * target / elapsed))}
+    elif algorithm == 'scrypt':
+        params = {'algorithm': algorithm, 'n': 2 ** 12, 'r': SCRYPT_R, 'p': SCRYPT_P}
+        while True:
+            elapsed = time_hash(params, rounds=1)
+            timings.append((dict(params), elapsed))
+            if elapsed * 2 > target or params['n'] >= 2 ** 20:
+                break
+            params['n'] *= 2
+    else:
+        raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+    timings.append((params, time_hash(params)))
+    return params, timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure password hashing cost on this host")
+    parser.add_argument("--target-ms", type=float, default=250, help="login hashing time to aim for")
+    parser.add_argument("--algorithm", choices=["pbkdf2_sha256", "scrypt"], default="pbkdf2_sha256")
+    parser.add_argument("--config", default="dtr_config.json", help="installation config file")
+    parser.add_argument("--write-config", action="store_true", help="save the result to the config file")
+    args = parser.parse_args(argv)
+
+    params, timings = calibrate(args.target_ms, args.algorithm)
+    for probe, elapsed in timings:
+        print(f"{json.dumps(probe)}: {elapsed * 1000:.1f} ms")
+    print(f"Recommended: {json.dumps(params)}")
+
+    if args.write_config:
+        config = {}
+        if os.path.exists(args.config):
+            with open(args.config, "r") as f:
+                config = json.load(f)
+        config['password_hash'] = params
+        with open(args.config, "w") as f:
+            json.dump(config, f, indent=4)
+        print(f"Saved to {args.config}; existing hashes upgrade at each user's next login")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Period reports for the Advanced Time Record System.
+
+A report covers a date range and gives each day's worked, break, net
+(overlap-aware) and overtime time, the same figures rolled up by ISO week
+and month, and time per task. It is computed from the sessions themselves
+with the same DailyTotals rules as the main window.
+
+Ranges are cut into calendar months. Asking for a report only copies the
+session columns; sorting them by start, picking each month's sessions by
+bisection and computing the months all happen on a background thread. The
+month computation is pure Python, so threads would only take turns holding
+the GIL: the months run one after another on that thread, or in parallel on
+a process pool when ``processes`` is set. Finished reports are kept in a
+small LRU cache keyed by user, range and the caller's data version, so asking
+for the same report again before anything changes costs nothing.
+"""
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from dtr_binary import NONE_TIME, from_micros, to_micros
+from dtr_summary import ZERO, DailyTotals, period_key
+
+FIELDS = ('worked', 'break', 'net', 'overtime')
+MARGIN = timedelta(days=1)  # Breaks past midnight can change the neighbouring day's net time
+
+
+def month_chunks(start_date, end_date):
+    """Split [start_date, end_date] into (first, last) pairs, one per calendar month"""
+    chunks = []
+    first = start_date
+    while first <= end_date:
+        next_month = (first.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(end_date, next_month - timedelta(days=1))
+        chunks.append((first, last))
+        first = last + timedelta(days=1)
+    return chunks
+
+
+def compute_chunk(work, breaks, first, last, work_hours_per_day):
+    """Day totals and task times for [first, last] from closed (id, start µs, end µs, label) records
+
+    Module-level so it can run in a worker process.
+    """
+    def sessions(records, label_key):
+        return [{'id': session_id, 'start': from_micros(start), 'end': from_micros(end), label_key: label}
+                for session_id, start, end, label in records]
+
+    work_sessions = sessions(work, 'task')
+    totals = DailyTotals(work_hours_per_day)
+    totals.rebuild(work_sessions, sessions(breaks, 'type'))
+    days = {day: totals.day(day) for day in totals.days if first <= day <= last}
+    tasks = {}
+    for session in work_sessions:
+        if first <= session['start'].date() <= last:
+            tasks[session['task']] = tasks.get(session['task'], ZERO) + session['end'] - session['start']
+    return days, tasks
+
+
+def chunk_records(columns, chunks):
+    """Per (first, last) chunk, the closed (id, start µs, end µs, label) records starting within MARGIN of it
+
+    `columns` is a SessionColumns.frozen() copy; it is sorted by start once
+    and each chunk's records are found by bisection.
+    """
+    ids, starts, ends, labels, names = columns
+    order = sorted((position for position in range(len(ids))
+                    if starts[position] != NONE_TIME and ends[position] != NONE_TIME), key=starts.__getitem__)
+    sorted_starts = [starts[position] for position in order]
+    selected = []
+    for first, last in chunks:
+        low = bisect_left(sorted_starts, to_micros(datetime.combine(first - MARGIN, datetime.min.time())))
+        high = bisect_left(sorted_starts, to_micros(datetime.combine(last + MARGIN + timedelta(days=1),
+                                                                     datetime.min.time())))
+        selected.append([(ids[position], starts[position], ends[position], names[labels[position]])
+                         for position in order[low:high]])
+    return selected
+
+
+def assemble(start_date, end_date, parts):
+    """Merge computed chunks into one report dict"""
+    days, tasks = {}, {}
+    for chunk_days, chunk_tasks in parts:
+        days.update(chunk_days)
+        for task, duration in chunk_tasks.items():
+            tasks[task] = tasks.get(task, ZERO) + duration
+
+    report = {'start': start_date, 'end': end_date, 'days': dict(sorted(days.items())),
+              'tasks': dict(sorted(tasks.items(), key=lambda item: -item[1])),
+              'totals': {field: ZERO for field in FIELDS}, 'weekly': {}, 'monthly': {}}
+    for day, totals in report['days'].items():
+        for field in FIELDS:
+            report['totals'][field] += totals[field]
+        for period in ('weekly', 'monthly'):
+            bucket = report[period].setdefault(period_key(day, period), {field: ZERO for field in FIELDS})
+            for field in FIELDS:
+                bucket[field] += totals[field]
+    return report
+
+
+class ReportEngine:
+    """Computes reports in the background and remembers the most recent ones"""
+
+    def __init__(self, work_hours_per_day=8, workers=None, processes=False, cache_size=32):
+        self.work_hours_per_day = work_hours_per_day
+        self.workers = workers
+        self.processes = processes
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.runner = None
+        self.executor = None
+
+    def cached(self, key):
+        """A finished report for (user, start, end, data version), or None"""
+        report = self.cache.get(key)
+        if report is not None:
+            self.cache.move_to_end(key)
+        return report
+
+    def remember(self, key, report):
+        self.cache[key] = report
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def clear(self):
+        self.cache.clear()
+
+    def submit(self, work_sessions, break_sessions, start_date, end_date):
+        """Start computing a report from SessionColumns; returns a future of the report dict
+
+        Only copies of the columns are taken here, so they may change while it runs.
+        """
+        if self.runner is None:
+            self.runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dtr-report")
+        report = Future()
+        self.runner.submit(self._run, report, work_sessions.frozen(), break_sessions.frozen(), start_date, end_date)
+        return report
+
+    def _run(self, report, work, breaks, start_date, end_date):
+        """Select each month's sessions and compute the report (runs on the report thread)"""
+        try:
+            chunks = month_chunks(start_date, end_date)
+            jobs = [(work_records, break_records, first, last, self.work_hours_per_day)
+                    for (first, last), work_records, break_records
+                    in zip(chunks, chunk_records(work, chunks), chunk_records(breaks, chunks))]
+            if self.processes:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                parts = [future.result() for future in [self.executor.submit(compute_chunk, *job) for job in jobs]]
+            else:
+                parts = [compute_chunk(*job) for job in jobs]
+            report.set_result(assemble(start_date, end_date, parts))
+        except Exception as e:
+            report.set_exception(e)
+
+    def shutdown(self):
+        if self.runner is not None:
+            self.runner.shutdown(wait=False)
+            self.runner = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
@@ -0,0 +1,799 @@
+"""Record storage for the Advanced Time Record System.
+
+Each user's history lives in ``users/<name>/records.json`` (the snapshot) plus
+``users/<name>/records.journal``, an append-only log with one compact JSON
+event per line. A punch only appends a line to the journal; the snapshot is
+rewritten when the journal grows past ``compact_every`` events or when the
+application asks for it explicitly.
+
+Installations can instead keep every user's sessions in one indexed SQLite
+database by setting ``"storage_backend": "sqlite"`` in ``dtr_config.json``.
+
+With ``"snapshot_format": "binary"`` the snapshot is ``records.bin`` instead
+(see dtr_binary); the other format's file is read if the configured one does
+not exist yet, and removed at the next snapshot write.
+
+Snapshots are written to a temporary file, fsynced and renamed over the old
+one, so a crash mid-write leaves the previous snapshot intact. How often
+journal appends are fsynced is the ``"durability"`` setting: ``"always"``
+(every write), ``"interval"`` (at most every ``fsync_interval`` seconds) or
+``"close"`` (only when the store is synced or closed).
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import dtr_binary
+
+CONFIG_FILE = "dtr_config.json"
+DEFAULT_CONFIG = {
+    'storage_backend': 'journal',  # 'journal' or 'sqlite'
+    'users_dir': 'users',
+    'sqlite_path': os.path.join('users', 'records.db'),
+    'teams': {},  # {"Team name": ["user", ...]}, used by team rollups
+    'users_db': 'users.db',  # Account database; replaces the pickled users.dat
+    'durability': 'always',  # When journal writes are fsynced: 'always', 'interval' or 'close'
+    'fsync_interval': 5,  # Seconds between fsyncs with the 'interval' policy
+    'snapshot_format': 'json',  # Journal backend snapshot: 'json' (records.json) or 'binary' (records.bin)
+    'report_processes': False,  # Compute report months in parallel on a process pool
+    'overtime_weekly_hours': 40,  # Weekly overtime threshold
+    'pay_period_days': 14,
+    'pay_period_start': '2024-01-01',  # First day of any pay period (a Monday)
+    'backup_dir': 'backups',  # Local or mounted directory holding backup snapshots
+    'backup_interval_minutes': 30,  # How often to back up while the auto_backup setting is on
+    'sync_url': None,  # Server that session changes are posted to; None turns sync off
+    'sync_token': None,  # Sent as a Bearer token
+    'sync_outbox': os.path.join('users', 'outbox.db'),  # Changes waiting to be sent
+    'sync_batch_size': 500
+}
+DURABILITY_POLICIES = ('always', 'interval', 'close')
+SQLITE_SYNCHRONOUS = {'always': 'FULL', 'interval': 'NORMAL', 'close': 'OFF'}
+SNAPSHOT_FILES = {'json': "records.json", 'binary': "records.bin"}
+
+SESSION_KINDS = ('work', 'break')
+SESSION_LISTS = {'work': 'work_sessions', 'break': 'break_sessions'}
+LABEL_KEYS = {'work': 'task', 'break': 'type'}
+DEFAULT_LABELS = {'work': 'General Work', 'break': 'Lunch'}
+
+
+def session_to_record(session, kind):
+    """Convert an in-memory session dict to its JSON form"""
+    label_key = LABEL_KEYS[kind]
+    return {
+        "id": session.get('id'),
+        "start": session['start'].isoformat() if session['start'] else None,
+        "end": session['end'].isoformat() if session['end'] else None,
+        label_key: session.get(label_key, DEFAULT_LABELS[kind])
+    }
+
+
+def record_to_session(record, kind, default_date=None):
+    """Convert a JSON record to an in-memory session dict"""
+    label_key = LABEL_KEYS[kind]
+    start = datetime.fromisoformat(record['start']) if record.get('start') else None
+    end = datetime.fromisoformat(record['end']) if record.get('end') else None
+    return {
+        'id': record.get('id'),
+        'date': start.date() if start else default_date,
+        'start': start,
+        'end': end,
+        label_key: record.get(label_key, DEFAULT_LABELS[kind])
+    }
+
+
+def make_event(op, kind=None, session=None, text=None):
+    """Build one journal event; sessions are serialized at call time"""
+    if op == 'notes':
+        return {'op': op, 'text': text}
+    if op == 'delete':
+        return {'op': op, 'kind': kind, 'id': session['id']}
+    return {'op': op, 'kind': kind, 'rec': session_to_record(session, kind)}
+
+
+def snapshot_data(work_sessions, break_sessions, notes=""):
+    """Serialize in-memory sessions into the records.json layout"""
+    return {
+        "work_sessions": [session_to_record(s, 'work') for s in work_sessions],
+        "break_sessions": [session_to_record(s, 'break') for s in break_sessions],
+        "notes": notes
+    }
+
+
+def encode_snapshot(data):
+    """records.bin contents for a snapshot_data() dict"""
+    def parse(value):
+        return datetime.fromisoformat(value) if value else None
+
+    return dtr_binary.encode(
+        {kind: [(position if record.get('id') is None else record['id'],
+                 record.get(LABEL_KEYS[kind], DEFAULT_LABELS[kind]),
+                 parse(record.get('start')), parse(record.get('end')))
+                for position, record in enumerate(data[SESSION_LISTS[kind]])]
+         for kind in SESSION_KINDS},
+        data.get('notes', ""))
+
+
+def atomic_write(path, text, fsync=True):
+    """Replace a file so readers and crashes only ever see the old or the new contents"""
+    directory = os.path.dirname(path) or "."
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        os.chmod(temp_path, _file_mode(path))  # mkstemp creates files private to the owner
+        with os.fdopen(fd, "wb" if isinstance(text, bytes) else "w") as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if fsync:
+        _fsync_directory(directory)
+
+
+def _file_mode(path):
+    """Permissions for a replacement file: the existing file's, else the umask default"""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _fsync_directory(directory):
+    """Make a rename durable; not every platform can open a directory"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def load_install_config(path=CONFIG_FILE):
+    """Load installation-wide settings, falling back to defaults"""
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            config.update(json.load(f))
+    return config
+
+
+def open_store(username, config=None):
+    """Open the record store configured for this installation"""
+    config = config or load_install_config()
+    user_dir = os.path.join(config['users_dir'], username)
+    if config['durability'] not in DURABILITY_POLICIES:
+        raise ValueError(f"Unknown durability policy: {config['durability']}")
+    if config['storage_backend'] == 'sqlite':
+        return SQLiteStore(config['sqlite_path'], username, user_dir, durability=config['durability'])
+    if config['storage_backend'] == 'journal':
+        return JournalStore(user_dir, durability=config['durability'], fsync_interval=config['fsync_interval'],
+                            snapshot_format=config['snapshot_format'])
+    raise ValueError(f"Unknown storage backend: {config['storage_backend']}")
+
+
+def list_users(config):
+    """Every user with records under this installation"""
+    users = set()
+    if os.path.isdir(config['users_dir']):
+        users.update(name for name in os.listdir(config['users_dir'])
+                     if os.path.isdir(os.path.join(config['users_dir'], name)))
+    if config['storage_backend'] == 'sqlite' and os.path.exists(config['sqlite_path']):
+        store = SQLiteStore(config['sqlite_path'], None)
+        users.update(row[0] for row in store.conn.execute("SELECT DISTINCT user FROM sessions"))
+        store.close()
+    return sorted(users)
+
+
+def window_start_date(window, today):
+    """First date loaded at login for a 'today'/'week'/'month'/'all' window"""
+    if window == 'today':
+        return today
+    if window == 'week':
+        return today - timedelta(days=today.weekday())
+    if window == 'month':
+        return today.replace(day=1)
+    if window == 'all':
+        return None
+    raise ValueError(f"Unknown load window: {window}")
+
+
+def _in_window(record, since):
+    """True if a JSON record belongs in a window starting at `since`"""
+    if since is None or not record.get('start') or not record.get('end'):
+        return True  # Open sessions are always needed for the live view
+    return record['start'][:10] >= since.isoformat()
+
+
+def _session_in_window(session, since):
+    """_in_window for parsed sessions"""
+    if since is None or not session['start'] or not session['end']:
+        return True
+    return session['start'].date() >= since
+
+
+def change_events(before, after):
+    """Events that turn one load() state into another, e.g. to pass on what a restore changed"""
+    events = []
+    for kind in SESSION_KINDS:
+        old, new = before[kind], after[kind]
+        events.extend({'op': 'delete', 'kind': kind, 'id': rid} for rid in sorted(old.keys() - new.keys()))
+        events.extend({'op': 'add' if rid not in old else 'update', 'kind': kind, 'rec': record}
+                      for rid, record in new.items() if old.get(rid) != record)
+    if before['notes'] != after['notes']:
+        events.append({'op': 'notes', 'text': after['notes']})
+    return events
+
+
+def announce_changes(store, before):
+    """Pass on to store.on_write what changed since `before` without going through write_events"""
+    if store.on_write is not None:
+        events = change_events(before, store.load())
+        if events:
+            store.on_write(events)
+
+
+def sessions_from_state(state):
+    """{'work': [sessions], 'break': [sessions], 'notes': str} from a load() result"""
+    return {'work': [record_to_session(r, 'work') for r in state['work'].values()],
+            'break': [record_to_session(r, 'break') for r in state['break'].values()],
+            'notes': state['notes']}
+
+
+def _matches(record, kind, start_date, end_date, label):
+    """Filter helper shared by the non-indexed query path"""
+    if not record.get('start'):
+        return False
+    day = record['start'][:10]
+    if start_date and day < start_date.isoformat():
+        return False
+    if end_date and day > end_date.isoformat():
+        return False
+    return label is None or record.get(LABEL_KEYS[kind]) == label
+
+
+class JournalStore:
+    """Snapshot plus append-only journal for one user's records"""
+
+    def __init__(self, user_dir, compact_every=500, durability='always', fsync_interval=5, snapshot_format='json'):
+        if snapshot_format not in SNAPSHOT_FILES:
+            raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+        self.user_dir = user_dir
+        self.snapshot_format = snapshot_format
+        self.snapshot_paths = {fmt: os.path.join(user_dir, name) for fmt, name in SNAPSHOT_FILES.items()}
+        self.snapshot_path = self.snapshot_paths[snapshot_format]
+        self.journal_path = os.path.join(user_dir, "records.journal")
+        self.compact_every = compact_every
+        self.durability = durability
+        self.fsync_interval = fsync_interval
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+        self._tail_checked = False
+        self.journal_events = 0
+        self._next_ids = {kind: 0 for kind in SESSION_KINDS}
+        self.on_write = None  # Called with each batch of events once it is written (e.g. to queue it for sync)
+
+    def load(self, since=None):
+        """Replay snapshot and journal into {'work': {id: record}, 'break': {...}, 'notes': str}
+
+        With `since`, only sessions starting on or after that date are returned;
+        older ones are still replayed so ids stay consistent.
+        """
+        state, self.journal_events = self._replay(since, parsed=False)
+        return state
+
+    def load_sessions(self, since=None):
+        """Like load(), but as {'work': [sessions], 'break': [sessions], 'notes': str}
+
+        A binary snapshot is decoded straight into sessions, without going
+        through JSON records and ISO date strings.
+        """
+        state, self.journal_events = self._replay(since, parsed=True)
+        return {'work': list(state['work'].values()), 'break': list(state['break'].values()),
+                'notes': state['notes']}
+
+    def _replay(self, since, parsed):
+        """(state, journal events) from snapshot plus journal, as records or (when `parsed`) as session dicts"""
+        state = {'work': {}, 'break': {}, 'notes': ""}
+        self._read_snapshot(state, parsed)
+
+        events = 0
+        for event in self._journal():
+            self._apply(state, event)
+            events += 1
+
+        for kind in SESSION_KINDS:
+            # Never hand out an id again that was reserved before this load
+            self._next_ids[kind] = max(self._next_ids[kind], max(state[kind], default=-1) + 1)
+            items = state[kind]
+            # JSON records are only parsed once they are known to be in the window; a
+            # binary snapshot's entries arrive already parsed (they carry a 'date')
+            if since is not None:
+                items = {rid: item for rid, item in items.items()
+                         if (_session_in_window if 'date' in item else _in_window)(item, since)}
+            if parsed:
+                items = {rid: item if 'date' in item else record_to_session(item, kind) for rid, item in items.items()}
+            state[kind] = items
+        return state, events
+
+    def _read_snapshot(self, state, parsed):
+        """Fill `state` from the configured snapshot, or the other format's until one is written"""
+        paths = [self.snapshot_path] + [path for path in self.snapshot_paths.values() if path != self.snapshot_path]
+        path = next((path for path in paths if os.path.exists(path)), None)
+        if path is None:
+            return
+
+        if path == self.snapshot_paths['binary']:
+            sessions, state['notes'] = dtr_binary.read(path)
+            for kind in SESSION_KINDS:
+                label_key = LABEL_KEYS[kind]
+                items = state[kind]
+                if parsed:
+                    for session_id, label, start, end in sessions[kind]:
+                        items[session_id] = {'id': session_id, 'date': start.date() if start else None,
+                                             'start': start, 'end': end, label_key: label}
+                else:
+                    for session_id, label, start, end in sessions[kind]:
+                        items[session_id] = {'id': session_id, 'start': start.isoformat() if start else None,
+                                             'end': end.isoformat() if end else None, label_key: label}
+            return
+
+        with open(path, "r") as f:
+            data = json.load(f)
+        for kind in SESSION_KINDS:
+            for position, record in enumerate(data.get(SESSION_LISTS[kind], [])):
+                # Snapshots written before the journal existed carry no ids
+                if record.get('id') is None:
+                    record['id'] = position
+                state[kind][record['id']] = record
+        state['notes'] = data.get("notes", "")
+
+    def fingerprint(self):
+        """Changes whenever the snapshot or journal is written"""
+        parts = []
+        for path in (self.snapshot_paths['json'], self.journal_path, self.snapshot_paths['binary']):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+            else:
+                parts.append("-")
+        return "journal:" + "/".join(parts)
+
+    def _journal(self):
+        """Yield the journal's events in order"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # Torn final line from an interrupted append, or one still being
+                    # written by another kiosk; only the writer repairs it (see _repair_tail)
+                    return
+                yield event
+
+    def query(self, kind, start_date=None, end_date=None, label=None):
+        """Yield sessions of one kind in a date range, by start time"""
+        for _, session in self.query_kinds((kind,), start_date, end_date, {kind: label}):
+            yield session
+
+    def query_kinds(self, kinds, start_date=None, end_date=None, labels=None):
+        """Yield (kind, session) pairs matching the filters, kind by kind and by start time
+
+        One replay serves every kind, and only matching records are kept while
+        replaying, so memory follows the number of matches. The snapshot file
+        itself is still read whole.
+        """
+        labels = labels or {}
+
+        def keep(kind, record):
+            return kind in kinds and _matches(record, kind, start_date, end_date, labels.get(kind))
+
+        state = {'work': {}, 'break': {}, 'notes': ""}
+        self._read_snapshot(state, parsed=False)
+        for kind in SESSION_KINDS:
+            state[kind] = {rid: record for rid, record in state[kind].items() if keep(kind, record)}
+        for event in self._journal():
+            if event['op'] == 'notes':
+                continue
+            records = state[event['kind']]
+            if event['op'] == 'delete':
+                records.pop(event['id'], None)
+            elif keep(event['kind'], event['rec']):
+                records[event['rec']['id']] = event['rec']
+            else:
+                records.pop(event['rec']['id'], None)  # Edited out of the range
+        for kind in kinds:
+            # ISO timestamps sort in time order
+            for record in sorted(state[kind].values(), key=lambda record: record['start']):
+                yield kind, record_to_session(record, kind)
+
+    @staticmethod
+    def _apply(state, event):
+        """Apply one journal event to replay state (idempotent)"""
+        op = event['op']
+        if op == 'notes':
+            state['notes'] = event.get('text', "")
+            return
+        records = state[event['kind']]
+        if op in ('add', 'update'):
+            records[event['rec']['id']] = event['rec']
+        elif op == 'delete':
+            records.pop(event['id'], None)
+
+    def next_id(self, kind):
+        """Reserve a stable id for a new session"""
+        session_id = self._next_ids[kind]
+        self._next_ids[kind] += 1
+        return session_id
+
+    def stage(self, op, kind=None, session=None, text=None):
+        """Build the event for one change and count it towards compaction"""
+        self.journal_events += 1
+        return make_event(op, kind, session, text)
+
+    def append(self, op, kind=None, session=None, text=None):
+        """Append a single add/update/delete/notes event to the journal"""
+        self.write_events([self.stage(op, kind, session, text)])
+
+    def write_events(self, events):
+        """Append a batch of staged events with a single write"""
+        if not os.path.exists(self.user_dir):
+            os.makedirs(self.user_dir)
+        if not self._tail_checked:
+            self._repair_tail()
+        with open(self.journal_path, "a") as f:
+            f.write("".join(json.dumps(event, separators=(',', ':')) + "\n" for event in events))
+            if self.durability == 'always' or (
+                    self.durability == 'interval' and time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._fsync(f)
+            else:
+                self._unsynced = True
+        if self.on_write is not None:
+            self.on_write(events)
+
+    def _repair_tail(self):
+        """Cut a torn final line left by an interrupted append, so the next append starts on a clean line
+
+        Only the store that appends to this journal calls this, once before its
+        first write; readers skip a torn line instead, as it may still be in
+        the middle of being written.
+        """
+        self._tail_checked = True
+        try:
+            f = open(self.journal_path, "r+b")
+        except FileNotFoundError:
+            return
+        with f:
+            size = end = f.seek(0, os.SEEK_END)
+            while end > 0:
+                step = min(end, 4096)
+                f.seek(end - step)
+                newline = f.read(step).rfind(b"\n")
+                if newline >= 0:
+                    end += newline + 1 - step
+                    break
+                end -= step
+            if end < size:
+                f.truncate(end)
+
+    def _fsync(self, f):
+        f.flush()
+        os.fsync(f.fileno())
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+
+    def sync(self):
+        """Force journal appends not yet fsynced by the durability policy to disk"""
+        if self._unsynced and os.path.exists(self.journal_path):
+            with open(self.journal_path, "a") as f:
+                self._fsync(f)
+
+    def needs_compaction(self):
+        """True once the journal is long enough to fold into the snapshot"""
+        return self.journal_events >= self.compact_every
+
+    def stage_snapshot(self, work_sessions, break_sessions, notes=""):
+        """Capture the snapshot to write; events staged so far are folded into it"""
+        self.journal_events = 0
+        return snapshot_data(work_sessions, break_sessions, notes)
+
+    def write_snapshot(self, data):
+        """Rewrite the snapshot and truncate the journal"""
+        if not os.path.exists(self.user_dir):
+            os.makedirs(self.user_dir)
+
+        # The new snapshot is on disk before the journal it replaces is cleared
+        if self.snapshot_format == 'binary':
+            atomic_write(self.snapshot_path, encode_snapshot(data))
+        else:
+            atomic_write(self.snapshot_path, json.dumps(data, indent=4))
+        for path in self.snapshot_paths.values():
+            if path != self.snapshot_path and os.path.exists(path):
+                os.remove(path)
+
+        # Replay is idempotent, so a crash before this point only means the
+        # same events get applied twice on the next load.
+        open(self.journal_path, "w").close()
+        self._unsynced = False
+        self._tail_checked = True
+
+    def compact(self, work_sessions, break_sessions, notes=""):
+        """Rewrite the snapshot from in-memory sessions and truncate the journal"""
+        self.write_snapshot(self.stage_snapshot(work_sessions, break_sessions, notes))
+
+    def stage_rewrite(self):
+        """Count a coming rewrite_snapshot(); events staged so far will be folded into it"""
+        self.journal_events = 0
+
+    def rewrite_snapshot(self, notes=None):
+        """Fold the journal into a new snapshot straight from disk, without parsing sessions
+
+        Every change is journaled, so this is the same snapshot compact() would
+        write from a full in-memory history. `notes` replaces the saved notes.
+        """
+        state = self._replay(None, parsed=False)[0]
+        self.write_snapshot({'work_sessions': list(state['work'].values()),
+                             'break_sessions': list(state['break'].values()),
+                             'notes': state['notes'] if notes is None else notes})
+
+    def close(self):
+        """Sync outstanding journal appends; files are otherwise only open during each call"""
+        self.sync()
+
+
+class SQLiteStore:
+    """Sessions for all users in one SQLite database, indexed by date and task"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            user TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            start_ts TEXT,
+            end_ts TEXT,
+            label TEXT,
+            start_date TEXT,
+            PRIMARY KEY (user, kind, id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_user_date
+            ON sessions (user, start_date);
+        CREATE INDEX IF NOT EXISTS idx_sessions_user_label
+            ON sessions (user, kind, label, start_date);
+        CREATE TABLE IF NOT EXISTS notes (
+            user TEXT PRIMARY KEY,
+            text TEXT
+        );
+        CREATE TABLE IF NOT EXISTS migrations (
+            user TEXT PRIMARY KEY,
+            migrated TEXT
+        );
+        CREATE TABLE IF NOT EXISTS revisions (
+            user TEXT PRIMARY KEY,
+            rev INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, db_path, username, user_dir=None, durability='always'):
+        self.db_path = db_path
+        self.durability = durability
+        self.username = username
+        self.user_dir = user_dir
+        self.journal_events = 0
+        self._next_ids = {kind: 0 for kind in SESSION_KINDS}
+        self.on_write = None  # See JournalStore
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        if durability != 'always':
+            # WAL keeps a crash from corrupting the database when commits are not fsynced
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS[durability]}")
+        self.conn.executescript(self.SCHEMA)
+        if user_dir:
+            self.migrate_from_json(user_dir)
+
+    def sync(self):
+        """Checkpoint the write-ahead log with fsyncs so every commit so far is on disk"""
+        if self.durability == 'always':
+            return
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("PRAGMA wal_checkpoint(FULL)")
+        self.conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS[self.durability]}")
+
+    def close(self):
+        """Sync and close the database connection"""
+        self.sync()
+        self.conn.close()
+
+    def load(self, since=None):
+        """Return the same {'work': {id: record}, 'break': {...}, 'notes': str} shape as JournalStore"""
+        state = {'work': {}, 'break': {}, 'notes': ""}
+        sql = "SELECT kind, id, start_ts, end_ts, label FROM sessions WHERE user = ?"
+        params = [self.username]
+        if since is not None:
+            sql += " AND (start_date >= ? OR start_ts IS NULL OR end_ts IS NULL)"
+            params.append(since.isoformat())
+        rows = self.conn.execute(sql + " ORDER BY kind, id", params)
+        for kind, session_id, start, end, label in rows:
+            state[kind][session_id] = {'id': session_id, 'start': start, 'end': end, LABEL_KEYS[kind]: label}
+
+        row = self.conn.execute("SELECT text FROM notes WHERE user = ?", (self.username,)).fetchone()
+        if row:
+            state['notes'] = row[0]
+
+        for kind, max_id in self.conn.execute(
+                "SELECT kind, MAX(id) FROM sessions WHERE user = ? GROUP BY kind", (self.username,)):
+            self._next_ids[kind] = max(self._next_ids[kind], max_id + 1)
+        return state
+
+    def load_sessions(self, since=None):
+        """Like load(), but as {'work': [sessions], 'break': [sessions], 'notes': str}"""
+        return sessions_from_state(self.load(since))
+
+    def fingerprint(self):
+        """Changes whenever the user's rows change"""
+        row = self.conn.execute("SELECT rev FROM revisions WHERE user = ?", (self.username,)).fetchone()
+        return f"sqlite:{row[0] if row else 0}"
+
+    def _bump_revision(self):
+        """Record a change to the user's rows (call inside the writing transaction)"""
+        self.conn.execute("INSERT OR IGNORE INTO revisions VALUES (?, 0)", (self.username,))
+        self.conn.execute("UPDATE revisions SET rev = rev + 1 WHERE user = ?", (self.username,))
+
+    def migrate_from_json(self, user_dir):
+        """One-shot import of a user's records.json (and journal tail) into the database"""
+        if not os.path.isdir(user_dir):
+            return 0
+        done = self.conn.execute("SELECT 1 FROM migrations WHERE user = ?", (self.username,)).fetchone()
+        if done:
+            return 0
+
+        state = JournalStore(user_dir).load()
+        with self.conn:
+            for kind in SESSION_KINDS:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [self._row(kind, record) for record in state[kind].values()])
+            self.conn.execute("INSERT OR REPLACE INTO notes VALUES (?, ?)", (self.username, state['notes']))
+            self.conn.execute("INSERT INTO migrations VALUES (?, ?)",
+                              (self.username, datetime.now().isoformat()))
+            self._bump_revision()
+        return sum(len(state[kind]) for kind in SESSION_KINDS)
+
+    def _row(self, kind, record):
+        """Build a sessions table row from a JSON-form record"""
+        start = record.get('start')
+        return (self.username, kind, record['id'], start, record.get('end'),
+                record.get(LABEL_KEYS[kind], DEFAULT_LABELS[kind]), start[:10] if start else None)
+
+    def next_id(self, kind):
+        """Reserve a stable id for a new session"""
+        session_id = self._next_ids[kind]
+        self._next_ids[kind] += 1
+        return session_id
+
+    def stage(self, op, kind=None, session=None, text=None):
+        """Build the event for one change"""
+        return make_event(op, kind, session, text)
+
+    def append(self, op, kind=None, session=None, text=None):
+        """Apply a single add/update/delete/notes change as one small transaction"""
+        self.write_events([self.stage(op, kind, session, text)])
+
+    def write_events(self, events):
+        """Apply a batch of staged events in one transaction"""
+        with self.conn:
+            self._bump_revision()
+            for event in events:
+                op = event['op']
+                if op == 'notes':
+                    self.conn.execute("INSERT OR REPLACE INTO notes VALUES (?, ?)", (self.username, event['text']))
+                elif op == 'delete':
+                    self.conn.execute("DELETE FROM sessions WHERE user = ? AND kind = ? AND id = ?",
+                                      (self.username, event['kind'], event['id']))
+                else:
+                    self.conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                      self._row(event['kind'], event['rec']))
+        if self.on_write is not None:
+            self.on_write(events)
+
+    def needs_compaction(self):
+        """The database is updated in place, so there is never a journal to fold"""
+        return False
+
+    def stage_snapshot(self, work_sessions, break_sessions, notes=""):
+        """Capture the full set of rows to write"""
+        return snapshot_data(work_sessions, break_sessions, notes)
+
+    def write_snapshot(self, data):
+        """Replace the user's rows with a captured snapshot"""
+        with self.conn:
+            self._bump_revision()
+            self.conn.execute("DELETE FROM sessions WHERE user = ?", (self.username,))
+            for kind in SESSION_KINDS:
+                self.conn.executemany(
+                    "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [self._row(kind, record) for record in data[SESSION_LISTS[kind]]])
+            self.conn.execute("INSERT OR REPLACE INTO notes VALUES (?, ?)", (self.username, data['notes']))
+
+    def compact(self, work_sessions, break_sessions, notes=""):
+        """Replace the user's rows with the in-memory sessions"""
+        self.write_snapshot(self.stage_snapshot(work_sessions, break_sessions, notes))
+
+    def stage_rewrite(self):
+        """Nothing to count; see JournalStore.stage_rewrite()"""
+
+    def rewrite_snapshot(self, notes=None):
+        """The rows are always current, so only the notes can need saving
+
+        Like a journal snapshot this is not a change of its own, so on_write is not called.
+        """
+        if notes is not None:
+            with self.conn:
+                self._bump_revision()
+                self.conn.execute("INSERT OR REPLACE INTO notes VALUES (?, ?)", (self.username, notes))
+
+    def query(self, kind, start_date=None, end_date=None, label=None):
+        """Yield sessions of one kind in a date range using the date/label indexes"""
+        sql = "SELECT id, start_ts, end_ts, label FROM sessions WHERE user = ? AND kind = ?"
+        params = [self.username, kind]
+        if label is not None:
+            sql += " AND label = ?"
+            params.append(label)
+        if start_date:
+            sql += " AND start_date >= ?"
+            params.append(start_date.isoformat())
+        if end_date:
+            sql += " AND start_date <= ?"
+            params.append(end_date.isoformat())
+        sql += " ORDER BY start_date, start_ts, id"
+
+        for session_id, start, end, row_label in self.conn.execute(sql, params):
+            yield record_to_session({'id': session_id, 'start': start, 'end': end,
+                                     LABEL_KEYS[kind]: row_label}, kind)
+
+    def query_kinds(self, kinds, start_date=None, end_date=None, labels=None):
+        """Yield (kind, session) pairs matching the filters, kind by kind and by start time"""
+        labels = labels or {}
+        for kind in kinds:
+            for session in self.query(kind, start_date, end_date, labels.get(kind)):
+                yield kind, session
+
+
+def migrate_json_to_sqlite(config=None):
+    """Migrate every user directory into the configured SQLite database"""
+    config = config or load_install_config()
+    migrated = {}
+    users_dir = config['users_dir']
+    if not os.path.isdir(users_dir):
+        return migrated  # Fresh install: nothing to migrate
+    for username in sorted(os.listdir(users_dir)):
+        user_dir = os.path.join(users_dir, username)
+        if not os.path.isdir(user_dir):
+            continue
+        store = SQLiteStore(config['sqlite_path'], username)
+        migrated[username] = store.migrate_from_json(user_dir)
+        store.close()
+    return migrated
+
+
+if __name__ == "__main__":
+    for user, count in migrate_json_to_sqlite().items():
+        print(f"[DTR] Migrated {count} sessions for {user}")
@@ -0,0 +1,394 @@
+"""Running work/break totals for the Advanced Time Record System.
+
+Totals are kept per day and overall, and are adjusted one session at a time
+so the summary panel never has to rescan the history. Net time comes from an
+IntervalIndex, so breaks only count where they overlap work. SummaryRollups adds
+per-task hours and materialized ISO-week and month buckets, which are saved
+as ``daily_summary.json``, ``weekly_summary.json`` and ``monthly_summary.json``
+in the user's directory.
+"""
+import json
+import os
+from datetime import date, timedelta
+
+from dtr_intervals import IntervalIndex
+from dtr_storage import atomic_write
+
+ZERO = timedelta()
+ONE_DAY = timedelta(days=1)
+
+
+def session_duration(session):
+    """Duration of a closed session, or None while it is still open"""
+    if session['start'] and session['end']:
+        return session['end'] - session['start']
+    return None
+
+
+def day_index(work_sessions, break_sessions):
+    """(IntervalIndex, {day: net time}) over closed sessions, for DailyTotals.warm_from()
+
+    Touches no shared state, so it can run on the I/O worker.
+    """
+    index = IntervalIndex()
+    for kind, sessions in (('work', work_sessions), ('break', break_sessions)):
+        for session in sessions:
+            index.add(kind, session)
+    return index, {day: index.net_time(day) for kind, day in index.days if kind == 'work'}
+
+
+class DailyTotals:
+    """Per-day and overall worked, break and overtime totals"""
+
+    def __init__(self, work_hours_per_day=8):
+        self.daily_threshold = timedelta(hours=work_hours_per_day)
+        self.days = {}
+        self.total_worked = ZERO
+        self.total_break = ZERO
+        self.total_net = ZERO
+        self.overtime = ZERO
+        self.index = IntervalIndex()
+        # Days restored from saved totals without their sessions; see warm()
+        self.cold_days = set()
+        self._bulk = False  # Set while rebuild() adds sessions; net time is computed once at the end
+
+    @property
+    def net_work(self):
+        return self.total_net
+
+    def rebuild(self, work_sessions, break_sessions):
+        """Recompute every total from scratch (used once after loading)"""
+        self.days = {}
+        self.total_worked = self.total_break = self.total_net = self.overtime = ZERO
+        self.index = IntervalIndex()
+        self.cold_days = set()
+        # Index everything first: a day's net time depends on the neighbouring days' breaks
+        self._bulk = True
+        try:
+            for session in work_sessions:
+                self.add('work', session)
+            for session in break_sessions:
+                self.add('break', session)
+        finally:
+            self._bulk = False
+        for day in self.days:
+            self._refresh_net(day)
+
+    def add(self, kind, session):
+        """Count one closed session"""
+        self._adjust(kind, session, 1)
+
+    def remove(self, kind, session):
+        """Stop counting one closed session"""
+        self._adjust(kind, session, -1)
+
+    def _adjust(self, kind, session, sign):
+        """Apply a session to its day and fold the change into the overall totals"""
+        duration = session_duration(session)
+        if duration is None:
+            return
+
+        day = session['start'].date()
+        totals = self.days.get(day)
+        if totals is None:
+            totals = self.days[day] = self._new_day()
+        old_overtime = self.day_overtime(day)
+
+        totals[kind] += duration * sign
+        if kind == 'work':
+            self.total_worked += duration * sign
+        else:
+            self.total_break += duration * sign
+        self.overtime += self.day_overtime(day) - old_overtime
+
+        if sign > 0:
+            self.index.add(kind, session)
+        else:
+            self.index.remove(kind, session)
+        if day in self.cold_days:
+            # No intervals for this day; fall back to plain work minus break
+            delta = duration * sign if kind == 'work' else -duration * sign
+            totals['net'] += delta
+            self.total_net += delta
+        elif not self._bulk:
+            for changed in self.net_days(kind, day):
+                self._refresh_net(changed)
+
+        if totals['work'] == ZERO and totals['break'] == ZERO:
+            self.total_net -= totals['net']
+            del self.days[day]
+            self.cold_days.discard(day)
+
+    @staticmethod
+    def net_days(kind, day):
+        """Days whose net time a session of this kind starting on `day` can change"""
+        if kind == 'work':
+            return (day,)
+        # A break just after midnight can overlap the previous day's shift, one
+        # running past midnight the next day's
+        return (day - ONE_DAY, day, day + ONE_DAY)
+
+    def _refresh_net(self, day):
+        """Recompute one day's overlap-aware net time from the interval index"""
+        totals = self.days.get(day)
+        if totals is None or day in self.cold_days:
+            return
+        net = self.index.net_time(day)
+        self.total_net += net - totals['net']
+        totals['net'] = net
+
+    def warm(self, work_sessions, break_sessions):
+        """Index the sessions of restored days so their net time is exact again
+
+        Pass every closed session of each day being warmed.
+        """
+        self.warm_from(*day_index(work_sessions, break_sessions))
+
+    def warm_from(self, index, nets):
+        """warm() with the sessions already indexed by day_index(), e.g. on another thread"""
+        # Nets computed without the sessions this index already had are wrong next to their days
+        indexed = {day for _, day in self.index.days}
+        near_indexed = indexed | {day - ONE_DAY for day in indexed} | {day + ONE_DAY for day in indexed}
+
+        added = {key: entries for key, entries in index.days.items() if key[1] in self.cold_days}
+        for key in added.keys() & self.index.days.keys():
+            added[key] = sorted(self.index.days[key] + added[key])
+        self.index.days.update(added)
+        touched = {day for _, day in added}
+        self.cold_days -= touched
+
+        for day in touched - near_indexed:
+            totals = self.days.get(day)
+            if totals is not None:
+                net = nets.get(day, ZERO)
+                self.total_net += net - totals['net']
+                totals['net'] = net
+        # A break crossing midnight changes the next day's net, one just after it the previous day's
+        neighbours = {day - ONE_DAY for day in touched} | {day + ONE_DAY for day in touched}
+        for day in (touched & near_indexed) | (neighbours - touched):
+            self._refresh_net(day)
+
+    def merge(self, other):
+        """Fold in totals built separately (e.g. on the I/O worker) from sessions starting on other days"""
+        # A break across midnight between the two sets changes net time on both sides of the seam
+        seam = {day for day in other.days if day - ONE_DAY in self.days or day + ONE_DAY in self.days}
+        seam |= {day for day in self.days if day - ONE_DAY in other.days or day + ONE_DAY in other.days}
+        self.days.update(other.days)
+        self.index.days.update(other.index.days)
+        self.cold_days |= other.cold_days
+        self.total_worked += other.total_worked
+        self.total_break += other.total_break
+        self.total_net += other.total_net
+        self.overtime += other.overtime
+        for day in seam:
+            self._refresh_net(day)
+
+    def _new_day(self):
+        return {'work': ZERO, 'break': ZERO, 'net': ZERO}
+
+    def day_overtime(self, day):
+        """Worked time above the daily threshold for one day, breaks not deducted
+
+        dtr_overtime applies the same threshold to paid time for pay-rule overtime.
+        """
+        totals = self.days.get(day)
+        if not totals or totals['work'] <= self.daily_threshold:
+            return ZERO
+        return totals['work'] - self.daily_threshold
+
+    def day(self, day):
+        """Worked, break, net and overtime totals for one day"""
+        totals = self.days.get(day) or self._new_day()
+        return {
+            'worked': totals['work'],
+            'break': totals['break'],
+            'net': totals['net'],
+            'overtime': self.day_overtime(day)
+        }
+
+
+def period_key(day, period):
+    """Bucket label for a day: 2025-03-04, 2025-W10 or 2025-03"""
+    if period == 'daily':
+        return day.isoformat()
+    if period == 'weekly':
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == 'monthly':
+        return day.strftime("%Y-%m")
+    raise ValueError(f"Unknown period: {period}")
+
+
+def rollup(totals, period):
+    """Group a DailyTotals into daily/weekly/monthly buckets, sorted by period"""
+    buckets = {}
+    for day in sorted(totals.days):
+        bucket = buckets.setdefault(period_key(day, period),
+                                    {'worked': ZERO, 'break': ZERO, 'net': ZERO, 'overtime': ZERO})
+        for field, value in totals.day(day).items():
+            bucket[field] += value
+    return buckets
+
+
+def period_bounds(day, period):
+    """First and last date of the week or month containing `day`"""
+    if period == 'weekly':
+        first = day - timedelta(days=day.weekday())
+        return first, first + timedelta(days=6)
+    first = day.replace(day=1)
+    next_month = (first + timedelta(days=32)).replace(day=1)
+    return first, next_month - timedelta(days=1)
+
+
+def _empty_bucket():
+    return {'worked': ZERO, 'break': ZERO, 'net': ZERO, 'overtime': ZERO, 'tasks': {}}
+
+
+class SummaryRollups(DailyTotals):
+    """DailyTotals plus per-task hours and ISO-week/month buckets.
+
+    A session change touches one day; only the week and month containing
+    that day are recomputed, from at most 31 day entries.
+    """
+
+    def __init__(self, work_hours_per_day=8):
+        super().__init__(work_hours_per_day)
+        self.work_hours_per_day = work_hours_per_day
+        self.weeks = {}
+        self.months = {}
+
+    def _new_day(self):
+        return {'work': ZERO, 'break': ZERO, 'net': ZERO, 'tasks': {}}
+
+    def rebuild(self, work_sessions, break_sessions):
+        """Recompute every day, then every bucket once"""
+        super().rebuild(work_sessions, break_sessions)
+        self.refresh_all_buckets()
+
+    def _adjust(self, kind, session, sign):
+        super()._adjust(kind, session, sign)
+        duration = session_duration(session)
+        if duration is None:
+            return
+
+        day = session['start'].date()
+        if kind == 'work' and day in self.days:
+            tasks = self.days[day]['tasks']
+            task = session.get('task', 'General Work')
+            tasks[task] = tasks.get(task, ZERO) + duration * sign
+            if tasks[task] == ZERO:
+                del tasks[task]
+        if not self._bulk:
+            self._refresh_buckets(self.net_days(kind, day))
+
+    def _refresh_buckets(self, days):
+        """Recompute the week and month buckets that contain any of `days`"""
+        for period, buckets in (('weekly', self.weeks), ('monthly', self.months)):
+            for key, day in {period_key(day, period): day for day in days}.items():
+                self._refresh_bucket(period, buckets, key, day)
+
+    def _refresh_bucket(self, period, buckets, key, day):
+        """Recompute one week or month bucket from its days"""
+        first, last = period_bounds(day, period)
+        bucket = _empty_bucket()
+        current = first
+        while current <= last:
+            if current in self.days:
+                self._add_day(bucket, current)
+            current += ONE_DAY
+
+        if bucket['worked'] == ZERO and bucket['break'] == ZERO:
+            buckets.pop(key, None)
+        else:
+            buckets[key] = bucket
+
+    def merge(self, other):
+        super().merge(other)
+        self.refresh_all_buckets()
+
+    def refresh_all_buckets(self):
+        self.weeks, self.months = {}, {}
+        for day in sorted(self.days):
+            for period, buckets in (('weekly', self.weeks), ('monthly', self.months)):
+                self._add_day(buckets.setdefault(period_key(day, period), _empty_bucket()), day)
+
+    def _add_day(self, bucket, day):
+        totals = self.day(day)
+        for field in ('worked', 'break', 'net', 'overtime'):
+            bucket[field] += totals[field]
+        for task, duration in self.days[day]['tasks'].items():
+            bucket['tasks'][task] = bucket['tasks'].get(task, ZERO) + duration
+
+    def to_json(self):
+        """Serializable day table plus weekly/monthly views (durations in seconds)"""
+        def seconds(td):
+            return int(td.total_seconds())
+
+        def bucket_json(bucket):
+            return {
+                'worked': seconds(bucket['worked']),
+                'break': seconds(bucket['break']),
+                'net': seconds(bucket['net']),
+                'overtime': seconds(bucket['overtime']),
+                'tasks': {task: seconds(td) for task, td in bucket['tasks'].items()}
+            }
+
+        return {
+            'daily': {day.isoformat(): {'work': seconds(t['work']), 'break': seconds(t['break']),
+                                        'net': seconds(t['net']),
+                                        'tasks': {k: seconds(v) for k, v in t['tasks'].items()}}
+                      for day, t in self.days.items()},
+            'weekly': {key: bucket_json(b) for key, b in self.weeks.items()},
+            'monthly': {key: bucket_json(b) for key, b in self.months.items()}
+        }
+
+    @classmethod
+    def from_days(cls, daily, work_hours_per_day):
+        """Rebuild from a saved day table; days stay cold until warm() sees their sessions"""
+        rollups = cls(work_hours_per_day)
+        for key, totals in daily.items():
+            day = date.fromisoformat(key)
+            rollups.days[day] = {
+                'work': timedelta(seconds=totals['work']),
+                'break': timedelta(seconds=totals['break']),
+                'net': timedelta(seconds=totals.get('net', totals['work'] - totals['break'])),
+                'tasks': {task: timedelta(seconds=secs) for task, secs in totals['tasks'].items()}
+            }
+            rollups.total_worked += rollups.days[day]['work']
+            rollups.total_break += rollups.days[day]['break']
+            rollups.total_net += rollups.days[day]['net']
+            rollups.overtime += rollups.day_overtime(day)
+        rollups.cold_days = set(rollups.days)
+        rollups.refresh_all_buckets()
+        return rollups
+
+
+SUMMARY_FILES = {
+    'daily': "daily_summary.json",
+    'weekly': "weekly_summary.json",
+    'monthly': "monthly_summary.json"
+}
+
+
+def read_rollups(user_dir, fingerprint, work_hours_per_day):
+    """Load saved rollups, or None if missing or written for different records/settings"""
+    path = os.path.join(user_dir, SUMMARY_FILES['daily'])
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            saved = json.load(f)
+    except ValueError:
+        return None
+    if saved.get('source') != fingerprint or saved.get('work_hours_per_day') != work_hours_per_day:
+        return None
+    return SummaryRollups.from_days(saved['buckets'], work_hours_per_day)
+
+
+def write_rollups(user_dir, data, fingerprint, work_hours_per_day):
+    """Write the daily/weekly/monthly summary files, tagged with the records fingerprint"""
+    for period, filename in SUMMARY_FILES.items():
+        # Derived data, so no fsync: a lost write only means a rebuild on next login
+        atomic_write(os.path.join(user_dir, filename),
+                     json.dumps({'source': fingerprint, 'work_hours_per_day': work_hours_per_day,
+                                 'buckets': data[period]}), fsync=False)
@@ -0,0 +1,362 @@
+"""Remote sync for the Advanced Time Record System.
+
+Every batch of session changes a store writes is queued in a persistent
+outbox (a small SQLite database) by the same call that wrote it, through the
+store's ``on_write`` hook, so punches, imports, batch ingests and restores
+all reach the server. A background thread posts the queue to ``sync_url`` in
+batches::
+
+    POST <sync_url>
+    Content-Encoding: gzip
+    {"client": "<outbox id>", "first": 41, "last": 57,
+     "events": [{"user": "rome", "op": "add", "kind": "work", "rec": {...}}, ...]}
+
+Rows leave the outbox only after the server answers 2xx, so an offline kiosk
+keeps queueing punches and sends them, a batch at a time over one kept-alive
+connection, once the server is reachable again. Failed posts are retried with
+exponential backoff (honouring Retry-After); ``client``, ``first`` and
+``last`` identify a batch, so a server can ignore one it already stored when
+a reply was lost.
+
+401, 403 and 404 mean the token or ``sync_url`` is wrong, not the events, so
+sending stops and everything stays queued, retried with the same backoff
+until the settings are fixed. Any other 4xx (including 413, too large) is
+answered by splitting the batch in half and sending each half, down to
+single events; only an event the server refuses on its own is moved to the
+``rejected`` table, so one bad event never costs its neighbours.
+
+Queueing never fails a write: the store has already committed it. If the
+outbox cannot take a batch (locked by another process for too long, disk
+full), the user is marked for a full resync instead, and their next write
+(or the next attach of their store) queues a ``resync`` event followed by
+every record they have, which the server should take as replacing that
+user's records. The mark is kept in memory only.
+
+``python dtr_sync.py serve`` runs a stand-in server that stores what it
+receives as NDJSON and can fail on purpose, for trying this out locally.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dtr_storage import SESSION_KINDS, change_events
+
+RETRYABLE_STATUS = (408, 429)
+HALTING_STATUS = (401, 403, 404)  # Wrong token or sync_url: keep everything queued until it is fixed
+
+
+class Outbox:
+    """Persistent FIFO of (user, event) waiting to be sent"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outbox (seq INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT, event TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS rejected (seq INTEGER PRIMARY KEY, user TEXT, event TEXT NOT NULL, error TEXT);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, path, timeout=10):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('client', ?)", (uuid.uuid4().hex,))
+        self.client_id = self.conn.execute("SELECT value FROM meta WHERE key = 'client'").fetchone()[0]
+
+    def add(self, items):
+        """Queue [(user, event)] in one transaction"""
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT INTO outbox (user, event) VALUES (?, ?)",
+                                  [(user, json.dumps(event, separators=(',', ':'))) for user, event in items])
+
+    def peek(self, limit):
+        """The oldest `limit` rows as (seq, user, event JSON)"""
+        with self.lock:
+            return self.conn.execute("SELECT seq, user, event FROM outbox ORDER BY seq LIMIT ?", (limit,)).fetchall()
+
+    def remove_through(self, seq):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM outbox WHERE seq <= ?", (seq,))
+
+    def reject(self, seq, error):
+        """Set aside one row the server refused"""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO rejected SELECT seq, user, event, ? FROM outbox WHERE seq = ?", (error, seq))
+            self.conn.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+
+    def rejected(self):
+        """Refused rows as (seq, user, event JSON, error)"""
+        with self.lock:
+            return self.conn.execute("SELECT seq, user, event, error FROM rejected ORDER BY seq").fetchall()
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class SyncError(Exception):
+    """A batch was not accepted; `retry` says whether sending it again may help"""
+
+    def __init__(self, message, retry=True, retry_after=None, status=None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+        self.status = status
+
+
+class SyncClient:
+    """Sends the outbox to a server in batches from a background thread"""
+
+    def __init__(self, url, outbox, token=None, batch_size=500, timeout=10, min_delay=1, max_delay=300):
+        self.url = url
+        self.outbox = outbox
+        self.token = token
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.session = None
+        self.failures = 0
+        self.last_error = None
+        self.resync = set()  # Users with writes the outbox failed to take
+        self.wake = threading.Event()
+        self.stopped = False
+        self.thread = None
+
+    def _session(self):
+        if self.session is None:
+            import requests  # Optional; only needed once sync is configured
+            from requests.adapters import HTTPAdapter
+            self.session = requests.Session()
+            # One kept-alive connection is enough for a single sender; retries are ours
+            self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0))
+            self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0))
+            self.session.headers.update({'Content-Type': "application/json", 'Content-Encoding': "gzip"})
+            if self.token:
+                self.session.headers['Authorization'] = f"Bearer {self.token}"
+        return self.session
+
+    def enqueue(self, items):
+        """Queue [(user, event)] and wake the sender"""
+        self.outbox.add(items)
+        self.wake.set()
+
+    def attach(self, store, user):
+        """Queue every batch of events the store writes, as the user's, from inside that write"""
+        store.on_write = lambda events: self.queue_writes(store, user, events)
+        if user in self.resync:
+            self.queue_writes(store, user, [])
+
+    def queue_writes(self, store, user, events):
+        """Queue events the store has written; if the outbox fails, mark the user for a full resync"""
+        try:
+            if user in self.resync:
+                # Everything the user has, after a marker telling the server to replace what it holds
+                nothing = {kind: {} for kind in SESSION_KINDS}
+                nothing['notes'] = None
+                events = [{'op': 'resync'}] + change_events(nothing, store.load())
+            if events:
+                self.enqueue([(user, event) for event in events])
+        except (sqlite3.Error, OSError) as e:
+            self.resync.add(user)
+            self.last_error = f"Could not queue {user}'s changes for sync: {e}"
+            print(f"[DTR] {self.last_error}; they will be resent in full")
+        else:
+            self.resync.discard(user)
+
+    def send_batch(self, rows):
+        """POST one batch of outbox rows; raises SyncError unless the server accepted it"""
+        import requests
+        # Events are stored serialized; splice the user in rather than re-parsing each one
+        body = ('{"client":%s,"first":%d,"last":%d,"events":[%s]}' % (
+            json.dumps(self.outbox.client_id), rows[0][0], rows[-1][0],
+            ",".join('{"user":%s,%s' % (json.dumps(user), event[1:]) for _, user, event in rows)))
+        try:
+            response = self._session().post(self.url, data=gzip.compress(body.encode(), 6), timeout=self.timeout)
+        except requests.RequestException as e:
+            raise SyncError(f"Could not reach {self.url}: {e}")
+        status = response.status_code
+        if status < 300:
+            return
+        retry = status >= 500 or status in RETRYABLE_STATUS or status in HALTING_STATUS
+        retry_after = response.headers.get('Retry-After')
+        raise SyncError(f"{self.url} answered {status}", retry,
+                        float(retry_after) if retry_after and retry_after.isdigit() else None, status)
+
+    def drain(self):
+        """Send batches until the outbox is empty; returns how many events were accepted"""
+        sent = 0
+        while not self.stopped:
+            rows = self.outbox.peek(self.batch_size)
+            if not rows:
+                break
+            sent += self._deliver(rows)
+        return sent
+
+    def _deliver(self, rows):
+        """Send rows, halving a refused batch until only the events the server refuses are left to set aside"""
+        try:
+            self.send_batch(rows)
+        except SyncError as e:
+            if e.retry:
+                raise
+            if len(rows) > 1:
+                half = len(rows) // 2
+                return self._deliver(rows[:half]) + self._deliver(rows[half:])
+            self.outbox.reject(rows[0][0], str(e))
+            self.last_error = str(e)
+            return 0
+        self.outbox.remove_through(rows[-1][0])
+        return len(rows)
+
+    def next_delay(self, error):
+        """Backoff before the next attempt: doubling from min_delay, with jitter, capped at max_delay"""
+        delay = min(self.max_delay, self.min_delay * 2 ** (self.failures - 1))
+        delay *= random.uniform(0.5, 1)
+        return max(delay, error.retry_after or 0)
+
+    def run(self, idle_interval=60):
+        """Sender loop: drain when woken or every idle_interval seconds, backing off after failures"""
+        retry_at = None
+        while not self.stopped:
+            self.wake.wait(idle_interval if retry_at is None else max(retry_at - time.monotonic(), 0))
+            if self.stopped:
+                break
+            self.wake.clear()
+            if retry_at is not None and time.monotonic() < retry_at:
+                continue  # Changes queued during a backoff wait in the outbox
+            try:
+                self.drain()
+            except SyncError as e:
+                self.failures += 1
+                self.last_error = str(e)
+                retry_at = time.monotonic() + self.next_delay(e)
+                continue
+            self.failures, retry_at = 0, None
+
+    def start(self):
+        """Run the sender on a daemon thread; queued events from earlier runs go out first"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="dtr-sync", daemon=True)
+            self.thread.start()
+            self.wake.set()
+
+    def stop(self, timeout=None):
+        """Stop the sender and close the connection and the outbox"""
+        self.stopped = True
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        if self.session is not None:
+            self.session.close()
+        self.outbox.close()
+
+
+def sync_client(config):
+    """A SyncClient for the installation's sync settings, or None when sync is off"""
+    if not config.get('sync_url'):
+        return None
+    return SyncClient(config['sync_url'], Outbox(config['sync_outbox']), config.get('sync_token'),
+                      config['sync_batch_size'])
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Accepts batches like a sync server would, storing events as NDJSON
+
+    Besides failing on purpose, it answers 401 without the server's token,
+    413 to batches of more than max_events and 422 to a batch holding an
+    event with no 'op'.
+    """
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, as a real server would
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if random.random() < self.server.fail_rate:
+            self.reply(503, {'error': "failing on purpose"}, {'Retry-After': "1"})
+            return
+        if self.server.token and self.headers.get('Authorization') != f"Bearer {self.server.token}":
+            self.reply(401, {'error': "bad token"})
+            return
+        if self.headers.get('Content-Encoding') == "gzip":
+            body = gzip.decompress(body)
+        batch = json.loads(body)
+        if self.server.max_events and len(batch['events']) > self.server.max_events:
+            self.reply(413, {'error': f"at most {self.server.max_events} events per batch"})
+            return
+        if not all(event.get('op') for event in batch['events']):
+            self.reply(422, {'error': "event without an op"})
+            return
+        key = (batch['client'], batch['first'], batch['last'])
+        with self.server.lock:
+            if key not in self.server.seen:
+                self.server.seen.add(key)
+                with open(self.server.output, "a") as f:
+                    f.write("".join(json.dumps(event) + "\n" for event in batch['events']))
+        self.reply(200, {'accepted': len(batch['events'])})
+
+    def reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', "application/json")
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def stand_in_server(port, output, fail_rate=0.0, token=None, max_events=None):
+    """A ThreadingHTTPServer for StandInHandler; call serve_forever() on it"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    server.output, server.fail_rate = output, fail_rate
+    server.token, server.max_events = token, max_events
+    server.seen, server.lock = set(), threading.Lock()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync outbox tools")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    serve = commands.add_parser("serve", help="run a local stand-in sync server")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--output", default="received.ndjson", help="file to append received events to")
+    serve.add_argument("--fail-rate", type=float, default=0.0, help="fraction of posts to answer with 503")
+    serve.add_argument("--token", help="answer 401 unless this Bearer token is sent")
+    serve.add_argument("--max-events", type=int, help="answer 413 to larger batches")
+    drain = commands.add_parser("drain", help="send everything queued in an outbox now")
+    drain.add_argument("--url", required=True)
+    drain.add_argument("--outbox", default=os.path.join("users", "outbox.db"))
+    drain.add_argument("--token")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        print(f"Stand-in sync server on http://127.0.0.1:{args.port}/, writing {args.output}")
+        stand_in_server(args.port, args.output, args.fail_rate, args.token, args.max_events).serve_forever()
+    else:
+        outbox = Outbox(args.outbox)
+        client = SyncClient(args.url, outbox, args.token)
+        started = time.perf_counter()
+        sent = client.drain()
+        print(f"Sent {sent} events in {time.perf_counter() - started:.2f} s; {outbox.count()} still queued")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Team and department rollups across every user of an installation.
+
+Teams are listed in ``dtr_config.json``; users not in any team are reported
+under "Unassigned"::
+
+    {"teams": {"Support": ["rome", "ana"], "Engineering": ["li"]}}
+
+Each user's weekly and monthly buckets are computed on a thread or process
+pool and cached in ``<users_dir>/team_rollups.json`` under the user's store
+fingerprint (file sizes and mtimes, or the SQLite revision), so a rerun only
+re-reads users whose records changed.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from dtr_storage import atomic_write, list_users, open_store
+from dtr_summary import SummaryRollups, read_rollups
+
+UNASSIGNED = "Unassigned"
+CACHE_FILE = "team_rollups.json"
+PERIODS = ('weekly', 'monthly')
+FIELDS = ('worked', 'break', 'net', 'overtime')
+
+
+def team_members(config):
+    """{username: team} from the installation's team list"""
+    return {user: team for team, users in config.get('teams', {}).items() for user in users}
+
+
+def scan_user(config, username, work_hours_per_day):
+    """Weekly and monthly buckets (in seconds) for one user, tagged with the fingerprint read
+
+    Module-level so it can run in a worker process.
+    """
+    store = open_store(username, config)
+    try:
+        # Taken before reading: a change made mid-scan shows up as stale next time
+        fingerprint = store.fingerprint()
+        rollups = read_rollups(os.path.join(config['users_dir'], username), fingerprint, work_hours_per_day)
+        if rollups is None:
+            state = store.load_sessions()
+            rollups = SummaryRollups(work_hours_per_day)
+            rollups.rebuild(state['work'], state['break'])
+    finally:
+        store.close()
+    data = rollups.to_json()
+    return username, {'source': fingerprint, 'weekly': data['weekly'], 'monthly': data['monthly']}
+
+
+def _user_fingerprint(config, username):
+    store = open_store(username, config)
+    try:
+        return store.fingerprint()
+    finally:
+        store.close()
+
+
+class TeamRollups:
+    """Per-user and per-team weekly/monthly totals, cached per user by store fingerprint"""
+
+    def __init__(self, config, work_hours_per_day=8, workers=None, processes=False):
+        self.config = config
+        self.work_hours_per_day = work_hours_per_day
+        self.workers = workers
+        self.processes = processes
+        self.cache_path = os.path.join(config['users_dir'], CACHE_FILE)
+        self.cache = self._read_cache()
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if saved.get('work_hours_per_day') != self.work_hours_per_day:
+            return {}
+        return saved.get('users', {})
+
+    def _write_cache(self):
+        atomic_write(self.cache_path, json.dumps({'work_hours_per_day': self.work_hours_per_day,
+                                                  'users': self.cache}), fsync=False)
+
+    def refresh(self):
+        """Re-read every user whose records changed since the last run; returns how many were read"""
+        users = list_users(self.config)
+        stale = [user for user in users
+                 if user not in self.cache or self.cache[user]['source'] != _user_fingerprint(self.config, user)]
+        for user in set(self.cache) - set(users):
+            del self.cache[user]
+
+        if stale:
+            pool = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+            with pool(max_workers=self.workers) as executor:
+                for user, entry in executor.map(scan_user, [self.config] * len(stale), stale,
+                                                [self.work_hours_per_day] * len(stale)):
+                    self.cache[user] = entry
+        if stale or len(self.cache) != len(users):
+            self._write_cache()
+        return len(stale)
+
+    def user_buckets(self, period):
+        """{username: {period key: bucket}} with durations in seconds"""
+        return {user: entry[period] for user, entry in sorted(self.cache.items())}
+
+    def team_buckets(self, period):
+        """{team: {period key: bucket}} summed over the team's members"""
+        members = team_members(self.config)
+        teams = {}
+        for user, buckets in self.user_buckets(period).items():
+            team = teams.setdefault(members.get(user, UNASSIGNED), {})
+            for key, bucket in buckets.items():
+                total = team.setdefault(key, {field: 0 for field in FIELDS})
+                for field in FIELDS:
+                    total[field] += bucket[field]
+        return teams
+
+    def rows(self, period, keys=None):
+        """Report rows: each team total followed by its members, optionally only some period keys"""
+        def hours(seconds):
+            return round(seconds / 3600, 2)
+
+        def row(team, user, key, bucket):
+            return {'team': team, 'user': user, 'period': key,
+                    'worked_hours': hours(bucket['worked']), 'break_hours': hours(bucket['break']),
+                    'net_hours': hours(bucket['net']), 'overtime_hours': hours(bucket['overtime'])}
+
+        members = team_members(self.config)
+        users = self.user_buckets(period)
+        rows = []
+        for team, buckets in sorted(self.team_buckets(period).items()):
+            team_users = [user for user in users if members.get(user, UNASSIGNED) == team]
+            for key in sorted(buckets):
+                if keys is not None and key not in keys:
+                    continue
+                rows.append(row(team, "*", key, buckets[key]))
+                rows.extend(row(team, user, key, users[user][key]) for user in team_users if key in users[user])
+        return rows
@@ -0,0 +1,97 @@
+"""Account storage for the Advanced Time Record System.
+
+Accounts live in a small SQLite database (``users.db`` by default) keyed by
+username, so a login reads one row instead of unpickling every account, and
+concurrent registrations from several kiosks are serialized by SQLite's file
+lock instead of overwriting each other. The old pickled ``users.dat`` is
+imported once and renamed to ``users.dat.migrated``.
+"""
+import os
+import pickle
+import sqlite3
+
+ACCOUNT_FIELDS = ('password', 'created', 'admin')
+
+
+class UserStore:
+    """Username-indexed accounts with atomic, locked writes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS accounts (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            created TEXT,
+            admin INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    def __init__(self, db_path, legacy_path=None, timeout=10):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        # Writers wait up to `timeout` seconds for another kiosk's lock
+        self.conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        if legacy_path and os.path.exists(legacy_path):
+            self.migrate_from_pickle(legacy_path)
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+
+    def migrate_from_pickle(self, legacy_path):
+        """Import a pickled {username: account} file once, then rename it; returns accounts added"""
+        try:
+            with open(legacy_path, "rb") as f:
+                users = pickle.load(f) or {}
+        except FileNotFoundError:
+            return 0  # Another kiosk migrated it first
+        with self.conn:
+            # Existing rows win, so a second kiosk migrating at the same time is harmless
+            cursor = self.conn.executemany(
+                "INSERT OR IGNORE INTO accounts (username, password, created, admin) VALUES (?, ?, ?, ?)",
+                [(name, account['password'], account.get('created'), int(bool(account.get('admin'))))
+                 for name, account in users.items()])
+        try:
+            os.replace(legacy_path, legacy_path + ".migrated")
+        except FileNotFoundError:
+            pass  # Another kiosk migrated it first
+        return cursor.rowcount
+
+    def get(self, username):
+        """One account as {'password', 'created', 'admin'}, or None"""
+        row = self.conn.execute("SELECT password, created, admin FROM accounts WHERE username = ?",
+                                (username,)).fetchone()
+        if row is None:
+            return None
+        return {'password': row[0], 'created': row[1], 'admin': bool(row[2])}
+
+    def add(self, username, account):
+        """Create an account; False if the username is already taken"""
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO accounts (username, password, created, admin) VALUES (?, ?, ?, ?)",
+                    (username, account['password'], account.get('created'), int(bool(account.get('admin')))))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def update(self, username, **fields):
+        """Change some fields of an existing account"""
+        unknown = set(fields) - set(ACCOUNT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown account fields: {', '.join(sorted(unknown))}")
+        if 'admin' in fields:
+            fields['admin'] = int(bool(fields['admin']))
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        with self.conn:
+            self.conn.execute(f"UPDATE accounts SET {assignments} WHERE username = ?",
+                              list(fields.values()) + [username])
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+    def usernames(self):
+        return [row[0] for row in self.conn.execute("SELECT username FROM accounts ORDER BY username")]
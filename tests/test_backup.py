@@ -0,0 +1,82 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from dtr_backup import BackupRepository, restore_user, user_backup
+from dtr_storage import DEFAULT_CONFIG, open_store
+
+
+def config_for(tmp_path, backend):
+    return dict(DEFAULT_CONFIG, storage_backend=backend, users_dir=str(tmp_path / "users"),
+                sqlite_path=str(tmp_path / "users" / "records.db"))
+
+
+def punch(config, user, day, hours):
+    store = open_store(user, config)
+    store.load()
+    session = {'id': store.next_id('work'), 'start': datetime(2025, 3, day, 8),
+               'end': datetime(2025, 3, day, 8 + hours), 'task': "Coding"}
+    store.append('add', 'work', session)
+    store.close()
+
+
+def work_ends(config, user):
+    store = open_store(user, config)
+    try:
+        return sorted(record['end'] for record in store.load()['work'].values())
+    finally:
+        store.close()
+
+
+def test_journal_user_restores_as_backed_up(tmp_path):
+    config = config_for(tmp_path, 'journal')
+    repository = BackupRepository(str(tmp_path / "backups"), chunk_size=64)
+    punch(config, "rome", 3, 8)
+    snapshot_id, stats = repository.backup(*user_backup(config, "rome"))
+    assert stats['files'] and stats['new_chunks']
+
+    punch(config, "rome", 4, 4)
+    stray = os.path.join(config['users_dir'], "rome", "stray.txt")
+    with open(stray, "w") as f:
+        f.write("created after the backup")
+    again, _ = repository.backup(*user_backup(config, "rome"))
+
+    restore_user(repository, config, "rome", snapshot_id)
+    assert work_ends(config, "rome") == ["2025-03-03T16:00:00"]
+    assert not os.path.exists(stray)
+    restore_user(repository, config, "rome", again)
+    assert len(work_ends(config, "rome")) == 2
+
+
+def test_sqlite_restore_replaces_only_that_users_rows(tmp_path):
+    config = config_for(tmp_path, 'sqlite')
+    repository = BackupRepository(str(tmp_path / "backups"))
+    punch(config, "rome", 3, 8)
+    punch(config, "ana", 3, 6)
+    name, base_dir, paths = user_backup(config, "rome")
+    assert paths == ["rome", "records.db"]
+    snapshot_id, _ = repository.backup(name, base_dir, paths)
+
+    punch(config, "rome", 4, 4)
+    punch(config, "ana", 4, 2)
+    restore_user(repository, config, "rome", snapshot_id)
+    assert work_ends(config, "rome") == ["2025-03-03T16:00:00"]
+    assert work_ends(config, "ana") == ["2025-03-03T14:00:00", "2025-03-04T10:00:00"]
+
+
+def test_prune_keeps_the_newest_and_refuses_to_keep_none(tmp_path):
+    config = config_for(tmp_path, 'journal')
+    repository = BackupRepository(str(tmp_path / "backups"))
+    snapshots = []
+    for day in (3, 4, 5):
+        punch(config, "rome", day, 8)
+        snapshots.append(repository.backup(*user_backup(config, "rome"))[0])
+
+    with pytest.raises(ValueError):
+        repository.prune("user-rome", 0)
+    assert repository.snapshots("user-rome") == snapshots
+    repository.prune("user-rome", 1)
+    assert repository.snapshots("user-rome") == snapshots[-1:]
+    restore_user(repository, config, "rome", snapshots[-1])
+    assert len(work_ends(config, "rome")) == 3
@@ -0,0 +1,55 @@
+import os
+from datetime import date, datetime
+
+import dtr_binary
+from dtr_storage import JournalStore
+
+
+def test_encode_decode_round_trip():
+    sessions = {
+        'work': [(0, "General Work", datetime(2025, 3, 3, 8, 0, 0, 123456), datetime(2025, 3, 3, 16)),
+                 (1, "Meeting", datetime(2025, 3, 4, 9), None)],
+        'break': [(0, "Lunch", datetime(2025, 3, 3, 12), datetime(2025, 3, 3, 12, 30))]
+    }
+    decoded, notes = dtr_binary.decode(dtr_binary.encode(sessions, "notes ✓"))
+    assert decoded == sessions
+    assert notes == "notes ✓"
+
+
+def test_json_and_binary_snapshots_load_the_same(tmp_path):
+    store = JournalStore(str(tmp_path))
+    work = [{'id': store.next_id('work'), 'start': datetime(2025, 3, day, 8), 'end': datetime(2025, 3, day, 16),
+             'task': "Coding" if day % 2 else "Review"} for day in range(1, 6)]
+    work.append({'id': store.next_id('work'), 'start': datetime(2025, 3, 6, 8), 'end': None, 'task': "Coding"})
+    breaks = [{'id': store.next_id('break'), 'start': datetime(2025, 3, 3, 23, 30),
+               'end': datetime(2025, 3, 4, 0, 30), 'type': "Night"}]
+    for session in work:
+        store.append('add', 'work', session)
+    store.append('add', 'break', breaks[0])
+    store.append('notes', text="hello")
+    from_journal = JournalStore(str(tmp_path)).load_sessions()
+
+    # Convert to binary and back, the way `dtr_cli convert` does
+    for snapshot_format in ('binary', 'json'):
+        store = JournalStore(str(tmp_path), snapshot_format=snapshot_format)
+        state = store.load_sessions()
+        store.compact(state['work'], state['break'], state['notes'])
+        store.close()
+        assert os.path.exists(store.snapshot_path)
+        other = 'json' if snapshot_format == 'binary' else 'binary'
+        assert not os.path.exists(store.snapshot_paths[other])
+        assert JournalStore(str(tmp_path), snapshot_format=snapshot_format).load_sessions() == from_journal
+
+
+def test_binary_snapshot_honours_the_window(tmp_path):
+    store = JournalStore(str(tmp_path), snapshot_format='binary')
+    old = {'id': 0, 'start': datetime(2025, 1, 6, 8), 'end': datetime(2025, 1, 6, 16), 'task': "Coding"}
+    recent = {'id': 1, 'start': datetime(2025, 3, 3, 8), 'end': datetime(2025, 3, 3, 16), 'task': "Coding"}
+    store.compact([old, recent], [], "")
+    later = {'id': 2, 'start': datetime(2025, 3, 4, 8), 'end': None, 'task': "Coding"}
+    store.append('add', 'work', later)
+
+    loaded = JournalStore(str(tmp_path), snapshot_format='binary')
+    assert [s['id'] for s in loaded.load_sessions(date(2025, 3, 1))['work']] == [1, 2]
+    assert sorted(loaded.load(date(2025, 3, 1))['work']) == [1, 2]
+    assert loaded.next_id('work') == 3
@@ -0,0 +1,85 @@
+import csv
+import json
+
+from dtr_cli import main
+from dtr_storage import JournalStore
+from dtr_sync import Outbox
+
+PUNCHES = """user,event,timestamp,label
+rome,clock_in,2025-03-03T08:00:00,Project A
+rome,start_break,2025-03-03T12:00:00,Lunch
+rome,end_break,2025-03-03T12:30:00,
+rome,clock_out,2025-03-03T16:00:00,
+rome,clock_in,2025-03-04T08:00:00,
+rome,clock_out,2025-03-04T09:00:00,
+"""
+
+
+def test_ingest_is_idempotent_and_reports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dtr_config.json").write_text(json.dumps({'durability': 'close'}))
+    (tmp_path / "punches.csv").write_text(PUNCHES)
+
+    main(["ingest", "punches.csv"])
+    main(["ingest", "punches.csv"])
+    state = JournalStore(str(tmp_path / "users" / "rome")).load()
+    assert [(r['start'], r['end']) for r in state['work'].values()] == [
+        ("2025-03-03T08:00:00", "2025-03-03T16:00:00"), ("2025-03-04T08:00:00", "2025-03-04T09:00:00")]
+    assert len(state['break']) == 1
+
+    main(["report", "--period", "daily", "--output", "daily.json"])
+    rows = json.loads((tmp_path / "daily.json").read_text())
+    assert [(row['period'], row['worked_hours'], row['net_hours']) for row in rows] == [
+        ("2025-03-03", 8.0, 7.5), ("2025-03-04", 1.0, 1.0)]
+
+
+def test_ingest_and_restore_are_queued_for_sync(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dtr_config.json").write_text(json.dumps({'sync_url': "http://127.0.0.1:9/"}))
+    first_day, second_day = PUNCHES.splitlines()[:5], PUNCHES.splitlines()[:1] + PUNCHES.splitlines()[5:]
+    (tmp_path / "first.csv").write_text("\n".join(first_day) + "\n")
+    (tmp_path / "second.csv").write_text("\n".join(second_day) + "\n")
+
+    main(["ingest", "first.csv"])
+    main(["backup"])
+    main(["ingest", "second.csv"])
+    outbox = Outbox("users/outbox.db")
+    ops = [json.loads(event)['op'] for _, _, event in outbox.peek(100)]
+    assert ops == ['add', 'add', 'update', 'update', 'add', 'update']
+
+    # Back to before the second day: its session has to go from the server too
+    main(["restore", "user-rome"])
+    events = [json.loads(event) for _, _, event in outbox.peek(100)][len(ops):]
+    assert [(event['op'], event['kind'], event['id']) for event in events] == [('delete', 'work', 1)]
+    outbox.close()
+
+
+def test_export_import_round_trip_is_idempotent(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dtr_config.json").write_text("{}")
+    label = 'Project "A", phase 2'
+    (tmp_path / "punches.csv").write_text(PUNCHES.replace("Project A", '"Project ""A"", phase 2"')
+                                          .replace("Lunch", '"Lunch, late"'))
+    main(["ingest", "punches.csv"])
+    main(["export", "--user", "rome", "--output", "rome.ndjson"])
+    exported = [json.loads(line) for line in (tmp_path / "rome.ndjson").read_text().splitlines()]
+    assert [record.get('task', record.get('type')) for record in exported] == [label, "General Work", "Lunch, late"]
+
+    capsys.readouterr()
+    main(["import", "--user", "ana", "rome.ndjson"])
+    main(["import", "--user", "ana", "rome.ndjson"])
+    first, second = capsys.readouterr().out.splitlines()
+    assert "3 added, 0 closed, 0 already present" in first
+    assert "0 added, 0 closed, 3 already present" in second
+
+    main(["export", "--user", "ana", "--output", "ana.ndjson"])
+    assert (tmp_path / "ana.ndjson").read_text() == (tmp_path / "rome.ndjson").read_text()
+
+    main(["export", "--user", "ana", "--output", "ana.csv"])
+    with open(tmp_path / "ana.csv", newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0][0] == "Type"
+    assert [(row[0], row[1], row[2], row[3], row[5]) for row in rows[1:]] == [
+        ("Work", "2025-03-03", "08:00:00 AM", "04:00:00 PM", label),
+        ("Work", "2025-03-04", "08:00:00 AM", "09:00:00 AM", "General Work"),
+        ("Break", "2025-03-03", "12:00:00 PM", "12:30:00 PM", "Lunch, late")]
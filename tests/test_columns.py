@@ -0,0 +1,31 @@
+from datetime import date, datetime
+
+from dtr_columns import SessionColumns
+
+
+def session(session_id, start, end, task="General Work"):
+    return {'id': session_id, 'date': start.date(), 'start': start, 'end': end, 'task': task}
+
+
+def test_rows_write_through_to_the_columns():
+    columns = SessionColumns('work')
+    row = columns.add(session(0, datetime(2025, 3, 3, 8), None))
+    row['end'] = datetime(2025, 3, 3, 16)
+    row['task'] = "Meeting"
+    assert columns[0].copy() == session(0, datetime(2025, 3, 3, 8), datetime(2025, 3, 3, 16), "Meeting")
+
+
+def test_prepend_keeps_existing_rows_valid():
+    columns = SessionColumns('work', [session(5, datetime(2025, 3, 3, 8), datetime(2025, 3, 3, 16), "Meeting")])
+    row = columns[0]
+    history = SessionColumns('work', [session(1, datetime(2025, 1, 6, 8), datetime(2025, 1, 6, 12), "Training"),
+                                      session(2, datetime(2025, 1, 7, 8), datetime(2025, 1, 7, 12))])
+    columns.prepend(history)
+
+    assert [r['id'] for r in columns] == [1, 2, 5]
+    assert [r['task'] for r in columns] == ["Training", "General Work", "Meeting"]
+    assert row['start'] == datetime(2025, 3, 3, 8)
+    columns.remove(columns.row(2))
+    assert [r['id'] for r in columns] == [1, 5]
+    assert columns.index(row) == 1
+    assert columns.row(1)['date'] == date(2025, 1, 6)
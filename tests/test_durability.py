@@ -0,0 +1,50 @@
+import os
+from datetime import datetime
+
+import pytest
+
+import dtr_storage
+from dtr_storage import JournalStore, atomic_write
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    real = os.fsync
+
+    def counting(fd):
+        calls.append(fd)
+        real(fd)
+    monkeypatch.setattr(dtr_storage.os, "fsync", counting)
+    return calls
+
+
+def punch(store):
+    session = {'id': store.next_id('work'), 'start': datetime(2025, 3, 3, 8), 'end': None, 'task': "General Work"}
+    store.append('add', 'work', session)
+
+
+def test_always_fsyncs_every_append(tmp_path, fsyncs):
+    store = JournalStore(str(tmp_path), durability='always')
+    punch(store)
+    punch(store)
+    assert len(fsyncs) == 2
+
+
+def test_close_policy_fsyncs_once_on_close(tmp_path, fsyncs):
+    store = JournalStore(str(tmp_path), durability='close')
+    punch(store)
+    punch(store)
+    assert not fsyncs
+    store.close()
+    assert len(fsyncs) == 1
+    store.close()
+    assert len(fsyncs) == 1  # Nothing left to sync
+
+
+def test_atomic_write_leaves_no_temporary_files(tmp_path):
+    path = str(tmp_path / "records.json")
+    atomic_write(path, "old")
+    atomic_write(path, "new")
+    assert open(path).read() == "new"
+    assert os.listdir(str(tmp_path)) == ["records.json"]
@@ -0,0 +1,50 @@
+import os
+from datetime import date, datetime, timedelta
+
+from dtr_columns import SessionColumns
+from dtr_html import SummaryRenderer, day_rows, paginate, summary_path
+
+ZERO = {'worked': timedelta(), 'break': timedelta(), 'net': timedelta(), 'overtime': timedelta()}
+
+
+def test_pages_hold_whole_days_up_to_the_row_limit():
+    days = [(date(2025, 3, day), ["row"] * size, ZERO) for day, size in ((3, 2), (4, 3), (5, 1), (6, 7), (7, 1))]
+    pages = paginate(days, 5)
+    assert [[day.day for day, _, _ in page] for page in pages] == [[3, 4], [5], [6], [7]]
+    assert paginate(days, 100) == [days]
+    assert paginate([], 5) == []
+
+
+def test_only_edited_days_are_rendered_again(tmp_path):
+    work = SessionColumns('work', [
+        {'id': day, 'date': date(2025, 3, day), 'start': datetime(2025, 3, day, 8),
+         'end': datetime(2025, 3, day, 16), 'task': "Coding"} for day in (3, 4)])
+    breaks = SessionColumns('break')
+    renderer = SummaryRenderer()
+
+    def render():
+        rows = day_rows(work, breaks, date(2025, 3, 3), date(2025, 3, 4))
+        days = [(day, rows[day], dict(ZERO, worked=sum((end - start for _, _, start, end, _ in rows[day]),
+                                                       timedelta()))) for day in sorted(rows)]
+        path = renderer.write(str(tmp_path / "summary.html"), "March", days, ZERO)
+        with open(path, encoding="utf-8") as f:
+            return f.read(), {day: renderer.cache[day][1] for day in rows}
+
+    _, before = render()
+    # What the app does before bumping data_version: an edit lands in the columns
+    work.set_field(4, 'end', datetime(2025, 3, 4, 17, 30))
+    html, after = render()
+    assert after[date(2025, 3, 3)] is before[date(2025, 3, 3)]
+    assert after[date(2025, 3, 4)] is not before[date(2025, 3, 4)]
+    assert "05:30:00 PM" in html and "9:30:00" in html
+
+
+def test_each_print_replaces_the_users_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    renderer = SummaryRenderer()
+    for title in ("First", "Second"):
+        assert renderer.write(summary_path("rome"), title, [], ZERO) == summary_path("rome")
+    assert os.listdir(tmp_path) == ["dtr_summary_rome.html"]
+    with open(summary_path("rome"), encoding="utf-8") as f:
+        assert "<title>Second</title>" in f.read()
+    assert summary_path("ana") != summary_path("rome")
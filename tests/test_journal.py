@@ -0,0 +1,121 @@
+import json
+import os
+from datetime import date, datetime
+
+from dtr_storage import JournalStore
+
+
+def work(session_id, start, end=None, task="General Work"):
+    return {'id': session_id, 'start': start, 'end': end, 'task': task}
+
+
+def test_replay_applies_adds_updates_deletes_and_notes(tmp_path):
+    store = JournalStore(str(tmp_path))
+    first = work(store.next_id('work'), datetime(2025, 3, 3, 8))
+    second = work(store.next_id('work'), datetime(2025, 3, 4, 8), datetime(2025, 3, 4, 12))
+    store.append('add', 'work', first)
+    store.append('add', 'work', second)
+    first['end'] = datetime(2025, 3, 3, 17)
+    store.append('update', 'work', first)
+    store.append('delete', 'work', second)
+    store.append('notes', text="hello")
+
+    state = JournalStore(str(tmp_path)).load()
+    assert list(state['work']) == [first['id']]
+    assert state['work'][first['id']]['end'] == "2025-03-03T17:00:00"
+    assert state['notes'] == "hello"
+
+
+def test_reload_does_not_hand_out_reserved_ids(tmp_path):
+    store = JournalStore(str(tmp_path))
+    session = work(store.next_id('work'), datetime(2025, 3, 3, 8))
+    store.append('add', 'work', session)
+    store.append('delete', 'work', session)
+
+    store.load()
+    assert store.next_id('work') == 1
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    store = JournalStore(str(tmp_path), compact_every=3)
+    sessions = []
+    for day in range(1, 4):
+        session = work(store.next_id('work'), datetime(2025, 3, day, 8), datetime(2025, 3, day, 16))
+        sessions.append(session)
+        store.append('add', 'work', session)
+    assert store.needs_compaction()
+
+    store.compact(sessions, [], "notes")
+    assert os.path.getsize(store.journal_path) == 0
+    assert not store.needs_compaction()
+    state = JournalStore(str(tmp_path)).load_sessions()
+    assert [s['start'] for s in state['work']] == [s['start'] for s in sessions]
+    assert state['notes'] == "notes"
+
+
+def test_rewrite_snapshot_uses_what_is_on_disk(tmp_path):
+    store = JournalStore(str(tmp_path))
+    session = work(store.next_id('work'), datetime(2025, 3, 3, 8), datetime(2025, 3, 3, 16))
+    store.append('add', 'work', session)
+    store.append('notes', text="old")
+
+    store.rewrite_snapshot("new")
+    assert os.path.getsize(store.journal_path) == 0
+    state = JournalStore(str(tmp_path)).load()
+    assert state['work'][0]['end'] == "2025-03-03T16:00:00"
+    assert state['notes'] == "new"
+
+
+def test_window_keeps_open_sessions(tmp_path):
+    store = JournalStore(str(tmp_path))
+    old = work(store.next_id('work'), datetime(2025, 1, 6, 8), datetime(2025, 1, 6, 16))
+    still_open = work(store.next_id('work'), datetime(2025, 1, 7, 8))
+    recent = work(store.next_id('work'), datetime(2025, 3, 3, 8), datetime(2025, 3, 3, 16))
+    for session in (old, still_open, recent):
+        store.append('add', 'work', session)
+
+    since = date(2025, 3, 1)
+    assert sorted(JournalStore(str(tmp_path)).load(since)['work']) == [1, 2]
+    sessions = JournalStore(str(tmp_path)).load_sessions(since)['work']
+    assert [s['id'] for s in sessions] == [1, 2]
+    assert sessions[1]['start'] == recent['start']
+
+
+def test_readers_leave_a_torn_tail_for_the_writer(tmp_path):
+    store = JournalStore(str(tmp_path))
+    session = work(store.next_id('work'), datetime(2025, 3, 3, 8))
+    store.append('add', 'work', session)
+    with open(store.journal_path, "a") as f:
+        f.write('{"op":"add","kind":"work","rec":{"id":1,')  # Another kiosk mid-append
+    size = os.path.getsize(store.journal_path)
+
+    state = JournalStore(str(tmp_path)).load()
+    assert list(state['work']) == [0]
+    assert os.path.getsize(store.journal_path) == size
+
+    writer = JournalStore(str(tmp_path))
+    writer.load()
+    session['end'] = datetime(2025, 3, 3, 16)
+    writer.append('update', 'work', session)
+    with open(store.journal_path) as f:
+        lines = [json.loads(line) for line in f]
+    assert [event['op'] for event in lines] == ['add', 'update']
+
+
+def test_query_filters_while_replaying_and_sorts_by_start(tmp_path):
+    store = JournalStore(str(tmp_path))
+    sessions = [work(store.next_id('work'), datetime(2025, 3, day, hour), datetime(2025, 3, day, hour + 1))
+                for day, hour in ((5, 8), (3, 14), (3, 9), (1, 8), (4, 8))]
+    store.compact(sessions[:2], [], "")
+    for session in sessions[2:]:
+        store.append('add', 'work', session)
+    moved = sessions[4]
+    moved['start'], moved['end'] = datetime(2025, 2, 1, 8), datetime(2025, 2, 1, 9)
+    store.append('update', 'work', moved)  # Edited out of the range
+    store.append('add', 'break', {'id': store.next_id('break'), 'start': datetime(2025, 3, 3, 12),
+                                  'end': datetime(2025, 3, 3, 13), 'type': "Lunch"})
+
+    found = list(JournalStore(str(tmp_path)).query_kinds(('work', 'break'), date(2025, 3, 2), date(2025, 3, 5)))
+    assert [(kind, session['start']) for kind, session in found] == [
+        ('work', datetime(2025, 3, 3, 9)), ('work', datetime(2025, 3, 3, 14)), ('work', datetime(2025, 3, 5, 8)),
+        ('break', datetime(2025, 3, 3, 12))]
@@ -0,0 +1,69 @@
+import random
+from array import array
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import dtr_overtime
+from dtr_columns import SessionColumns
+from dtr_overtime import day_table, overtime_periods, pay_period
+from dtr_reports import ReportEngine
+
+START = date(2025, 1, 6)  # A Monday
+
+
+def rules_for(daily_hours=8, weekly_hours=40, pay_period_days=14, break_deduction=True):
+    return {'daily_hours': daily_hours, 'weekly_hours': weekly_hours, 'pay_period_days': pay_period_days,
+            'pay_period_start': START, 'break_deduction': break_deduction}
+
+
+def sessions(seed=5, days=120):
+    """Work and break columns with one to three sessions on most days, some long"""
+    rng = random.Random(seed)
+    work, breaks = [], []
+    for offset in range(days):
+        if rng.random() < 0.2:
+            continue
+        moment = datetime.combine(START + timedelta(days=offset), datetime.min.time()) + timedelta(hours=7)
+        for _ in range(rng.randint(1, 3)):
+            end = moment + timedelta(minutes=rng.randint(60, 360))
+            work.append({'id': len(work), 'date': moment.date(), 'start': moment, 'end': end, 'task': "Coding"})
+            if rng.random() < 0.5:
+                breaks.append({'id': len(breaks), 'date': end.date(), 'start': end,
+                               'end': end + timedelta(minutes=rng.randint(15, 60)), 'type': "Lunch"})
+            moment = end + timedelta(minutes=90)
+    return SessionColumns('work', work), SessionColumns('break', breaks)
+
+
+@pytest.mark.parametrize("rules", [rules_for(), rules_for(7.5, 37.5, 10, False), rules_for(pay_period_days=31)])
+def test_numpy_path_matches_the_loops(rules):
+    pytest.importorskip("numpy")
+    tables = {f"user{seed}": day_table(*sessions(seed)) for seed in range(6)}
+    tables["idle"] = (array('q'), array('q'), array('q'))
+    expected = dtr_overtime._compute_loops(tables, rules)
+    expected["idle"] = {}
+    assert overtime_periods(tables, rules) == expected
+
+
+def test_daily_overtime_matches_the_report_without_break_deduction():
+    work, breaks = sessions()
+    rules = rules_for(daily_hours=7, weekly_hours=7 * 24, break_deduction=False)
+    first, last = START, START + timedelta(days=119)
+    periods = overtime_periods({"rome": day_table(work, breaks, first, last)}, rules)["rome"]
+
+    engine = ReportEngine(rules['daily_hours'])
+    try:
+        report = engine.submit(work, breaks, first, last).result(timeout=60)
+    finally:
+        engine.shutdown()
+
+    def micros(field, low, high):
+        return sum((totals[field] for day, totals in report['days'].items() if low <= day <= high),
+                   timedelta()) // timedelta(microseconds=1)
+
+    assert report['totals']['overtime'] > timedelta(hours=10)
+    assert sum(sums['daily'] for sums in periods.values()) == report['totals']['overtime'] // timedelta(microseconds=1)
+    for period_first, sums in periods.items():
+        period_last = pay_period(period_first, rules)[1]
+        assert sums['daily'] == sums['overtime'] == micros('overtime', period_first, period_last)
+        assert sums['paid'] == micros('worked', period_first, period_last)
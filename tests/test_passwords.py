@@ -0,0 +1,26 @@
+import hashlib
+
+from dtr_passwords import hash_password, needs_rehash, parse_hash, verify_password
+
+FAST = {'algorithm': 'pbkdf2_sha256', 'iterations': 1000}
+
+
+def test_hashes_are_salted_and_verify():
+    first, second = hash_password("secret", FAST), hash_password("secret", FAST)
+    assert first != second
+    assert verify_password("secret", first)
+    assert not verify_password("Secret", first)
+    assert parse_hash(first)[0] == FAST
+
+
+def test_legacy_digests_verify_and_need_rehash():
+    legacy = hashlib.sha256(b"secret").hexdigest()
+    assert verify_password("secret", legacy)
+    assert needs_rehash(legacy, FAST)
+
+
+def test_rehash_when_the_cost_goes_up():
+    stored = hash_password("secret", FAST)
+    assert not needs_rehash(stored, FAST)
+    assert needs_rehash(stored, dict(FAST, iterations=2000))
+    assert needs_rehash(stored, {'algorithm': 'scrypt', 'n': 2 ** 10})
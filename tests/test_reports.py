@@ -0,0 +1,71 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from dtr_binary import to_micros
+from dtr_columns import SessionColumns
+from dtr_reports import ReportEngine, assemble, compute_chunk
+
+
+def history(count=600, seed=3):
+    """Shuffled work and break sessions over a few months, some across midnight and some still open"""
+    rng = random.Random(seed)
+    work, breaks = [], []
+    moment = datetime(2025, 1, 1, 6)
+    for session_id in range(count):
+        start = moment + timedelta(minutes=rng.randint(0, 900))
+        end = None if session_id % 97 == 0 else start + timedelta(minutes=rng.randint(30, 600))
+        work.append({'id': session_id, 'date': start.date(), 'start': start, 'end': end,
+                     'task': rng.choice(["Coding", "Review", "Meetings"])})
+        if session_id % 3 == 0:
+            pause = start + timedelta(minutes=rng.randint(0, 240))
+            breaks.append({'id': len(breaks), 'date': pause.date(), 'start': pause,
+                           'end': pause + timedelta(minutes=rng.randint(10, 120)), 'type': "Lunch"})
+        moment += timedelta(hours=rng.randint(2, 8))
+    # A break from the last evening of February cuts into work just after midnight
+    work.append({'id': count, 'date': date(2025, 3, 1), 'start': datetime(2025, 3, 1, 0),
+                 'end': datetime(2025, 3, 1, 2), 'task': "Coding"})
+    breaks.append({'id': len(breaks), 'date': date(2025, 2, 28), 'start': datetime(2025, 2, 28, 23, 30),
+                   'end': datetime(2025, 3, 1, 1), 'type': "Night"})
+    rng.shuffle(work)
+    rng.shuffle(breaks)
+    return SessionColumns('work', work), SessionColumns('break', breaks)
+
+
+def whole_range(work, breaks, start_date, end_date):
+    """The same report computed in one piece, as the reference"""
+    def records(columns):
+        return [(row['id'], to_micros(row['start']), to_micros(row['end']), row[columns.label_key])
+                for row in columns if row['end'] is not None]
+    return assemble(start_date, end_date, [compute_chunk(records(work), records(breaks), start_date, end_date, 8)])
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_month_chunks_match_one_computation(processes):
+    work, breaks = history()
+    engine = ReportEngine(8, workers=2, processes=processes)
+    try:
+        start_date, end_date = date(2025, 1, 15), date(2025, 5, 10)
+        future = engine.submit(work, breaks, start_date, end_date)
+        # The columns may change as soon as submit returns
+        work.remove(work[0])
+        report = future.result(timeout=60)
+    finally:
+        engine.shutdown()
+    expected = whole_range(*history(), start_date, end_date)
+    assert report['days'] == expected['days']
+    assert report['tasks'] == expected['tasks']
+    assert report['totals'] == expected['totals']
+    assert report['weekly'] == expected['weekly']
+
+
+def test_empty_range_and_errors_resolve_the_future():
+    work, breaks = history(20)
+    engine = ReportEngine()
+    try:
+        assert engine.submit(work, breaks, date(2025, 2, 1), date(2025, 1, 1)).result(timeout=10)['days'] == {}
+        with pytest.raises(TypeError):
+            engine.submit(work, breaks, None, date(2025, 1, 1)).result(timeout=10)
+    finally:
+        engine.shutdown()
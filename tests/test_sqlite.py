@@ -0,0 +1,58 @@
+from datetime import date, datetime
+
+from dtr_storage import JournalStore, SQLiteStore, migrate_json_to_sqlite
+
+
+def fill(user_dir):
+    store = JournalStore(str(user_dir), compact_every=2)
+    sessions = []
+    for day in (3, 4, 5):
+        session = {'id': store.next_id('work'), 'start': datetime(2025, 3, day, 8),
+                   'end': datetime(2025, 3, day, 16), 'task': "Project A" if day == 4 else "General Work"}
+        sessions.append(session)
+        store.append('add', 'work', session)
+    store.compact(sessions[:2], [], "snapshot notes")  # Two in the snapshot, one left in the journal
+    store.append('add', 'work', sessions[2])
+    store.append('add', 'break', {'id': store.next_id('break'), 'start': datetime(2025, 3, 5, 12),
+                                  'end': datetime(2025, 3, 5, 13), 'type': "Lunch"})
+    store.append('notes', text="journal notes")
+    return JournalStore(str(user_dir)).load()
+
+
+def test_migration_copies_snapshot_and_journal(tmp_path):
+    users = tmp_path / "users"
+    expected = fill(users / "rome")
+    config = {'users_dir': str(users), 'sqlite_path': str(tmp_path / "records.db")}
+
+    assert migrate_json_to_sqlite(config) == {'rome': 4}
+    assert migrate_json_to_sqlite(config) == {'rome': 0}  # Runs once per user
+
+    store = SQLiteStore(config['sqlite_path'], "rome")
+    assert store.load() == expected
+    tasks = [s['start'].date() for s in store.query('work', label="Project A")]
+    assert tasks == [date(2025, 3, 4)]
+    assert [s['id'] for s in store.query('work', start_date=date(2025, 3, 4), end_date=date(2025, 3, 4))] == [1]
+    store.close()
+
+
+def test_sqlite_store_round_trips_events(tmp_path):
+    store = SQLiteStore(str(tmp_path / "records.db"), "rome")
+    session = {'id': store.next_id('work'), 'start': datetime(2025, 3, 3, 8), 'end': None, 'task': "Meeting"}
+    store.append('add', 'work', session)
+    before = store.fingerprint()
+    session['end'] = datetime(2025, 3, 3, 9)
+    store.append('update', 'work', session)
+    assert store.fingerprint() != before
+    store.close()
+
+    reopened = SQLiteStore(str(tmp_path / "records.db"), "rome")
+    sessions = reopened.load_sessions()['work']
+    assert sessions == [{'id': 0, 'date': date(2025, 3, 3), 'start': datetime(2025, 3, 3, 8),
+                         'end': datetime(2025, 3, 3, 9), 'task': "Meeting"}]
+    assert reopened.next_id('work') == 1
+    reopened.close()
+
+
+def test_migration_on_a_fresh_install_does_nothing(tmp_path):
+    config = {'users_dir': str(tmp_path / "users"), 'sqlite_path': str(tmp_path / "records.db")}
+    assert migrate_json_to_sqlite(config) == {}
@@ -0,0 +1,117 @@
+import random
+from datetime import date, datetime, timedelta
+
+from dtr_intervals import intersection_length, merge_intervals, total_length
+from dtr_summary import ZERO, SummaryRollups
+
+
+def test_break_crossing_midnight_counts_against_the_next_day():
+    totals = SummaryRollups()
+    totals.add('work', {'id': 0, 'start': datetime(2025, 3, 2, 0), 'end': datetime(2025, 3, 2, 8)})
+    totals.add('break', {'id': 0, 'start': datetime(2025, 3, 1, 23), 'end': datetime(2025, 3, 2, 1)})
+    assert totals.day(date(2025, 3, 2))['net'] == timedelta(hours=7)
+    assert totals.total_net == timedelta(hours=7)
+    assert totals.weeks['2025-W09']['net'] == timedelta(hours=7)
+
+    rebuilt = SummaryRollups()
+    rebuilt.rebuild(*sessions_of(totals))
+    assert rebuilt.total_net == timedelta(hours=7)
+
+
+def sessions_of(totals):
+    """(work, break) sessions back out of an index, for rebuilding"""
+    found = {'work': [], 'break': []}
+    for (kind, _), entries in totals.index.days.items():
+        for start, end, session_id in entries:
+            found[kind].append({'id': session_id, 'start': start, 'end': end})
+    return found['work'], found['break']
+
+
+def snapshot(totals):
+    return (totals.days, totals.weeks, totals.months,
+            totals.total_worked, totals.total_break, totals.total_net, totals.overtime)
+
+
+def direct_nets(live):
+    """Each day's work minus any break inside it, worked out from scratch"""
+    breaks = merge_intervals((s['start'], s['end']) for s in live['break'].values())
+    work = {}
+    for session in live['work'].values():
+        work.setdefault(session['start'].date(), []).append((session['start'], session['end']))
+    nets = {}
+    for day, intervals in work.items():
+        merged = merge_intervals(intervals)
+        nets[day] = total_length(merged) - intersection_length(merged, breaks)
+    return nets
+
+
+def test_incremental_updates_match_a_rebuild():
+    rng = random.Random(11)
+    totals = SummaryRollups()
+    live = {'work': {}, 'break': {}}
+    next_id = 0
+
+    def random_session(kind):
+        start = datetime(2025, 3, 1) + timedelta(minutes=rng.randrange(0, 21 * 24 * 60, 15))
+        length = timedelta(minutes=rng.randrange(15, 12 * 60 if kind == 'work' else 3 * 60, 15))
+        session = {'id': next_id, 'start': start, 'end': start + length}
+        if kind == 'work':
+            session['task'] = rng.choice(["General Work", "Project A", "Meeting"])
+        return session
+
+    for step in range(3000):
+        kind = rng.choice(('work', 'break'))
+        action = rng.random()
+        if action < 0.5 or not live[kind]:
+            session = random_session(kind)
+            next_id += 1
+            live[kind][session['id']] = session
+            totals.add(kind, session)
+        elif action < 0.8:
+            session = live[kind][rng.choice(list(live[kind]))]
+            totals.remove(kind, session)
+            moved = random_session(kind)
+            session['start'], session['end'] = moved['start'], moved['end']
+            totals.add(kind, session)
+        else:
+            session = live[kind].pop(rng.choice(list(live[kind])))
+            totals.remove(kind, session)
+        if step % 50 == 0:
+            nets = direct_nets(live)
+            assert {day: t['net'] for day, t in totals.days.items()} == {day: nets.get(day, ZERO) for day in totals.days}
+
+    rebuilt = SummaryRollups()
+    rebuilt.rebuild(list(live['work'].values()), list(live['break'].values()))
+    assert snapshot(totals) == snapshot(rebuilt)
+    nets = direct_nets(live)
+    assert {day: t['net'] for day, t in rebuilt.days.items()} == {day: nets.get(day, ZERO) for day in rebuilt.days}
+
+
+def test_window_rollups_merged_with_older_history_match_a_rebuild():
+    rng = random.Random(5)
+    work, breaks = [], []
+    for i in range(400):
+        start = datetime(2025, 1, 1) + timedelta(minutes=rng.randrange(0, 60 * 24 * 60, 15))
+        work.append({'id': i, 'start': start, 'end': start + timedelta(hours=rng.randint(1, 10)),
+                     'task': rng.choice(["General Work", "Project A"])})
+        pause = start + timedelta(minutes=rng.randrange(0, 600, 15))
+        breaks.append({'id': i, 'start': pause, 'end': pause + timedelta(minutes=rng.randrange(15, 180, 15))})
+    # Work just after the seam, cut into by a break from the evening before it
+    window_start = date(2025, 2, 1)
+    work.append({'id': 400, 'start': datetime(2025, 2, 1, 0), 'end': datetime(2025, 2, 1, 3), 'task': "Night"})
+    breaks.append({'id': 400, 'start': datetime(2025, 1, 31, 23), 'end': datetime(2025, 2, 1, 1)})
+
+    def split(sessions):
+        recent = [s for s in sessions if s['start'].date() >= window_start]
+        return recent, [s for s in sessions if s['start'].date() < window_start]
+
+    (recent_work, older_work), (recent_breaks, older_breaks) = split(work), split(breaks)
+    rollups, history = SummaryRollups(), SummaryRollups()
+    rollups.rebuild(recent_work, recent_breaks)
+    history.rebuild(older_work, older_breaks)
+    rollups.merge(history)
+
+    rebuilt = SummaryRollups()
+    rebuilt.rebuild(work, breaks)
+    assert snapshot(rollups) == snapshot(rebuilt)
+    assert rollups.day(window_start)['net'] == rebuilt.day(window_start)['net']
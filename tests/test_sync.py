@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("requests")
+
+from dtr_storage import JournalStore  # noqa: E402
+from dtr_sync import Outbox, SyncClient, SyncError, stand_in_server  # noqa: E402
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = stand_in_server(0, str(tmp_path / "received.ndjson"), token="secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(server, tmp_path, token="secret", batch_size=500):
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    return SyncClient(url, Outbox(str(tmp_path / "outbox.db")), token, batch_size)
+
+
+def received(server):
+    try:
+        with open(server.output) as f:
+            return [json.loads(line) for line in f]
+    except FileNotFoundError:
+        return []
+
+
+def punches(count, start=0):
+    return [("rome", {'op': 'add', 'kind': 'work', 'rec': {'id': i, 'start': f"2025-03-03T08:{i % 60:02d}:00",
+                                                           'end': None, 'task': "Coding"}})
+            for i in range(start, start + count)]
+
+
+def test_store_writes_are_queued_and_sent(server, tmp_path):
+    client = client_for(server, tmp_path)
+    store = JournalStore(str(tmp_path / "rome"))
+    client.attach(store, "rome")
+    session = {'id': store.next_id('work'), 'start': datetime(2025, 3, 3, 8), 'end': None, 'task': "Coding"}
+    store.append('add', 'work', session)
+    session['end'] = datetime(2025, 3, 3, 16)
+    store.append('update', 'work', session)
+    assert client.outbox.count() == 2
+
+    assert client.drain() == 2
+    assert client.outbox.count() == 0
+    assert [(event['user'], event['op']) for event in received(server)] == [("rome", 'add'), ("rome", 'update')]
+    client.stop()
+
+
+def test_a_failing_outbox_leaves_the_write_and_resyncs_the_user(server, tmp_path, monkeypatch, capsys):
+    client = client_for(server, tmp_path)
+    store = JournalStore(str(tmp_path / "rome"))
+    client.attach(store, "rome")
+    first = {'id': store.next_id('work'), 'start': datetime(2025, 3, 3, 8), 'end': None, 'task': "Coding"}
+    store.append('add', 'work', first)
+
+    def locked(items):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(client.outbox, "add", locked)
+    first['end'] = datetime(2025, 3, 3, 16)
+    store.append('update', 'work', first)
+    assert client.resync == {"rome"}
+    assert "database is locked" in capsys.readouterr().out
+    assert JournalStore(str(tmp_path / "rome")).load()['work'][0]['end'] == "2025-03-03T16:00:00"
+    assert client.outbox.count() == 1
+
+    # The next write queues everything rome has instead of just itself
+    monkeypatch.undo()
+    second = {'id': store.next_id('work'), 'start': datetime(2025, 3, 4, 8), 'end': None, 'task': "Review"}
+    store.append('add', 'work', second)
+    assert client.resync == set()
+    assert client.drain() == 5
+    events = received(server)
+    assert [event['op'] for event in events] == ['add', 'resync', 'add', 'add', 'notes']
+    assert [event['rec']['end'] for event in events[2:4]] == ["2025-03-03T16:00:00", None]
+    client.stop()
+
+
+def test_server_errors_are_retried_without_losing_events(server, tmp_path):
+    client = client_for(server, tmp_path)
+    client.enqueue(punches(3))
+    server.fail_rate = 1.0
+    with pytest.raises(SyncError) as failure:
+        client.drain()
+    assert failure.value.retry and failure.value.retry_after == 1
+    assert client.outbox.count() == 3
+
+    server.fail_rate = 0.0
+    assert client.drain() == 3
+    assert len(received(server)) == 3
+    client.stop()
+
+
+def test_bad_credentials_halt_and_keep_everything(server, tmp_path):
+    client = client_for(server, tmp_path, token="wrong")
+    client.enqueue(punches(4))
+    with pytest.raises(SyncError) as failure:
+        client.drain()
+    assert failure.value.status == 401 and failure.value.retry
+    assert client.outbox.count() == 4
+    assert client.outbox.rejected() == []
+    client.stop()
+
+
+def test_too_large_batches_are_split(server, tmp_path):
+    server.max_events = 3
+    client = client_for(server, tmp_path, batch_size=10)
+    client.enqueue(punches(10))
+    assert client.drain() == 10
+    assert [event['rec']['id'] for event in received(server)] == list(range(10))
+    assert client.outbox.rejected() == []
+    client.stop()
+
+
+def test_only_refused_events_are_set_aside(server, tmp_path):
+    client = client_for(server, tmp_path, batch_size=8)
+    items = punches(8)
+    items[5] = ("rome", {'kind': 'work', 'rec': {'id': 5}})  # No op: the server refuses it
+    client.enqueue(items)
+    assert client.drain() == 7
+    assert [event['rec']['id'] for event in received(server)] == [0, 1, 2, 3, 4, 6, 7]
+    rejected = client.outbox.rejected()
+    assert [json.loads(event)['rec']['id'] for _, _, event, _ in rejected] == [5]
+    assert "422" in rejected[0][3]
+    assert client.outbox.count() == 0
+    client.stop()
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import dtr_team
+from dtr_storage import DEFAULT_CONFIG, open_store
+from dtr_team import TeamRollups
+
+
+def punch(config, user, day, hours):
+    store = open_store(user, config)
+    store.load()
+    store.append('add', 'work', {'id': store.next_id('work'), 'start': datetime(2025, 3, day, 8),
+                                 'end': datetime(2025, 3, day, 8 + hours), 'task': "Coding"})
+    store.close()
+
+
+def test_refresh_rereads_only_users_whose_records_changed(tmp_path, monkeypatch):
+    config = dict(DEFAULT_CONFIG, users_dir=str(tmp_path / "users"), teams={'Support': ["rome", "ana"]})
+    punch(config, "rome", 3, 8)
+    punch(config, "ana", 3, 6)
+    scanned = []
+    scan_user = dtr_team.scan_user
+
+    def counting_scan(config, username, work_hours_per_day):
+        scanned.append(username)
+        return scan_user(config, username, work_hours_per_day)
+
+    monkeypatch.setattr(dtr_team, "scan_user", counting_scan)
+
+    team = TeamRollups(config)
+    assert team.refresh() == 2
+    assert team.team_buckets('weekly')['Support']['2025-W10']['worked'] == 14 * 3600
+
+    # Nothing changed: the cache answers, also for a fresh instance reading it from disk
+    scanned.clear()
+    assert team.refresh() == 0
+    assert TeamRollups(config).refresh() == 0
+    assert scanned == []
+
+    punch(config, "ana", 4, 2)
+    assert TeamRollups(config).refresh() == 1
+    assert scanned == ["ana"]
+    team = TeamRollups(config)
+    assert team.refresh() == 0
+    assert team.user_buckets('weekly')['ana']['2025-W10']['worked'] == 8 * 3600
+    assert team.team_buckets('weekly')['Support']['2025-W10']['worked'] == 16 * 3600
@@ -0,0 +1,36 @@
+import os
+import pickle
+
+from dtr_users import UserStore
+
+
+def test_pickled_accounts_are_migrated_once(tmp_path):
+    legacy = str(tmp_path / "users.dat")
+    with open(legacy, "wb") as f:
+        pickle.dump({'rome': {'password': "hash-r", 'created': "2025-03-03 08:00:00", 'admin': True},
+                     'ana': {'password': "hash-a", 'created': "2025-03-04 09:00:00"}}, f)
+    db_path = str(tmp_path / "users.db")
+    users = UserStore(db_path, legacy)
+    assert not os.path.exists(legacy)
+    assert os.path.exists(legacy + ".migrated")
+    assert users.usernames() == ["ana", "rome"]
+    assert users.get("rome") == {'password': "hash-r", 'created': "2025-03-03 08:00:00", 'admin': True}
+    assert users.get("ana")['admin'] is False
+    users.update("ana", password="hash-b")
+    users.close()
+
+    # The renamed file is not imported again, so later changes survive a restart
+    users = UserStore(db_path, legacy)
+    assert users.count() == 2
+    assert users.get("ana")['password'] == "hash-b"
+    users.close()
+
+
+def test_registering_a_taken_username_is_refused(tmp_path):
+    users = UserStore(str(tmp_path / "users.db"))
+    assert users.add("rome", {'password': "first", 'created': "2025-03-03 08:00:00"})
+    assert not users.add("rome", {'password': "second", 'admin': True})
+    assert users.count() == 1
+    assert users.get("rome") == {'password': "first", 'created': "2025-03-03 08:00:00", 'admin': False}
+    assert users.get("nobody") is None
+    users.close()